@@ -44,7 +44,7 @@ def run_analysis(dataset, stage_list):
     """
     Run analysis against given data and phase list.
 
-    :param object dataset: CSV-formatted file (as generated by the Analysis module)
+    :param object dataset: dataset file in any storage format (as generated by the Analysis module)
     :param list[str] stage_list: list of stage names (e.g. ['A', 'B'])
     """
     analysis_folder = create_analysis_folder()
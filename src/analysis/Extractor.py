@@ -19,7 +19,7 @@
 """
 
 from __future__ import absolute_import
-from tools.Utils import output_fields
+from tools.Utils import output_fields, load_dataset, timestamp_field
 import pandas as pd
 
 
@@ -28,7 +28,7 @@ def create_analysis_dataset(data, phase_list, analysis_folder):
     """
     Prepares data for data analysis by creating the analysis dataset.
 
-    :param object data: CSV-formatted file (as generated by the Analysis module)
+    :param object data: dataset file in any storage format (as generated by the Analysis module)
     :param list[str] phase_list: list of stage names (e.g. ['A', 'B'])
     :param string analysis_folder: analysis folder location
     :return: data formatted for analysis
@@ -36,9 +36,7 @@ def create_analysis_dataset(data, phase_list, analysis_folder):
     """
 
     # load data and order by phase
-    phase_data = pd.read_csv(data, header=0, skipinitialspace=True, usecols=output_fields,
-                             parse_dates=[['Date', 'Time']])
-    df = pd.DataFrame(phase_data)
+    df = load_dataset(data, fields=output_fields).rename(columns={timestamp_field: 'Date_Time'})
 
     # initialise for later usage
     df_output = pd.DataFrame()
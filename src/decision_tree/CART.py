@@ -18,12 +18,14 @@
     using data provided, performing training/testing and providing the score.
 """
 
-from sklearn.model_selection import GridSearchCV
+import time
 from sklearn.tree import DecisionTreeRegressor
-from decision_tree.DT_Utils import score_dt, plot_dt, save_dt_model
+from decision_tree.Search import get_search
+from decision_tree.DT_Utils import score_dt, save_cv_results, plot_dt, save_dt_model
 
 
-def run_cart(X_train, X_test, y_train, y_test, output_folder):
+def run_cart(X_train, X_test, y_train, y_test, output_folder, n_jobs=-1, search='grid', max_seconds=None,
+             max_evaluations=None, cv_type='expanding'):
     """
     Run the Classification and Regression Tree algorithm.
 
@@ -32,6 +34,14 @@ def run_cart(X_train, X_test, y_train, y_test, output_folder):
     :param dataframe y_train: target training examples
     :param dataframe y_test: target test examples
     :param output_folder: location of the output / results
+    :param int n_jobs: number of jobs run in parallel by the cross validation (-1 to use all cores)
+    :param string search: type of search of parameters ('grid' for all combinations, or 'halving' to search by
+        successive halving of the combinations within a budget)
+    :param float max_seconds: time budget (in seconds) of a 'halving' search
+    :param int max_evaluations: evaluation budget (cross validations of a combination) of a 'halving' search
+    :param string cv_type: type of cross validation ('expanding' or 'rolling' window in time order, or 'kfold')
+    :return: Mean squared error and score of the model on the test data
+    :rtype: float, float
     """
 
     # initialise model
@@ -43,19 +53,24 @@ def run_cart(X_train, X_test, y_train, y_test, output_folder):
                   'min_samples_split': [2, 5, 10, 15],
                   'min_samples_leaf': [3, 5, 10, 20]
                   }
-    cv_dt_model = GridSearchCV(dt_model, param_grid, n_jobs=4).fit(X_train, y_train)
+    start_time = time.time()
+    cv_dt_model = get_search(dt_model, param_grid, n_jobs, search, 'n_samples', max_seconds,
+                             max_evaluations, cv_type).fit(X_train, y_train)
+    train_seconds = time.time() - start_time
 
     # print the CART model chosen by CV
     print(cv_dt_model)
 
-    # fit models using training data
-    cv_dt_model.fit(X_train, y_train)
+    # save the scores of each combination of parameters (the best estimator is already refit on all training data)
+    save_cv_results(model_name, cv_dt_model, output_folder)
 
     # predict on new (test) data and encapsulate result in data frame
     y_dt = cv_dt_model.predict(X_test)
 
     # get the score from the estimators
-    score_dt(model_name, cv_dt_model, X_test, y_test, y_dt, output_folder)
+    mse, score = score_dt(model_name, cv_dt_model, X_test, y_test, y_dt, output_folder)
 
-    # save (pickle) model for re-use
-    save_dt_model(model_name, cv_dt_model, output_folder)
+    # save the best model for re-use, with its features, scores and training time
+    save_dt_model(model_name, cv_dt_model, output_folder, X_train, {'mse': mse, 'score': score}, train_seconds)
+
+    return mse, score
@@ -0,0 +1,268 @@
+# Copyright 2017 Priscilla Boyd. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""
+    The DT_Export module predicts with trained decision tree models without the scikit-learn estimators, by:
+
+    -  Flattening the best CART tree (or every tree of a GBR ensemble) into contiguous arrays: feature, threshold,
+       left, right and value of each node, saved so they can be memory-mapped when loaded.
+    -  Walking the arrays for all rows of a batch at once, or for a single row with minimal overhead, giving the same
+       predictions as scikit-learn.
+    -  Benchmarking the time taken by each prediction against the scikit-learn model.
+"""
+
+import time
+import joblib
+import numpy as np
+
+# declare type of the examples compared with the thresholds (as used by scikit-learn trees)
+feature_type = np.float32
+
+# declare number of rows predicted at once by a batch prediction
+block_size = 256
+
+
+def get_trees(model):
+    """
+    Get the trees of a model, with the initial prediction and the scale of each tree.
+
+    :param object model: CART or GBR model (or a search of parameters, using its best estimator)
+    :return: Trees, initial prediction and scale of the trees (learning rate)
+    :rtype: list[object], float, float
+    """
+    model = getattr(model, 'best_estimator_', model)
+    model_type = type(model).__name__
+
+    if model_type == 'DecisionTreeRegressor':
+        return [model.tree_], 0.0, 1.0
+
+    if model_type == 'GradientBoostingRegressor':
+        if model.init_ == 'zero':
+            init = 0.0
+        else:
+            init = float(model.init_.predict(np.zeros((1, model.n_features_in_)))[0])
+        return [estimator.tree_ for estimator in model.estimators_[:, 0]], init, float(model.learning_rate)
+
+    raise ValueError('Model not supported for export: ' + model_type)
+
+
+def flatten_trees(model):
+    """
+    Flatten the trees of a model into contiguous arrays, with the nodes of all trees one after the other.
+
+    Leaves point to themselves (left and right) and test feature 0, so walking past a leaf stays on the leaf. The
+    children of each node side by side and the values scaled by the learning rate are also kept, so a predictor can be
+    created without computing anything.
+
+    :param object model: CART or GBR model (or a search of parameters, using its best estimator)
+    :return: Arrays of the nodes (feature, threshold, left, right, value, children and scaled value), root and depth of
+        each tree, initial prediction and learning rate
+    :rtype: dict
+    """
+    trees, init, learning_rate = get_trees(model)
+
+    arrays = {'feature': [], 'threshold': [], 'left': [], 'right': [], 'value': []}
+    roots = []
+    offset = 0
+    for tree in trees:
+        nodes = np.arange(tree.node_count)
+        leaf = tree.children_left == -1
+        arrays['feature'].append(np.where(leaf, 0, tree.feature))
+        arrays['threshold'].append(tree.threshold)
+        arrays['left'].append(np.where(leaf, nodes, tree.children_left) + offset)
+        arrays['right'].append(np.where(leaf, nodes, tree.children_right) + offset)
+        arrays['value'].append(tree.value[:, 0, 0])
+        roots.append(offset)
+        offset += tree.node_count
+
+    flat = {'feature': np.concatenate(arrays['feature']).astype(np.int32),
+            'threshold': np.concatenate(arrays['threshold']).astype(np.float64),
+            'left': np.concatenate(arrays['left']).astype(np.int32),
+            'right': np.concatenate(arrays['right']).astype(np.int32),
+            'value': np.concatenate(arrays['value']).astype(np.float64),
+            'roots': np.array(roots, dtype=np.int32),
+            'max_depth': np.int32(max(tree.max_depth for tree in trees)),
+            'init': np.float64(init),
+            'learning_rate': np.float64(learning_rate)}
+
+    # children of each node side by side (left, then right), so a level of the trees takes a single lookup
+    flat['children'] = np.stack([flat['left'], flat['right']], axis=1).ravel()
+
+    # scale the values once (each tree adds learning rate x value, as scikit-learn does)
+    flat['scaled_value'] = flat['learning_rate'] * flat['value']
+
+    return flat
+
+
+class TreePredictor(object):
+    """
+    Predictor walking the flattened trees of a model (see flatten_trees).
+
+    :param dict arrays: arrays of the nodes, roots and depth of the trees, initial prediction and learning rate (the
+        arrays can be memory-mapped)
+    """
+
+    def __init__(self, arrays):
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.left = arrays['left']
+        self.right = arrays['right']
+        self.value = arrays['value']
+        self.roots = arrays['roots']
+        self.max_depth = int(arrays['max_depth'])
+        self.init = float(arrays['init'])
+        self.learning_rate = float(arrays['learning_rate'])
+        self.children = arrays['children']
+        self.scaled_value = arrays['scaled_value']
+
+        # nodes as plain lists (faster than arrays to walk one node at a time), created by the first single prediction
+        self.node_lists = None
+
+    def predict(self, X):
+        """
+        Predict a batch of examples, walking all trees for all rows of a block at once (one level at a time).
+
+        :param ndarray X: examples, one row per example
+        :return: Predictions
+        :rtype: ndarray
+        """
+        X = np.asarray(X, dtype=feature_type)
+        predictions = np.empty(len(X))
+
+        # walk blocks of rows, so the nodes of all trees of a block stay in the cache
+        for start in range(0, len(X), block_size):
+            predictions[start:start + block_size] = self.predict_block(X[start:start + block_size])
+
+        return predictions
+
+    def predict_block(self, X):
+        """
+        Predict a block of examples, walking one row of nodes per tree and indexing the examples as a flat array.
+
+        :param ndarray X: examples (of the feature type), one row per example
+        :return: Predictions
+        :rtype: ndarray
+        """
+        row_offsets = np.arange(len(X)) * X.shape[1]
+        values = X.ravel()
+        nodes = np.repeat(self.roots[:, np.newaxis], len(X), axis=1)
+        for _ in range(self.max_depth):
+            go_right = ~(values.take(self.feature.take(nodes) + row_offsets) <= self.threshold.take(nodes))
+            nodes = self.children.take(2 * nodes + go_right)
+
+        # add the trees in order, as scikit-learn does, so the predictions are identical
+        tree_values = self.scaled_value.take(nodes)
+        predictions = np.full(len(X), self.init)
+        for tree_value in tree_values:
+            predictions += tree_value
+
+        return predictions
+
+    def predict_one(self, x):
+        """
+        Predict a single example.
+
+        :param list x: example (one value per feature)
+        :return: Prediction
+        :rtype: float
+        """
+        if self.node_lists is None:
+            self.node_lists = (self.feature.tolist(), self.threshold.tolist(), self.left.tolist(), self.right.tolist(),
+                               self.scaled_value.tolist(), self.roots.tolist())
+
+        x = np.asarray(x, dtype=feature_type).tolist()
+        feature, threshold, left, right, value, roots = self.node_lists
+
+        prediction = self.init
+        for node in roots:
+            while left[node] != node:
+                node = left[node] if x[feature[node]] <= threshold[node] else right[node]
+            prediction += value[node]
+
+        return prediction
+
+
+def export_dt_model(model, file):
+    """
+    Export the trees of a model to an uncompressed joblib file, so it loads without scikit-learn and its arrays can be
+    memory-mapped.
+
+    :param object model: CART or GBR model (or a search of parameters, using its best estimator)
+    :param string file: location of the exported model (joblib file)
+    :return: Location of the exported model
+    :rtype: string
+    """
+    joblib.dump(flatten_trees(model), file)
+    print("Exported model saved location:", file)
+
+    return file
+
+
+def load_exported_dt(file):
+    """
+    Load an exported model, memory-mapping its arrays (read only).
+
+    :param string file: location of the exported model (joblib file)
+    :return: Predictor of the exported model
+    :rtype: TreePredictor
+    """
+    return TreePredictor(joblib.load(file, mmap_mode='r'))
+
+
+def measure_time(predict_function, rows, repeats):
+    """
+    Measure the median time taken to predict each row.
+
+    :param function predict_function: function predicting the rows
+    :param object rows: rows predicted by each call
+    :param int repeats: number of calls measured
+    :return: Median time (in microseconds) per row
+    :rtype: float
+    """
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        predict_function(rows)
+        times.append(time.perf_counter() - start)
+
+    return float(np.median(times) * 1e6 / len(rows))
+
+
+def benchmark_dt_export(model, X, repeats=1000):
+    """
+    Compare the time taken per prediction (for a single row and for a batch) by a model and its exported trees.
+
+    :param object model: CART or GBR model (or a search of parameters, using its best estimator)
+    :param ndarray X: examples, used as a batch (and their first row as a single row)
+    :param int repeats: number of predictions measured
+    :return: Results of the benchmark for each model, with the largest difference between their predictions
+    :rtype: dataframe
+    """
+    import pandas as pd
+
+    X = np.asarray(X)
+    predictor = TreePredictor(flatten_trees(model))
+    batch_repeats = max(1, repeats // 100)
+
+    results = pd.DataFrame({'model': ['sklearn', 'export'],
+                            'single_row_us': [measure_time(model.predict, X[:1], repeats),
+                                              measure_time(lambda rows: [predictor.predict_one(rows[0])], X[:1],
+                                                           repeats)],
+                            'batch_us_per_row': [measure_time(model.predict, X, batch_repeats),
+                                                 measure_time(predictor.predict, X, batch_repeats)],
+                            'max_difference': [0.0, float(np.abs(model.predict(X) - predictor.predict(X)).max())]})
+    print(results.to_string(index=False))
+
+    return results
@@ -18,9 +18,16 @@
     analysis.
 """
 import pickle
+import pandas as pd
 from matplotlib import pyplot as plt
 from sklearn.metrics import mean_squared_error
-from tools.Utils import create_folder_if_not_exists
+from decision_tree.DT_Export import export_dt_model
+from tools.Registry import get_feature_schema, register_model, save_estimator
+from tools.Utils import create_folder_if_not_exists, save_df
+
+# declare type of model (as used by the prediction service) of each estimator
+model_types = {'DecisionTreeRegressor': 'cart', 'GradientBoostingRegressor': 'gbr',
+               'HistGradientBoostingRegressor': 'gbr'}
 
 
 # noinspection PyTypeChecker
@@ -34,6 +41,8 @@ def score_dt(model_name, model, X, y, y_actual, output_folder):
     :param dataframe y: targets
     :param dataframe y_actual: target results
     :param string output_folder: location of the output / results
+    :return: Mean squared error and score (coefficient of determination) of the model
+    :rtype: float, float
     """
     print("Scoring model...")
     model_score = model.score(X, y)
@@ -53,6 +62,8 @@ def score_dt(model_name, model, X, y, y_actual, output_folder):
     scores.close()
     print("Scores saved location:", filename)
 
+    return mse, model_score
+
 
 def plot_dt(model_name, y_actual, y_test, output_folder):
     """
@@ -79,27 +90,62 @@ def plot_dt(model_name, y_actual, y_test, output_folder):
     print("Plot saved location:", plot_path)
 
 
-def save_dt_model(model_name, model, folder):
+def save_cv_results(model_name, model, output_folder):
     """
-    Save model using Pickle binary format.
+    Save the results of the cross validation (scores and fit time of each combination of parameters) as CSV.
+
+    :param string model_name: title for the model used on the output filename
+    :param object model: model reference (after cross validation)
+    :param string output_folder: location of the output / results
+    """
+    path = output_folder + '/models'
+    create_folder_if_not_exists(path)
+
+    cv_results = pd.DataFrame(model.cv_results_).sort_values('rank_test_score')
+    filename = save_df(cv_results, path + '/cv_results_' + model_name, storage='csv')
+    print("Cross validation results saved location:", filename)
+
+
+def save_dt_model(model_name, model, folder, X=None, scores=None, train_seconds=None):
+    """
+    Save the best estimator of a model with joblib (memory-mappable unless compressed, see tools.Registry), export its
+    trees for fast prediction (if supported) and add it to the index of models of the results folder.
 
-    :param dataframe model: model reference
     :param string model_name: title for the model used on the output filename
+    :param object model: model reference (a search of parameters, or an estimator)
     :param string folder: location of model output
+    :param dataframe X: training examples (to record the names and types of the features)
+    :param dict scores: scores of the model on the test data
+    :param float train_seconds: time taken to train the model (in seconds)
+    :return: Entry of the model in the index
+    :rtype: dict
     """
     print("Saving model...")
-    model_file = folder + '/models/' + model_name + '.pkl'
-    path = open(model_file, 'wb')
-    pickle.dump(model, path)
-    print("Model saved location:", model_file)
+    estimator = getattr(model, 'best_estimator_', model)
+    files = {'estimator': 'models/' + model_name + '.joblib'}
+    save_estimator(estimator, folder + '/' + files['estimator'])
+
+    try:
+        files['export'] = 'models/' + model_name + '_trees.joblib'
+        export_dt_model(estimator, folder + '/' + files['export'])
+    except ValueError:
+        del files['export']
+
+    features, feature_types = get_feature_schema(X) if X is not None else ([], [])
+    entry = register_model(folder, model_name, model_types.get(type(estimator).__name__), files, features,
+                           feature_types, scores, train_seconds, getattr(model, 'best_params_', None))
+    print("Model saved location:", folder + '/' + files['estimator'])
+
+    return entry
 
 
 def load_dt_model(pickle_model):
     """
-    Retrieve model using Pickle binary format.
+    Retrieve model using Pickle binary format (as saved before the index of models, see save_dt_model).
 
     :param string pickle_model: location of Pickle model
     :return: Pickle model for re-use
     :rtype: object
     """
-    return pickle.loads(pickle_model)
+    with open(pickle_model, 'rb') as model_file:
+        return pickle.load(model_file)
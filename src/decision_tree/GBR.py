@@ -15,14 +15,77 @@
 
 """
     The GBR module implements the Gradient Boosting Regression ensemble for decision trees.
+
+    Two engines are available: the standard engine (GradientBoostingRegressor), and a histogram engine
+    (HistGradientBoostingRegressor) binning the features, which scales to many more records, handles categorical
+    features natively and stops early on the most recent training records.
 """
 
-from sklearn.model_selection import GridSearchCV
+import time
+import numpy as np
 from sklearn.ensemble import GradientBoostingRegressor
-from decision_tree.DT_Utils import score_dt, save_dt_model
+from sklearn.metrics import mean_squared_error
+from decision_tree.Search import get_search
+from decision_tree.DT_Utils import score_dt, save_cv_results, save_dt_model
+
+# declare engines available ('standard' or 'histogram')
+gbr_engines = ['standard', 'histogram']
+
+# declare fields treated as categories by the histogram engine (if used as features)
+categorical_fields = ['Phase', 'Result']
+
+# declare fraction of the training records (the most recent ones) used to stop the histogram engine early
+validation_fraction = 0.1
 
 
-def run_gbr(X_train, X_test, y_train, y_test, output_folder):
+def get_categorical_features(X):
+    """
+    Get the features treated as categories by the histogram engine.
+
+    :param dataframe X: examples
+    :return: Mask of the categorical features, or None if there are none (e.g. arrays without field names)
+    :rtype: list[bool]
+    """
+    mask = [field in categorical_fields for field in getattr(X, 'columns', [])]
+
+    return mask if any(mask) else None
+
+
+def get_validation_split(X_train, y_train, fraction=validation_fraction):
+    """
+    Split the training data in time order, keeping the most recent records to validate the model (i.e. early stopping
+    never uses records older than those it is trained on).
+
+    :param dataframe X_train: training examples (in time order)
+    :param dataframe y_train: target training examples (in time order)
+    :param float fraction: fraction of the records used for validation
+    :return: Training examples, training targets, validation examples and validation targets
+    :rtype: ndarray, ndarray, ndarray, ndarray
+    """
+    X_train, y_train = np.asarray(X_train), np.asarray(y_train)
+    row = len(y_train) - max(1, int(round(fraction * len(y_train))))
+
+    return X_train[:row], y_train[:row], X_train[row:], y_train[row:]
+
+
+def get_hist_gbr_model(X_train):
+    """
+    Initialise the histogram engine, stopping early on the validation records (see validation_fraction).
+
+    The histogram engine is imported here, as it needs a newer scikit-learn (v1.4) than the standard engine.
+
+    :param dataframe X_train: training examples (to find the categorical features)
+    :return: Model of the histogram engine
+    :rtype: object
+    """
+    from sklearn.ensemble import HistGradientBoostingRegressor
+
+    return HistGradientBoostingRegressor(max_iter=1000, early_stopping=True, n_iter_no_change=10, tol=1e-4,
+                                         categorical_features=get_categorical_features(X_train), random_state=1)
+
+
+def run_gbr(X_train, X_test, y_train, y_test, output_folder, n_jobs=-1, search='grid', max_seconds=None,
+            max_evaluations=None, cv_type='expanding', engine='standard'):
     """
     Run the Gradient Boosting Regression ensemble algorithm.
 
@@ -31,7 +94,22 @@ def run_gbr(X_train, X_test, y_train, y_test, output_folder):
     :param dataframe y_train: target training examples
     :param dataframe y_test: target test examples
     :param output_folder: location of the output / results
+    :param int n_jobs: number of jobs run in parallel by the cross validation (-1 to use all cores)
+    :param string search: type of search of parameters ('grid' for all combinations, or 'halving' to search by
+        successive halving of the combinations within a budget)
+    :param float max_seconds: time budget (in seconds) of a 'halving' search
+    :param int max_evaluations: evaluation budget (cross validations of a combination) of a 'halving' search
+    :param string cv_type: type of cross validation ('expanding' or 'rolling' window in time order, or 'kfold')
+    :param string engine: engine used to fit the model ('standard' or 'histogram')
+    :return: Mean squared error and score of the model on the test data
+    :rtype: float, float
     """
+    if engine not in gbr_engines:
+        raise ValueError('Unknown GBR engine: ' + str(engine))
+
+    if engine == 'histogram':
+        return run_hist_gbr(X_train, X_test, y_train, y_test, output_folder, n_jobs, search, max_seconds,
+                            max_evaluations, cv_type)
 
     # initialise model
     gbr_model = GradientBoostingRegressor()
@@ -41,19 +119,116 @@ def run_gbr(X_train, X_test, y_train, y_test, output_folder):
     param_grid = {'max_depth': [None, 5, 10, 15, 20],
                   'learning_rate': [0.05, 0.1]
                   }
-    cv_gbr_model = GridSearchCV(gbr_model, param_grid, n_jobs=4).fit(X_train, y_train)
+    start_time = time.time()
+    cv_gbr_model = get_search(gbr_model, param_grid, n_jobs, search, 'n_estimators', max_seconds,
+                              max_evaluations, cv_type).fit(X_train, y_train)
+    train_seconds = time.time() - start_time
 
     # print the gbr model chosen by CV
     print(cv_gbr_model)
 
-    # fit models using training data
-    cv_gbr_model.fit(X_train, y_train)
+    # save the scores of each combination of parameters (the best estimator is already refit on all training data)
+    save_cv_results(model_name, cv_gbr_model, output_folder)
 
     # predict on new (test) data and encapsulate result in data frame
     y_dt = cv_gbr_model.predict(X_test)
 
     # get the score from the estimators
-    score_dt(model_name, cv_gbr_model, X_test, y_test, y_dt, output_folder)
+    mse, score = score_dt(model_name, cv_gbr_model, X_test, y_test, y_dt, output_folder)
+
+    # save the best model for re-use, with its features, scores and training time
+    save_dt_model(model_name, cv_gbr_model, output_folder, X_train, {'mse': mse, 'score': score}, train_seconds)
+
+    return mse, score
+
+
+def run_hist_gbr(X_train, X_test, y_train, y_test, output_folder, n_jobs=-1, search='grid', max_seconds=None,
+                 max_evaluations=None, cv_type='expanding'):
+    """
+    Run the Gradient Boosting Regression ensemble algorithm with the histogram engine.
+
+    The number of iterations is not searched: each fit stops once the score on the most recent training records (see
+    validation_fraction) stops improving. Fitting is multi-threaded (OpenMP) within each job.
+
+    :param dataframe X_train: training examples (in time order)
+    :param dataframe X_test: test examples
+    :param dataframe y_train: target training examples (in time order)
+    :param dataframe y_test: target test examples
+    :param output_folder: location of the output / results
+    :param int n_jobs: number of jobs run in parallel by the cross validation (-1 to use all cores)
+    :param string search: type of search of parameters ('grid' or 'halving')
+    :param float max_seconds: time budget (in seconds) of a 'halving' search
+    :param int max_evaluations: evaluation budget (cross validations of a combination) of a 'halving' search
+    :param string cv_type: type of cross validation ('expanding' or 'rolling' window in time order, or 'kfold')
+    :return: Mean squared error and score of the model on the test data
+    :rtype: float, float
+    """
+
+    # initialise model, stopping early on the validation records
+    hist_gbr_model = get_hist_gbr_model(X_train)
+    model_name = 'dt_model_hist_gbr'
+    X_fit, y_fit, X_val, y_val = get_validation_split(X_train, y_train)
+
+    # run cross validation on model to find best parameters
+    param_grid = {'max_leaf_nodes': [15, 31, 63],
+                  'learning_rate': [0.05, 0.1]
+                  }
+    start_time = time.time()
+    cv_hist_gbr_model = get_search(hist_gbr_model, param_grid, n_jobs, search, 'n_samples', max_seconds,
+                                   max_evaluations, cv_type).fit(X_fit, y_fit, X_val=X_val, y_val=y_val)
+    train_seconds = time.time() - start_time
+
+    # print the gbr model chosen by CV
+    print(cv_hist_gbr_model)
+
+    # save the scores of each combination of parameters (the best estimator is refit on the training records before
+    # the validation records, which are kept for its early stopping)
+    save_cv_results(model_name, cv_hist_gbr_model, output_folder)
+
+    # predict on new (test) data and encapsulate result in data frame
+    X_test = np.asarray(X_test)
+    y_dt = cv_hist_gbr_model.predict(X_test)
+
+    # get the score from the estimators
+    mse, score = score_dt(model_name, cv_hist_gbr_model, X_test, y_test, y_dt, output_folder)
+
+    # save the best model for re-use, with its features, scores and training time
+    save_dt_model(model_name, cv_hist_gbr_model, output_folder, X_train, {'mse': mse, 'score': score}, train_seconds)
+
+    return mse, score
+
+
+def benchmark_hist_gbr(X_train, X_test, y_train, y_test):
+    """
+    Compare the time taken to fit the standard and histogram engines (with their default parameters) and the mean
+    squared error of their predictions on the test data.
+
+    :param dataframe X_train: training examples (in time order)
+    :param dataframe X_test: test examples
+    :param dataframe y_train: target training examples (in time order)
+    :param dataframe y_test: target test examples
+    :return: Results of the benchmark for each engine, with the number of trees fitted
+    :rtype: dataframe
+    """
+    import pandas as pd
+
+    # the standard engine fits all its trees, the histogram engine stops early on the most recent training records
+    standard_model = GradientBoostingRegressor(random_state=1)
+    start_time = time.time()
+    standard_model.fit(X_train, y_train)
+    standard_seconds = time.time() - start_time
+
+    hist_model = get_hist_gbr_model(X_train)
+    X_fit, y_fit, X_val, y_val = get_validation_split(X_train, y_train)
+    start_time = time.time()
+    hist_model.fit(X_fit, y_fit, X_val=X_val, y_val=y_val)
+    hist_seconds = time.time() - start_time
+
+    results = pd.DataFrame({'engine': gbr_engines,
+                            'fit_seconds': [standard_seconds, hist_seconds],
+                            'n_trees': [standard_model.n_estimators_, hist_model.n_iter_],
+                            'mse': [mean_squared_error(y_test, standard_model.predict(X_test)),
+                                    mean_squared_error(y_test, hist_model.predict(np.asarray(X_test)))]})
+    print(results.to_string(index=False))
 
-    # save (pickle) model for re-use
-    save_dt_model(model_name, cv_gbr_model, output_folder)
+    return results
@@ -15,23 +15,54 @@
 
 """
     The Main module creates the decision tree models, initialises the data and runs them to obtain the scores.
+
+    Models can either be trained on all data or for each partition (e.g. each site and phase) on a process pool.
 """
 
 from sklearn.model_selection import train_test_split
 from decision_tree.CART import run_cart
 from decision_tree.GBR import run_gbr
+from decision_tree.Orchestrator import get_site_datasets, run_partitioned
 from tools.Utils import get_sklearn_data_with_duration, get_latest_dataset_folder, get_sklearn_X_y
 
 # retrieve data
 data = get_sklearn_data_with_duration()
 X, y = get_sklearn_X_y(data, duration=True, datetime=False)
 
-# split data into training / test (20% for test)
+# split data into training / test (the most recent 20% for test, as records are in time order)
 X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=1, shuffle=False)
 
 # define output folder for results
 output_folder = get_latest_dataset_folder()
 
+# number of jobs run in parallel by the cross validation (-1 to use all cores)
+n_jobs = -1
+
+# cross validation of the search: 'expanding' or 'rolling' window in time order, or 'kfold' (ignores time order)
+cv_type = 'expanding'
+
+# search of parameters: 'grid' (all combinations) or 'halving' (successive halving within the budget below)
+search = 'grid'
+
+# budget of a 'halving' search: time (in seconds) and/or number of evaluations, or None for no limit
+max_seconds = None
+max_evaluations = None
+
+# engine of the GBR model: 'standard' or 'histogram' (binned features, scales to many more records)
+gbr_engine = 'standard'
+
+# train a model for each site and phase on a process pool (set to False to train a single model on all data)
+partitioned = False
+
+# folder with a sub-folder for each site (e.g. from a batch run), or None to use the latest dataset only
+site_results_folder = None
+
 if __name__ == '__main__':
-    run_cart(X_train, X_test, y_train, y_test, output_folder)
-    run_gbr(X_train, X_test, y_train, y_test, output_folder)
+    if partitioned:
+        datasets = get_site_datasets(site_results_folder) if site_results_folder is not None else {'latest': data}
+        run_partitioned(datasets, output_folder)
+    else:
+        run_cart(X_train, X_test, y_train, y_test, output_folder, n_jobs, search, max_seconds, max_evaluations,
+                 cv_type)
+        run_gbr(X_train, X_test, y_train, y_test, output_folder, n_jobs, search, max_seconds, max_evaluations,
+                cv_type, gbr_engine)
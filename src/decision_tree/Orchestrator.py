@@ -0,0 +1,204 @@
+# Copyright 2017 Priscilla Boyd. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""
+    The Orchestrator module trains a decision tree model for each partition (e.g. each site and phase) of the duration
+    data, by:
+
+    -  Grouping the data of all sites by partition and writing it once to memory-mapped arrays, shared by all workers.
+    -  Training the partitions concurrently on a process pool (the CART and GBR models of a partition one after the
+       other, as they share the results folder of the partition).
+    -  Reporting the scores and the time taken by each partition, and any failures.
+"""
+
+import os
+import time
+import traceback
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from decision_tree.CART import run_cart
+from decision_tree.GBR import run_gbr
+from tools.Utils import create_folder_if_not_exists, find_storage_file, get_sklearn_X_y, save_df
+
+# declare training function of each algorithm
+algorithms = {'cart': run_cart, 'gbr': run_gbr}
+
+# declare fields partitioning the data (the site and any fields of the duration data used as features)
+partition_fields = ['site', 'Phase']
+
+# declare minimum number of records of a partition (smaller partitions are reported but not trained)
+min_partition_records = 50
+
+
+def get_site_datasets(folder):
+    """
+    Get the duration dataset of each site in a folder with a sub-folder for each site (e.g. from a batch run).
+
+    :param string folder: location of the folder with a sub-folder for each site
+    :return: Location of the duration dataset by site
+    :rtype: dict
+    """
+    datasets = {}
+    for site_id in sorted(os.listdir(folder)):
+        # skip files (e.g. the batch summary) and sites without a duration dataset (e.g. failed sites)
+        if not os.path.isdir(os.path.join(folder, site_id)):
+            continue
+        file = find_storage_file(os.path.join(folder, site_id, 'sklearn_dataset_with_duration'))
+        if os.path.exists(file):
+            datasets[site_id] = file
+
+    return datasets
+
+
+def share_partitions(datasets, data_folder, fields=partition_fields, test_size=0.2):
+    """
+    Group the data of all sites by partition and save it as arrays that workers can map into memory, so the data is
+    not copied to each worker.
+
+    Records of each partition are kept in time order, using the most recent records for test.
+
+    :param dict datasets: location of the duration dataset by site
+    :param string data_folder: location of the shared arrays
+    :param list[str] fields: fields partitioning the data ('site' and/or feature fields)
+    :param float test_size: fraction of records of each partition used for test
+    :return: Partitions, each with its keys and the start, test start and stop index of its records
+    :rtype: list[dict]
+    """
+    if 'Result' in fields:
+        raise ValueError('Cannot partition by the target (Result) of the model')
+
+    frames = []
+    for site_id, file in sorted(datasets.items()):
+        X, y = get_sklearn_X_y(file, duration=True, datetime=False)
+        frames.append(X.assign(Result=y.to_numpy(), site=site_id))
+    data = pd.concat(frames, ignore_index=True)
+    feature_fields = [field for field in data.columns if field not in ['Result', 'site']]
+
+    # sort by partition (keeping the time order within each partition), so each partition is a contiguous slice
+    data = data.sort_values(fields, kind='mergesort').reset_index(drop=True)
+
+    create_folder_if_not_exists(data_folder)
+    np.save(data_folder + 'X.npy', data[feature_fields].to_numpy(dtype=np.float64))
+    np.save(data_folder + 'y.npy', data['Result'].to_numpy(dtype=np.float64))
+
+    partitions = []
+    for keys, indexes in data.groupby(fields, sort=False).indices.items():
+        keys = keys if isinstance(keys, tuple) else (keys,)
+        start, stop = int(indexes[0]), int(indexes[-1]) + 1
+        partitions.append({'keys': dict(zip(fields, [str(key) for key in keys])), 'start': start,
+                           'test_start': stop - int(round(test_size * (stop - start))), 'stop': stop})
+
+    return partitions
+
+
+def train_partition(data_folder, partition, algorithm, output_folder):
+    """
+    Train and score a model for a single partition, catching any failure so it is reported with the other partitions.
+
+    :param string data_folder: location of the shared arrays
+    :param dict partition: keys and the start, test start and stop index of the records of the partition
+    :param string algorithm: name of the algorithm (see algorithms)
+    :param string output_folder: location of the output / results (a folder is created for the partition)
+    :return: Summary with the keys, algorithm, number of records, scores, time taken (in seconds) and any error
+    :rtype: dict
+    """
+    start_time = time.time()
+    summary = dict(partition['keys'], algorithm=algorithm, train_records=partition['test_start'] - partition['start'],
+                   test_records=partition['stop'] - partition['test_start'], mse=np.nan, score=np.nan, seconds=0.0,
+                   error='')
+
+    try:
+        if summary['train_records'] < min_partition_records:
+            raise ValueError('Not enough records to train: ' + str(summary['train_records']))
+
+        # map the shared arrays (slices are views, so only the pages used are read)
+        X = np.load(data_folder + 'X.npy', mmap_mode='r')
+        y = np.load(data_folder + 'y.npy', mmap_mode='r')
+        train = slice(partition['start'], partition['test_start'])
+        test = slice(partition['test_start'], partition['stop'])
+
+        folder = output_folder + '/partitions/' + '/'.join(partition['keys'].values())
+        create_folder_if_not_exists(folder)
+
+        # cross validation runs in a single job, as partitions already run in parallel
+        summary['mse'], summary['score'] = algorithms[algorithm](X[train], X[test], y[train], y[test], folder, n_jobs=1)
+    except Exception:
+        summary['error'] = traceback.format_exc()
+
+    summary['seconds'] = time.time() - start_time
+
+    return summary
+
+
+def train_partition_models(data_folder, partition, algorithm_names, output_folder):
+    """
+    Train and score the models of a single partition one after the other, as they write to the same results folder.
+
+    :param string data_folder: location of the shared arrays
+    :param dict partition: keys and the start, test start and stop index of the records of the partition
+    :param list[str] algorithm_names: names of the algorithms (see algorithms)
+    :param string output_folder: location of the output / results (a folder is created for the partition)
+    :return: Summary of each algorithm (see train_partition)
+    :rtype: list[dict]
+    """
+    return [train_partition(data_folder, partition, algorithm, output_folder) for algorithm in algorithm_names]
+
+
+def run_partitioned(datasets, output_folder, fields=partition_fields, workers=None, algorithm_names=None):
+    """
+    Train a model for each partition of the duration data of all sites concurrently.
+
+    :param dict datasets: location of the duration dataset by site
+    :param string output_folder: location of the output / results
+    :param list[str] fields: fields partitioning the data ('site' and/or feature fields, e.g. 'Phase')
+    :param int workers: number of worker processes (defaults to the number of cores)
+    :param list[str] algorithm_names: names of the algorithms trained for each partition (defaults to all algorithms)
+    :return: Summary of each partition and algorithm (keys, records, scores, seconds and error)
+    :rtype: dataframe
+    """
+    data_folder = output_folder + '/partitions/data/'
+    partitions = share_partitions(datasets, data_folder, fields)
+    algorithm_names = algorithm_names or list(algorithms)
+    workers = workers or os.cpu_count()
+    print("Training", len(partitions) * len(algorithm_names), "models with", workers, "workers...")
+    start_time = time.time()
+
+    summaries = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(train_partition_models, data_folder, partition, algorithm_names, output_folder)
+                   for partition in partitions]
+        for future in as_completed(futures):
+            for summary in future.result():
+                status = 'failed' if summary['error'] else 'done'
+                print("Partition", ', '.join(summary[field] for field in fields), summary['algorithm'], status, "in",
+                      "{:.1f}".format(summary['seconds']), "seconds")
+                summaries.append(summary)
+
+    # report scores and timing of each partition and failures
+    summary_df = pd.DataFrame(summaries, columns=fields + ['algorithm', 'train_records', 'test_records', 'mse',
+                                                          'score', 'seconds', 'error'])
+    summary_df = summary_df.sort_values(fields + ['algorithm']).reset_index(drop=True)
+    file = save_df(summary_df, output_folder + '/models/partition_summary', storage='csv')
+
+    failures = summary_df[summary_df['error'] != '']
+    for index, failure in failures.iterrows():
+        print("Partition", ', '.join(failure[field] for field in fields), failure['algorithm'], "failed:")
+        print(failure['error'])
+
+    print("Training complete!", len(summary_df) - len(failures), "of", len(summary_df), "models trained in",
+          "{:.1f}".format(time.time() - start_time), "seconds (summary: " + file + ")")
+
+    return summary_df
@@ -0,0 +1,396 @@
+# Copyright 2017 Priscilla Boyd. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""
+    The Search module finds the parameters of the decision tree models within a budget, by:
+
+    -  Evaluating all combinations of parameters with few resources (training records or estimators) first.
+    -  Keeping only the best combinations for the next round, with more resources (i.e. successive halving).
+    -  Stopping once the time or number of evaluations allowed is used, keeping the best combination found.
+
+    Combinations can be evaluated with time ordered cross validation (expanding or rolling window), so no fold is
+    trained on records more recent than those it is tested on. Time ordered folds are ranges of records (views of the
+    training data), evaluated for all combinations at once on a pool of workers.
+"""
+
+import time
+import numpy as np
+from joblib import Parallel, delayed, effective_n_jobs
+from sklearn.base import clone
+from sklearn.model_selection import GridSearchCV, ParameterGrid, cross_val_score
+
+# declare types of search available
+search_types = ['grid', 'halving']
+
+# declare types of cross validation available ('kfold' ignores the time order of the records)
+cv_types = ['kfold', 'expanding', 'rolling']
+
+
+def get_time_folds(num_records, n_splits=5, cv_type='expanding'):
+    """
+    Get time ordered folds: the records are divided in n_splits + 1 blocks, and each fold is tested on a block and
+    trained on the blocks before it (all of them for an expanding window, or up to half of the blocks for a rolling
+    window).
+
+    :param int num_records: number of training records (in time order)
+    :param int n_splits: number of folds
+    :param string cv_type: type of cross validation ('expanding' or 'rolling')
+    :return: Start and stop of the training and test records of each fold
+    :rtype: list[tuple]
+    """
+    if cv_type not in cv_types[1:]:
+        raise ValueError('Unknown type of time ordered cross validation: ' + str(cv_type))
+
+    block_size = num_records // (n_splits + 1)
+    if block_size == 0:
+        raise ValueError('Not enough records (' + str(num_records) + ') for ' + str(n_splits) + ' folds')
+
+    window = (n_splits + 1) // 2 if cv_type == 'rolling' else n_splits
+    folds = []
+    for index in range(1, n_splits + 1):
+        test_stop = num_records if index == n_splits else (index + 1) * block_size
+        folds.append((max(0, index - window) * block_size, index * block_size, index * block_size, test_stop))
+
+    return folds
+
+
+def evaluate_fold(estimator, params, X, y, fold, fit_params=None):
+    """
+    Fit and score a combination of parameters on a time ordered fold, using views of the records of the fold.
+
+    :param object estimator: model reference
+    :param dict params: parameters of the model
+    :param ndarray X: training examples
+    :param ndarray y: training targets
+    :param tuple fold: start and stop of the training and test records of the fold (see get_time_folds)
+    :param dict fit_params: parameters passed to the fit of the model (e.g. a validation set)
+    :return: Score on the test records of the fold and time taken (in seconds)
+    :rtype: float, float
+    """
+    start_time = time.time()
+    train, test = slice(fold[0], fold[1]), slice(fold[2], fold[3])
+    model = clone(estimator).set_params(**params).fit(X[train], y[train], **(fit_params or {}))
+
+    return model.score(X[test], y[test]), time.time() - start_time
+
+
+def evaluate_candidate(estimator, params, X, y, cv, fit_params=None):
+    """
+    Evaluate a combination of parameters using cross validation.
+
+    :param object estimator: model reference
+    :param dict params: parameters of the model
+    :param ndarray X: training examples
+    :param ndarray y: training targets
+    :param object cv: number of folds (k-fold) or time ordered folds (see get_time_folds)
+    :param dict fit_params: parameters passed to the fit of the model (e.g. a validation set)
+    :return: Scores of each fold and time taken (in seconds)
+    :rtype: ndarray, float
+    """
+    start_time = time.time()
+    if isinstance(cv, int):
+        scores = cross_val_score(clone(estimator).set_params(**params), X, y, cv=cv, params=fit_params)
+    else:
+        scores = np.array([evaluate_fold(estimator, params, X, y, fold, fit_params)[0] for fold in cv])
+
+    return scores, time.time() - start_time
+
+
+class BestEstimatorSearch(object):
+    """
+    Search of parameters predicting and scoring with the best model found (best_estimator_, set by fit).
+    """
+
+    def predict(self, X):
+        """
+        Predict using the best model found.
+
+        :param dataframe X: examples
+        :return: Predictions
+        :rtype: ndarray
+        """
+        return self.best_estimator_.predict(np.asarray(X))
+
+    def score(self, X, y):
+        """
+        Score the best model found (coefficient of determination, as the model score).
+
+        :param dataframe X: examples
+        :param dataframe y: targets
+        :return: Score
+        :rtype: float
+        """
+        return self.best_estimator_.score(np.asarray(X), np.asarray(y))
+
+
+class TimeSeriesGridSearchCV(BestEstimatorSearch):
+    """
+    Search of all combinations of parameters with time ordered cross validation, with the same interface as
+    GridSearchCV (fit, predict, score, best_params_, best_estimator_ and cv_results_).
+
+    Each fold of each combination is a separate task on the pool of workers. The training data is converted to arrays
+    once and shared by all tasks (large arrays are memory-mapped by the workers rather than copied to each task).
+
+    :param object estimator: model reference
+    :param dict param_grid: values of each parameter to be searched
+    :param string cv_type: type of cross validation ('expanding' or 'rolling')
+    :param int cv: number of folds
+    :param int n_jobs: number of jobs run in parallel (-1 to use all cores)
+    """
+
+    def __init__(self, estimator, param_grid, cv_type='expanding', cv=5, n_jobs=-1):
+        self.estimator = estimator
+        self.param_grid = param_grid
+        self.cv_type = cv_type
+        self.cv = cv
+        self.n_jobs = n_jobs
+
+    def __repr__(self):
+        return 'TimeSeriesGridSearchCV(estimator=' + repr(self.estimator) + ', cv_type=' + repr(self.cv_type) + \
+               ', cv=' + repr(self.cv) + ')'
+
+    def fit(self, X, y, **fit_params):
+        """
+        Search the best parameters and refit the model with them on all training data.
+
+        :param dataframe X: training examples (in time order)
+        :param dataframe y: training targets (in time order)
+        :param fit_params: parameters passed to each fit of the model (e.g. a validation set, used as given)
+        :return: Search with the best parameters found
+        :rtype: TimeSeriesGridSearchCV
+        """
+        start_time = time.time()
+        X = np.ascontiguousarray(X)
+        y = np.ascontiguousarray(y)
+        candidates = list(ParameterGrid(self.param_grid))
+        folds = get_time_folds(len(y), self.cv, self.cv_type)
+
+        evaluations = Parallel(n_jobs=self.n_jobs)(
+            delayed(evaluate_fold)(self.estimator, params, X, y, fold, fit_params)
+            for params in candidates for fold in folds)
+        scores = np.array([score for score, seconds in evaluations]).reshape(len(candidates), len(folds))
+        seconds = np.array([seconds for score, seconds in evaluations]).reshape(len(candidates), len(folds))
+
+        results = {'params': candidates, 'mean_test_score': scores.mean(axis=1), 'std_test_score': scores.std(axis=1),
+                   'mean_fit_time': seconds.mean(axis=1)}
+        for index in range(len(folds)):
+            results['split' + str(index) + '_test_score'] = scores[:, index]
+        results['rank_test_score'] = np.empty(len(candidates), dtype=int)
+        results['rank_test_score'][np.argsort(-scores.mean(axis=1), kind='stable')] = np.arange(1, len(candidates) + 1)
+        self.cv_results_ = results
+
+        best_index = int(np.argmax(results['mean_test_score']))
+        self.best_score_, self.best_params_ = results['mean_test_score'][best_index], candidates[best_index]
+        self.best_estimator_ = clone(self.estimator).set_params(**self.best_params_).fit(X, y, **fit_params)
+        self.elapsed_ = time.time() - start_time
+        print("Search complete!", len(evaluations), "fold evaluations in", "{:.1f}".format(self.elapsed_),
+              "seconds, best parameters:", self.best_params_)
+
+        return self
+
+
+class BudgetedSearchCV(BestEstimatorSearch):
+    """
+    Search of parameters by successive halving within a time and/or evaluation budget, with the same interface as
+    GridSearchCV (fit, predict, score, best_params_, best_estimator_ and cv_results_).
+
+    Each round evaluates the remaining combinations with 'factor' times more resources than the previous round and
+    keeps the best 1/factor of them. If the budget runs out, the best combination of the last round evaluated is used.
+
+    :param object estimator: model reference
+    :param dict param_grid: values of each parameter to be searched
+    :param string resource: resource increased at each round ('n_samples' or a parameter such as 'n_estimators')
+    :param int min_resources: resources used in the first round
+    :param int max_resources: resources used in the last round (defaults to all records for 'n_samples')
+    :param int factor: proportion of combinations discarded (and resources added) at each round
+    :param float max_seconds: time budget (in seconds), or None for no time limit
+    :param int max_evaluations: evaluation budget (cross validations of a combination), or None for no limit
+    :param int cv: number of folds
+    :param string cv_type: type of cross validation ('kfold', 'expanding' or 'rolling')
+    :param int n_jobs: number of jobs run in parallel (-1 to use all cores)
+    :param int random_state: seed used to select the records of each round (k-fold only, time ordered cross
+        validation uses the most recent records)
+    """
+
+    def __init__(self, estimator, param_grid, resource='n_samples', min_resources=None, max_resources=None, factor=3,
+                 max_seconds=None, max_evaluations=None, cv=5, cv_type='kfold', n_jobs=-1, random_state=0):
+        self.estimator = estimator
+        self.param_grid = param_grid
+        self.resource = resource
+        self.min_resources = min_resources
+        self.max_resources = max_resources
+        self.factor = factor
+        self.max_seconds = max_seconds
+        self.max_evaluations = max_evaluations
+        self.cv = cv
+        self.cv_type = cv_type
+        self.n_jobs = n_jobs
+        self.random_state = random_state
+
+    def __repr__(self):
+        return 'BudgetedSearchCV(estimator=' + repr(self.estimator) + ', resource=' + repr(self.resource) + \
+               ', max_seconds=' + repr(self.max_seconds) + ', max_evaluations=' + repr(self.max_evaluations) + ')'
+
+    def get_resources(self, num_records):
+        """
+        Get the resources used in each round, so the last round uses the maximum resources.
+
+        :param int num_records: number of training records
+        :return: Resources of each round
+        :rtype: list[int]
+        """
+        max_resources = self.max_resources or (num_records if self.resource == 'n_samples' else 100)
+        min_resources = self.min_resources or (self.cv * 20 if self.resource == 'n_samples' else 10)
+        num_rounds = int(np.ceil(np.log(len(ParameterGrid(self.param_grid))) / np.log(self.factor))) + 1
+        resources = [int(max_resources / self.factor ** index) for index in reversed(range(num_rounds))]
+
+        return [resource for resource in resources if resource >= min(min_resources, max_resources)]
+
+    def budget_left(self, start_time, num_evaluations):
+        """
+        Check whether there is any budget left.
+
+        :param float start_time: time the search started
+        :param int num_evaluations: evaluations done so far
+        :return: True if more evaluations can be done
+        :rtype: boolean
+        """
+        if self.max_seconds is not None and time.time() - start_time >= self.max_seconds:
+            return False
+
+        return self.max_evaluations is None or num_evaluations < self.max_evaluations
+
+    def fit(self, X, y, **fit_params):
+        """
+        Search the best parameters and refit the model with them on all training data (and maximum resources).
+
+        :param dataframe X: training examples
+        :param dataframe y: training targets
+        :param fit_params: parameters passed to each fit of the model (e.g. a validation set, used as given)
+        :return: Search with the best parameters found
+        :rtype: BudgetedSearchCV
+        """
+        start_time = time.time()
+        X = np.asarray(X)
+        y = np.asarray(y)
+        random_state = np.random.RandomState(self.random_state)
+        batch_size = max(1, effective_n_jobs(self.n_jobs))
+
+        candidates = list(ParameterGrid(self.param_grid))
+        results = {'iter': [], 'n_resources': [], 'params': [], 'mean_test_score': [], 'std_test_score': [],
+                   'mean_fit_time': []}
+        num_evaluations = 0
+        best_round = []
+
+        for iteration, resources in enumerate(self.get_resources(len(y))):
+            if not self.budget_left(start_time, num_evaluations):
+                break
+
+            # use a subset of the records (the most recent ones for time ordered folds, as the records are in time
+            # order), or give the model more resources (e.g. more estimators)
+            if self.resource == 'n_samples' and self.cv_type != 'kfold':
+                X_round, y_round, round_params = X[-resources:], y[-resources:], {}
+            elif self.resource == 'n_samples':
+                records = np.sort(random_state.choice(len(y), min(resources, len(y)), replace=False))
+                X_round, y_round, round_params = X[records], y[records], {}
+            else:
+                X_round, y_round, round_params = X, y, {self.resource: resources}
+            cv = self.cv if self.cv_type == 'kfold' else get_time_folds(len(y_round), self.cv, self.cv_type)
+
+            # evaluate combinations in batches (one per job), checking the budget after each batch
+            round_results = []
+            for index in range(0, len(candidates), batch_size):
+                if not self.budget_left(start_time, num_evaluations):
+                    break
+                batch = candidates[index:index + batch_size]
+                if self.max_evaluations is not None:
+                    batch = batch[:self.max_evaluations - num_evaluations]
+                evaluations = Parallel(n_jobs=self.n_jobs)(
+                    delayed(evaluate_candidate)(self.estimator, dict(params, **round_params), X_round, y_round, cv,
+                                                fit_params) for params in batch)
+                num_evaluations += len(batch)
+
+                for params, (scores, seconds) in zip(batch, evaluations):
+                    round_results.append((np.mean(scores), params))
+                    results['iter'].append(iteration)
+                    results['n_resources'].append(resources)
+                    results['params'].append(dict(params, **round_params))
+                    results['mean_test_score'].append(np.mean(scores))
+                    results['std_test_score'].append(np.std(scores))
+                    results['mean_fit_time'].append(seconds / self.cv)
+
+            if not round_results:
+                break
+
+            # keep the best combinations for the next round
+            round_results.sort(key=lambda result: result[0], reverse=True)
+            best_round = round_results
+            candidates = [params for score, params in round_results[:max(1, len(round_results) // self.factor)]]
+            if len(round_results) == 1:
+                break
+
+        if not best_round:
+            raise ValueError('Budget too small to evaluate any combination of parameters')
+
+        self.best_score_, self.best_params_ = best_round[0]
+        self.n_evaluations_ = num_evaluations
+
+        # rank combinations by the resources used, then by score
+        results['rank_test_score'] = np.empty(len(results['params']), dtype=int)
+        order = np.lexsort((-np.array(results['mean_test_score']), -np.array(results['n_resources'])))
+        results['rank_test_score'][order] = np.arange(1, len(order) + 1)
+        self.cv_results_ = results
+
+        # refit on all training data with maximum resources
+        refit_params = dict(self.best_params_)
+        if self.resource != 'n_samples':
+            refit_params[self.resource] = self.get_resources(len(y))[-1]
+        self.best_estimator_ = clone(self.estimator).set_params(**refit_params).fit(X, y, **fit_params)
+        self.elapsed_ = time.time() - start_time
+        print("Search complete!", num_evaluations, "evaluations in", "{:.1f}".format(self.elapsed_),
+              "seconds, best parameters:", refit_params)
+
+        return self
+
+
+def get_search(estimator, param_grid, n_jobs=-1, search='grid', resource='n_samples', max_seconds=None,
+               max_evaluations=None, cv_type='kfold'):
+    """
+    Get the search of parameters for a model, either exhaustive (grid) or by successive halving within a budget.
+
+    :param object estimator: model reference
+    :param dict param_grid: values of each parameter to be searched
+    :param int n_jobs: number of jobs run in parallel (-1 to use all cores)
+    :param string search: type of search ('grid' or 'halving')
+    :param string resource: resource increased at each round of the halving search
+    :param float max_seconds: time budget (in seconds) of the halving search
+    :param int max_evaluations: evaluation budget of the halving search
+    :param string cv_type: type of cross validation ('kfold', or 'expanding' / 'rolling' for time ordered records)
+    :return: Search (with the GridSearchCV interface)
+    :rtype: object
+    """
+    if search not in search_types:
+        raise ValueError('Unknown type of search: ' + str(search))
+    if cv_type not in cv_types:
+        raise ValueError('Unknown type of cross validation: ' + str(cv_type))
+
+    if search == 'grid' and cv_type == 'kfold':
+        return GridSearchCV(estimator, param_grid, n_jobs=n_jobs)
+
+    if search == 'grid':
+        return TimeSeriesGridSearchCV(estimator, param_grid, cv_type=cv_type, n_jobs=n_jobs)
+
+    return BudgetedSearchCV(estimator, param_grid, resource=resource, max_seconds=max_seconds,
+                            max_evaluations=max_evaluations, cv_type=cv_type, n_jobs=n_jobs)
@@ -14,11 +14,38 @@
 # ==============================================================================
 """
     The Main module runs the Recurrent Neural Network using Long Short-Term Memory architecture.
+
+    Windows can either be loaded into memory or streamed from the dataset file (for datasets larger than memory).
 """
 
 from neural_network.RNN_LSTM import run_rnn
 from tools.Utils import get_latest_dataset
 
+# stream windows from the dataset file (set to False to load all windows into memory)
+streaming = False
+
+# use the state of each phase and the detector channels as features (set to False to use the Result field only)
+multivariate = False
+
+# phases and I/O fields used as features by a multivariate model (set to None to use all of them)
+stage_list = None
+io_fields = None
+
+# number of future seconds predicted in a single forward pass (set to 1 to predict the next second only)
+horizon = 1
+
+# maximum number of epochs, and number of epochs without improvement of the validation loss before training stops
+num_epochs = 100
+patience = 5
+
+# resume training from the last checkpoint of a previous (e.g. interrupted) run
+resume = True
+
+# type of the weights exported for inference without Keras ('float32' or 'int8', set to None to save the Keras model
+# only)
+export_type = None
+
 if __name__ == '__main__':
     data = get_latest_dataset()
-    run_rnn(data)
+    run_rnn(data, streaming=streaming, multivariate=multivariate, stage_list=stage_list, io_fields=io_fields,
+            export_type=export_type, horizon=horizon, num_epochs=num_epochs, patience=patience, resume=resume)
@@ -0,0 +1,102 @@
+# Copyright 2017 Priscilla Boyd. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""
+    The RNN_Checkpoint module keeps track of the checkpoints saved while training the recurrent neural network, by:
+
+    -  Finding the last checkpoint saved and the number of epochs it completed, so training resumes from it.
+    -  Finding the best validation loss of the epochs logged, so a resumed run only keeps a better model.
+    -  Clearing the checkpoints of a previous run (e.g. once training is complete).
+"""
+
+import glob
+import os
+import re
+import pandas as pd
+from tools.Utils import create_folder_if_not_exists
+
+# declare names of the checkpoint files (the latest, saved every few epochs, and the best by validation loss)
+checkpoint_file = 'RNN_checkpoint_{epoch:04d}.h5'
+best_checkpoint_file = 'RNN_best.h5'
+training_log_file = 'RNN_training_log.csv'
+
+
+def get_last_checkpoint(checkpoint_folder):
+    """
+    Get the last checkpoint saved during training.
+
+    :param string checkpoint_folder: location of the checkpoints
+    :return: Location of the last checkpoint (or None if there are no checkpoints) and number of epochs completed
+    :rtype: string, int
+    """
+    checkpoints = {}
+    for file in glob.glob(checkpoint_folder + checkpoint_file.split('{')[0] + '*.h5'):
+        match = re.search(r'_(\d+)\.h5$', file)
+        if match:
+            checkpoints[int(match.group(1))] = file
+
+    if not checkpoints:
+        return None, 0
+
+    return checkpoints[max(checkpoints)], max(checkpoints)
+
+
+def load_checkpoint(checkpoint_folder, resume=True, load_function=None):
+    """
+    Load the last checkpoint (weights and optimiser state) to resume training, or clear checkpoints of a previous run.
+
+    :param string checkpoint_folder: location of the checkpoints
+    :param boolean resume: Indicates whether training resumes from the last checkpoint (if any)
+    :param function load_function: function loading a checkpoint (defaults to loading a Keras model)
+    :return: Model (or None if training starts from scratch) and number of epochs completed (i.e. the initial epoch)
+    :rtype: object, int
+    """
+    create_folder_if_not_exists(checkpoint_folder)
+    file, epoch = get_last_checkpoint(checkpoint_folder)
+
+    if file is not None and resume:
+        if load_function is None:
+            from keras.models import load_model as load_function
+        print("Resuming training from checkpoint " + file + " after epoch", epoch)
+        return load_function(file), epoch
+
+    clear_checkpoints(checkpoint_folder)
+
+    return None, 0
+
+
+def get_best_loss(checkpoint_folder):
+    """
+    Get the best validation loss of the epochs logged so far (e.g. by an interrupted run).
+
+    :param string checkpoint_folder: location of the checkpoints
+    :return: Best validation loss, or None if no epoch has been logged
+    :rtype: float
+    """
+    log_file = checkpoint_folder + training_log_file
+    if not os.path.exists(log_file) or os.path.getsize(log_file) == 0:
+        return None
+
+    return float(pd.read_csv(log_file)['val_loss'].min())
+
+
+def clear_checkpoints(checkpoint_folder):
+    """
+    Remove the checkpoints and training log (e.g. once training is complete and the model saved).
+
+    :param string checkpoint_folder: location of the checkpoints
+    """
+    for file in os.listdir(checkpoint_folder):
+        os.remove(checkpoint_folder + file)
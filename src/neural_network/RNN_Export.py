@@ -0,0 +1,233 @@
+# Copyright 2017 Priscilla Boyd. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""
+    The RNN_Export module runs a trained LSTM model without Keras (e.g. on roadside units without a GPU), by:
+
+    -  Exporting the weights of the LSTM and Dense layers to a compressed NumPy file, optionally quantised to int8.
+    -  Predicting with a NumPy implementation of the layers, reproducing the Keras predictions within a tolerance.
+    -  Benchmarking latency, memory and cold start of the exported model against the Keras model.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import time
+import numpy as np
+from neural_network.RNN_Inference import activations, get_model_layers, lstm_gates
+
+# declare maximum absolute difference from the Keras predictions for each type of export
+export_tolerance = {'float32': 1e-4, 'int8': 5e-2}
+
+
+def quantize(weights):
+    """
+    Quantise weights to int8, using a symmetric scale for each output column.
+
+    :param ndarray weights: weights (one column per output)
+    :return: Quantised weights and scale of each column
+    :rtype: ndarray, ndarray
+    """
+    scale = np.abs(weights).max(axis=0) / 127.0
+    scale[scale == 0] = 1.0
+    quantized = np.clip(np.round(weights / scale), -127, 127).astype(np.int8)
+
+    return quantized, scale.astype(np.float32)
+
+
+def export_model(model, file, weight_type='float32'):
+    """
+    Export the layers of a Keras model to a compressed NumPy file (npz).
+
+    :param object model: Keras model (e.g. from build_model)
+    :param string file: location of the exported model
+    :param string weight_type: type of the kernels ('float32' or 'int8', biases are always kept as float32)
+    :return: Location of the exported model
+    :rtype: string
+    """
+    if weight_type not in export_tolerance:
+        raise ValueError('Unknown type of export: ' + weight_type)
+
+    layers = get_model_layers(model)
+    arrays = {}
+    for index, layer in enumerate(layers):
+        for weight_index, weights in enumerate(layer['weights']):
+            name = 'layer' + str(index) + '_' + str(weight_index)
+            if weight_type == 'int8' and weights.ndim == 2:
+                arrays[name], arrays[name + '_scale'] = quantize(weights)
+            else:
+                arrays[name] = weights
+
+    # keep the description of the layers (without weights) as JSON
+    description = [{key: value for key, value in layer.items() if key != 'weights'} for layer in layers]
+    arrays['layers'] = np.array(json.dumps(description))
+
+    with open(file, 'wb') as model_file:
+        np.savez_compressed(model_file, **arrays)
+
+    return file
+
+
+def load_exported(file):
+    """
+    Load the layers of an exported model, restoring quantised weights to float32.
+
+    :param string file: location of the exported model
+    :return: Layers of the model (see get_model_layers)
+    :rtype: list[dict]
+    """
+    layers = []
+    with np.load(file) as arrays:
+        for index, layer in enumerate(json.loads(str(arrays['layers']))):
+            layer['weights'] = []
+            name = 'layer' + str(index) + '_' + str(len(layer['weights']))
+            while name in arrays:
+                weights = arrays[name].astype(np.float32)
+                if name + '_scale' in arrays:
+                    weights *= arrays[name + '_scale']
+                layer['weights'].append(weights)
+                name = 'layer' + str(index) + '_' + str(len(layer['weights']))
+            layers.append(layer)
+
+    return layers
+
+
+def predict(layers, X):
+    """
+    Predict with the layers of a model, running each LSTM layer over the whole window.
+
+    :param list[dict] layers: layers of the model (see get_model_layers)
+    :param ndarray X: examples with shape (samples, sequence length, features)
+    :return: Predictions, one row per example
+    :rtype: ndarray
+    """
+    x = np.asarray(X, dtype=np.float32)
+
+    for layer in layers:
+        if layer['type'] == 'lstm':
+            kernel, recurrent_kernel, bias = layer['weights']
+            units = recurrent_kernel.shape[0]
+            h = np.zeros((x.shape[0], units), dtype=np.float32)
+            c = np.zeros((x.shape[0], units), dtype=np.float32)
+
+            # project the inputs of all steps at once, leaving only the recurrent part to each step
+            inputs = x @ kernel + bias
+            outputs = []
+            for step in range(x.shape[1]):
+                h, c = lstm_gates(inputs[:, step] + h @ recurrent_kernel, c, layer['activation'],
+                                  layer['recurrent_activation'])
+                outputs.append(h)
+            x = np.stack(outputs, axis=1) if layer['return_sequences'] else h
+        elif layer['type'] == 'dense':
+            x = activations[layer['activation']](x @ layer['weights'][0] + layer['weights'][1])
+        else:
+            x = activations[layer['activation']](x)
+
+    return x
+
+
+def get_export_difference(model, layers, X):
+    """
+    Get the largest difference between the predictions of a Keras model and an exported model.
+
+    :param object model: Keras model
+    :param list[dict] layers: layers of the exported model (see load_exported)
+    :param ndarray X: examples with shape (samples, sequence length, features)
+    :return: Maximum absolute difference between the predictions
+    :rtype: float
+    """
+    return float(np.abs(model.predict(X).reshape(-1) - predict(layers, X).reshape(-1)).max())
+
+
+def measure_cold_start(script, *args):
+    """
+    Measure the time taken to load a model and make the first prediction in a new process, with its peak memory.
+
+    :param string script: Python code loading the model and predicting (with arguments in sys.argv)
+    :param args: arguments of the script
+    :return: Cold start (in seconds) and peak memory (in MB)
+    :rtype: float, float
+    """
+    # peak memory is taken from /proc where available, as the peak kept by getrusage includes the parent process
+    code = 'import resource, sys, time\nstart = time.time()\n' + script + '\nseconds = time.time() - start\n' \
+           'try:\n    status = open("/proc/self/status").read().split("VmHWM:")[1]\n' \
+           '    max_rss = int(status.split()[0])\n' \
+           'except (OSError, IndexError):\n    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss\n' \
+           'print(seconds, max_rss)'
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    output = subprocess.check_output([sys.executable, '-c', code] + [str(arg) for arg in args], env=env,
+                                     stderr=subprocess.DEVNULL)
+    seconds, max_rss = output.decode().split()[-2:]
+
+    return float(seconds), float(max_rss) / 1024
+
+
+def measure_latency(predict_function, X, repeats):
+    """
+    Measure the median time taken by a prediction.
+
+    :param function predict_function: function predicting the examples
+    :param ndarray X: examples with shape (samples, sequence length, features)
+    :param int repeats: number of predictions measured
+    :return: Median latency (in milliseconds)
+    :rtype: float
+    """
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        predict_function(X)
+        times.append(time.perf_counter() - start)
+
+    return float(np.median(times) * 1000)
+
+
+def benchmark_export(model_file, export_file, sequence_length=20, repeats=100):
+    """
+    Compare latency (for a single window), peak memory, cold start and file size of the Keras and exported models.
+
+    :param string model_file: location of the Keras model (h5 file)
+    :param string export_file: location of the exported model
+    :param int sequence_length: Sequence length (temporal window) used by the model
+    :param int repeats: number of predictions measured
+    :return: Results of the benchmark for each model, with the largest difference between their predictions
+    :rtype: dataframe
+    """
+    # Keras and pandas are only needed to compare models (the exported model needs NumPy only)
+    import pandas as pd
+    from keras.models import load_model
+
+    model = load_model(model_file)
+    layers = load_exported(export_file)
+    n_features = layers[0]['weights'][0].shape[0]
+    X = np.random.randint(0, 4, (1, sequence_length - 1, n_features)).astype(np.float32)
+
+    keras_script = 'import numpy as np\nfrom keras.models import load_model\n' \
+                   'load_model(sys.argv[1]).predict(np.zeros((1, int(sys.argv[2]), int(sys.argv[3]))))'
+    numpy_script = 'import numpy as np\nfrom neural_network.RNN_Export import load_exported, predict\n' \
+                   'predict(load_exported(sys.argv[1]), np.zeros((1, int(sys.argv[2]), int(sys.argv[3]))))'
+    keras_cold_start, keras_memory = measure_cold_start(keras_script, model_file, sequence_length - 1, n_features)
+    numpy_cold_start, numpy_memory = measure_cold_start(numpy_script, export_file, sequence_length - 1, n_features)
+
+    results = pd.DataFrame({'model': ['keras', 'export'],
+                            'file_size_kb': [os.path.getsize(model_file) / 1024, os.path.getsize(export_file) / 1024],
+                            'cold_start_s': [keras_cold_start, numpy_cold_start],
+                            'peak_memory_mb': [keras_memory, numpy_memory],
+                            'latency_ms': [measure_latency(model.predict_on_batch, X, repeats),
+                                           measure_latency(lambda x: predict(layers, x), X, repeats)],
+                            'max_difference': [0.0, get_export_difference(model, layers, X)]})
+    print(results.to_string(index=False))
+
+    return results
@@ -0,0 +1,161 @@
+# Copyright 2017 Priscilla Boyd. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""
+    The RNN_Features module prepares multivariate inputs for the recurrent neural network, by:
+
+    -  Packing the state of each phase and the detector (I/O) channels of each second into a single row of features.
+    -  Building windows of features over time, so a single model predicts the state of all phases of the junction.
+"""
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from tools.Utils import io_field_prefix, load_dataset, timestamp_field
+
+# declare type of the features
+feature_type = np.float32
+
+
+def get_features(df, stage_list=None, io_fields=None):
+    """
+    Pack the dataset into a matrix of features with one row per second: the state of each phase followed by the
+    detector channels.
+
+    A phase without a record for a second keeps its previous state.
+
+    :param dataframe df: dataset with Timestamp, Result, Phase and (optionally) I/O fields
+    :param list[str] stage_list: list of stage names used as features (defaults to all phases in the dataset)
+    :param list[str] io_fields: names of the I/O fields used as features (defaults to all I/O fields in the dataset)
+    :return: Features (one row per second, one column per feature) and names of the features
+    :rtype: ndarray, list[str]
+    """
+    if stage_list is None:
+        stage_list = sorted(df['Phase'].astype(str).unique())
+    if io_fields is None:
+        io_fields = [field for field in df.columns if str(field).startswith(io_field_prefix)]
+
+    # give each record the position of its second and phase
+    time_index, times = pd.factorize(df[timestamp_field], sort=True)
+    # (phases not in the stage list have no column, so they are left out)
+    phase_index = pd.Index(stage_list).get_indexer(df['Phase'].astype(str))
+    known = phase_index >= 0
+
+    # place the state of each phase in its column, carrying states forward for missing records
+    features = np.full((len(times), len(stage_list) + len(io_fields)), np.nan, dtype=feature_type)
+    features[time_index[known], phase_index[known]] = df['Result'].to_numpy()[known]
+    features[:, :len(stage_list)] = pd.DataFrame(features[:, :len(stage_list)]).ffill().fillna(0).to_numpy()
+
+    # detector channels are the same for all phases of a second, so take the first record of each second
+    if io_fields:
+        first = np.unique(time_index, return_index=True)[1]
+        features[:, len(stage_list):] = df[io_fields].to_numpy(dtype=feature_type)[first]
+
+    return features, list(stage_list) + list(io_fields)
+
+
+def get_windows(features, sequence_length):
+    """
+    Get windows of features over time, as a view over the features (i.e. without copying data).
+
+    :param ndarray features: features (one row per second, one column per feature), or a single value per second
+    :param int sequence_length: Sequence length (temporal window) to be used
+    :return: Windows with shape (samples, sequence length, features), or (samples, sequence length) for single values
+    :rtype: ndarray
+    """
+    if len(features) <= sequence_length:
+        raise ValueError('Not enough records (' + str(len(features)) + ') for sequence length ' +
+                         str(sequence_length))
+
+    windows = sliding_window_view(features, sequence_length, axis=0)[:len(features) - sequence_length]
+
+    return np.moveaxis(windows, -1, 1)
+
+
+def split_windows(windows, sequence_length, num_targets=None):
+    """
+    Split windows into examples (the first sequence length - 1 steps) and targets (the steps after the examples, one
+    for each horizon).
+
+    :param ndarray windows: windows of a single value (samples, steps) or of features (samples, steps, features)
+    :param int sequence_length: Sequence length (temporal window) to be used
+    :param int num_targets: number of features used as targets (the first features, defaults to all features)
+    :return: Examples with shape (samples, sequence length - 1, features) and targets, with shape (samples,) for a
+        single target or (samples, horizon x targets) otherwise
+    :rtype: ndarray, ndarray
+    """
+    if windows.ndim == 2:
+        windows = windows[:, :, np.newaxis]
+
+    X = windows[:, :sequence_length - 1]
+    y = windows[:, sequence_length - 1:, :num_targets]
+    y = y[:, 0, 0] if y.shape[1] * y.shape[2] == 1 else y.reshape(len(y), -1)
+
+    return X, y
+
+
+def split_test_training_windows(windows, sequence_length, num_targets=None):
+    """
+    Divide windows between test and training examples: the first 80% of the windows for training (shuffled) and the
+    most recent 20% for test, copying only the training windows.
+
+    :param ndarray windows: windows of a single value (samples, steps) or of features (samples, steps, features)
+    :param int sequence_length: Sequence length (temporal window) to be used
+    :param int num_targets: number of features used as targets (the first features, defaults to all features)
+    :return: Training examples (X_train), training targets (y_train), test examples (X_test) and test targets (y_test)
+    :rtype: ndarray, ndarray, ndarray, ndarray
+    """
+    row = int(round(0.8 * windows.shape[0]))
+    X_train, y_train = split_windows(windows[np.random.permutation(row)], sequence_length, num_targets)
+    X_test, y_test = split_windows(windows[row:], sequence_length, num_targets)
+
+    return [X_train, y_train, X_test, y_test]
+
+
+def split_test_training_values(values, sequence_length, horizon=1):
+    """
+    Split a series of values (e.g. the Result field) between test and training examples, using the values in the
+    seconds after each window as targets.
+
+    :param ndarray values: values in time order
+    :param int sequence_length: Sequence length (temporal window) to be used
+    :param int horizon: number of future values predicted (1 to predict the next value only)
+    :return: Training examples (X_train), training targets (y_train), test examples (X_test) and test targets (y_test)
+    :rtype: ndarray, ndarray, ndarray, ndarray
+    """
+    windows = get_windows(np.asarray(values, dtype=feature_type), sequence_length + horizon - 1)
+
+    return split_test_training_windows(windows, sequence_length)
+
+
+def split_test_training_features(data_path, sequence_length, stage_list=None, io_fields=None, horizon=1):
+    """
+    Split multivariate data between test and training examples, using the state of all phases in the seconds after
+    each window as targets.
+
+    :param string data_path: Location of data (in any storage format)
+    :param int sequence_length: Sequence length (temporal window) to be used
+    :param list[str] stage_list: list of stage names used as features and targets (defaults to all phases)
+    :param list[str] io_fields: names of the I/O fields used as features (defaults to all I/O fields)
+    :param int horizon: number of future seconds predicted (targets are ordered by second, then phase)
+    :return: Training examples (X_train), training targets (y_train), test examples (X_test), test targets (y_test)
+        and names of the features
+    :rtype: ndarray, ndarray, ndarray, ndarray, list[str]
+    """
+    features, names = get_features(load_dataset(data_path), stage_list, io_fields)
+    num_targets = len([name for name in names if not name.startswith(io_field_prefix)])
+    windows = get_windows(features, sequence_length + horizon - 1)
+
+    return split_test_training_windows(windows, sequence_length, num_targets) + [names]
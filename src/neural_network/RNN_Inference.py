@@ -0,0 +1,240 @@
+# Copyright 2017 Priscilla Boyd. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""
+    The RNN_Inference module predicts with a trained LSTM model one second at a time, by:
+
+    -  Keeping the hidden and cell state of each LSTM layer for each junction.
+    -  Advancing the state by a single step for each new observation (instead of running a whole window again).
+    -  Saving and restoring the state of all junctions, so a restart does not need a warm-up period.
+"""
+
+import os
+import numpy as np
+
+# declare activations used by the layers of the model (as defined by Keras)
+activations = {'linear': lambda x: x,
+               'tanh': np.tanh,
+               'sigmoid': lambda x: 1.0 / (1.0 + np.exp(-x)),
+               'hard_sigmoid': lambda x: np.clip(0.2 * x + 0.5, 0.0, 1.0),
+               'relu': lambda x: np.maximum(x, 0.0)}
+
+
+def get_model_layers(model):
+    """
+    Get the weights and activations of the layers of a Keras model, ignoring layers not used for inference (dropout).
+
+    :param object model: Keras model built with LSTM, Dense, Activation and Dropout layers
+    :return: Layers with their type ('lstm', 'dense' or 'activation'), weights and activations (and whether LSTM
+        layers return the whole sequence)
+    :rtype: list[dict]
+    """
+    layers = []
+    for layer in model.layers:
+        config = layer.get_config()
+        layer_type = type(layer).__name__
+        weights = [np.asarray(weight, dtype=np.float32) for weight in layer.get_weights()]
+
+        if layer_type == 'LSTM':
+            layers.append({'type': 'lstm', 'weights': weights, 'activation': config['activation'],
+                           'recurrent_activation': config['recurrent_activation'],
+                           'return_sequences': config['return_sequences']})
+        elif layer_type == 'Dense':
+            layers.append({'type': 'dense', 'weights': weights, 'activation': config['activation']})
+        elif layer_type == 'Activation':
+            layers.append({'type': 'activation', 'weights': [], 'activation': config['activation']})
+        elif layer_type != 'Dropout':
+            raise ValueError('Layer not supported for streaming inference: ' + layer_type)
+
+    return layers
+
+
+def lstm_gates(z, c, activation, recurrent_activation):
+    """
+    Apply the gates of an LSTM layer (using the Keras order of gates: input, forget, cell and output).
+
+    :param ndarray z: inputs and hidden state projected by the kernels (plus bias), one row per junction
+    :param ndarray c: cell state, one row per junction
+    :param string activation: name of the activation
+    :param string recurrent_activation: name of the recurrent activation
+    :return: New hidden and cell state
+    :rtype: ndarray, ndarray
+    """
+    z_i, z_f, z_c, z_o = np.split(z, 4, axis=1)
+
+    gate = activations[recurrent_activation]
+    c = gate(z_f) * c + gate(z_i) * activations[activation](z_c)
+    h = gate(z_o) * activations[activation](c)
+
+    return h, c
+
+
+def lstm_step(x, h, c, weights, activation, recurrent_activation):
+    """
+    Advance an LSTM layer by a single step.
+
+    :param ndarray x: inputs, one row per junction
+    :param ndarray h: hidden state, one row per junction
+    :param ndarray c: cell state, one row per junction
+    :param list[ndarray] weights: kernel, recurrent kernel and bias of the layer
+    :param string activation: name of the activation
+    :param string recurrent_activation: name of the recurrent activation
+    :return: New hidden and cell state
+    :rtype: ndarray, ndarray
+    """
+    kernel, recurrent_kernel, bias = weights
+
+    return lstm_gates(x @ kernel + h @ recurrent_kernel + bias, c, activation, recurrent_activation)
+
+
+class StreamingPredictor(object):
+    """
+    Stateful predictor advancing the LSTM state of each junction by one step for each new observation, so each update
+    costs the same regardless of the sequence length used in training.
+
+    Unlike a prediction over a window, the state summarises all observations since the junction was first seen (or
+    since its state was reset).
+
+    :param list[dict] layers: layers of the model (see get_model_layers)
+    """
+
+    def __init__(self, layers):
+        self.layers = layers
+        self.lstm_units = [layer['weights'][1].shape[0] for layer in layers if layer['type'] == 'lstm']
+        self.junctions = {}
+        self.h = [np.zeros((0, units), dtype=np.float32) for units in self.lstm_units]
+        self.c = [np.zeros((0, units), dtype=np.float32) for units in self.lstm_units]
+
+    @classmethod
+    def from_model(cls, model):
+        """
+        Create a predictor using the weights of a trained Keras model.
+
+        :param object model: Keras model (e.g. from build_model)
+        :return: Streaming predictor
+        :rtype: StreamingPredictor
+        """
+        return cls(get_model_layers(model))
+
+    def get_rows(self, junction_ids):
+        """
+        Get the rows holding the state of each junction, adding a zero state for junctions not seen before.
+
+        :param list[str] junction_ids: identifiers of the junctions
+        :return: Row of each junction
+        :rtype: ndarray
+        """
+        new_ids = [junction_id for junction_id in dict.fromkeys(junction_ids) if junction_id not in self.junctions]
+        if new_ids:
+            for junction_id in new_ids:
+                self.junctions[junction_id] = len(self.junctions)
+            self.h = [np.vstack([h, np.zeros((len(new_ids), h.shape[1]), dtype=np.float32)]) for h in self.h]
+            self.c = [np.vstack([c, np.zeros((len(new_ids), c.shape[1]), dtype=np.float32)]) for c in self.c]
+
+        return np.array([self.junctions[junction_id] for junction_id in junction_ids], dtype=np.int64)
+
+    def update_many(self, junction_ids, observations):
+        """
+        Advance the state of several junctions by one step, predicting the next value of each junction.
+
+        :param list[str] junction_ids: identifiers of the junctions (each at most once)
+        :param ndarray observations: new observation of each junction, one row per junction (one column per feature)
+        :return: Prediction for each junction, one row per junction
+        :rtype: ndarray
+        """
+        rows = self.get_rows(junction_ids)
+        x = np.asarray(observations, dtype=np.float32).reshape(len(rows), -1)
+
+        lstm_index = 0
+        for layer in self.layers:
+            if layer['type'] == 'lstm':
+                h, c = lstm_step(x, self.h[lstm_index][rows], self.c[lstm_index][rows], layer['weights'],
+                                 layer['activation'], layer['recurrent_activation'])
+                self.h[lstm_index][rows] = h
+                self.c[lstm_index][rows] = c
+                x = h
+                lstm_index += 1
+            elif layer['type'] == 'dense':
+                x = activations[layer['activation']](x @ layer['weights'][0] + layer['weights'][1])
+            else:
+                x = activations[layer['activation']](x)
+
+        return x
+
+    def update(self, junction_id, observation):
+        """
+        Advance the state of a junction by one step, predicting its next value.
+
+        :param string junction_id: identifier of the junction
+        :param object observation: new observation (a value, or one value per feature)
+        :return: Prediction (one value per output)
+        :rtype: ndarray
+        """
+        return self.update_many([junction_id], np.atleast_1d(observation)[np.newaxis])[0]
+
+    def reset(self, junction_id):
+        """
+        Reset the state of a junction (e.g. after a gap in its observations).
+
+        :param string junction_id: identifier of the junction
+        """
+        if junction_id in self.junctions:
+            row = self.junctions[junction_id]
+            for h, c in zip(self.h, self.c):
+                h[row] = 0
+                c[row] = 0
+
+    def checkpoint(self, file):
+        """
+        Save the state of all junctions, replacing any previous checkpoint in a single step.
+
+        :param string file: location of the checkpoint (npz file)
+        """
+        state = {'junctions': np.array(list(self.junctions), dtype=str)}
+        for index in range(len(self.lstm_units)):
+            state['h' + str(index)] = self.h[index]
+            state['c' + str(index)] = self.c[index]
+
+        with open(file + '.tmp', 'wb') as state_file:
+            np.savez(state_file, **state)
+        os.replace(file + '.tmp', file)
+
+    def restore(self, file):
+        """
+        Restore the state of all junctions from a checkpoint.
+
+        :param string file: location of the checkpoint (npz file)
+        """
+        with np.load(file) as state:
+            units = [state['h' + str(index)].shape[1] for index in range(len(self.lstm_units))]
+            if units != self.lstm_units:
+                raise ValueError('Checkpoint does not match the layers of the model: ' + file)
+
+            self.junctions = {str(junction_id): row for row, junction_id in enumerate(state['junctions'])}
+            self.h = [state['h' + str(index)] for index in range(len(self.lstm_units))]
+            self.c = [state['c' + str(index)] for index in range(len(self.lstm_units))]
+
+
+def load_predictor(model_file):
+    """
+    Create a predictor from a model saved to h5 file (see run_rnn).
+
+    :param string model_file: location of the model file
+    :return: Streaming predictor
+    :rtype: StreamingPredictor
+    """
+    from keras.models import load_model
+
+    return StreamingPredictor.from_model(load_model(model_file))
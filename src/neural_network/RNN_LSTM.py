@@ -16,65 +16,53 @@
     The RNN_LSTM module implements a recurrent neural network using LSTM.
 """
 
-import csv
+import os
+import time
 import numpy as np
+import pandas as pd
 from keras.layers.core import Dense, Activation, Dropout
 from keras.layers.recurrent import LSTM
-from keras.models import Sequential
-from tools.Utils import current_dt, get_latest_dataset_folder, get_latest_dataset
+from keras.callbacks import CSVLogger, EarlyStopping, ModelCheckpoint
+from keras.models import Sequential, load_model
+from neural_network.RNN_Checkpoint import best_checkpoint_file, checkpoint_file, training_log_file, clear_checkpoints, \
+    get_best_loss, load_checkpoint
+from neural_network.RNN_Export import export_model, export_tolerance, get_export_difference, load_exported
+from neural_network.RNN_Features import feature_type, split_test_training_features, split_test_training_values, \
+    split_windows
+from neural_network.RNN_Stream import get_window_ranges, get_steps, stream_windows, window_batches
+from tools.Registry import register_model
+from tools.Utils import current_dt, get_latest_dataset_folder, get_latest_dataset, load_df
 
-
-def split_test_training(data_path, sequence_length):
+def split_test_training(data_path, sequence_length, horizon=1):
     """
     Split data between test and training examples.
 
-    :param string data_path: Location of CSV-formatted data
+    :param string data_path: Location of data (in any storage format)
     :param int sequence_length: Sequence length (temporal window) to be used
+    :param int horizon: number of future values predicted (1 to predict the next value only)
     :return: Training examples (X_train), training targets (y_train), test examples (X_test) and test targets (y_test)
-    :rtype: dataframe, dataframe, dataframe, dataframe
+    :rtype: ndarray, ndarray, ndarray, ndarray
     """
 
-    # logic for loading the CSV, using 'result' (2nd) column as basis for prediction
-    with open(data_path) as f:
-        record = csv.reader(f, delimiter=",")
-        next(record, None)
-        spat = []
-        nb_of_values = 0
-        for line in record:
-            spat.append(float(line[2]))
-            nb_of_values += 1
-
-    # break file into chunks based on sequence length
-    result = []
-    for index in range(len(spat) - sequence_length):
-        result.append(spat[index: index + sequence_length])
-    result = np.array(result)
-
-    # divide set into 20% for test, 80% for training
-    row = int(round(0.8 * result.shape[0]))
-    train = result[:row, :]
-    np.random.shuffle(train)
-    X_train = train[:, :-1]
-    y_train = train[:, -1]
-    X_test = result[row:, :-1]
-    y_test = result[row:, -1]
-    X_train = np.reshape(X_train, (X_train.shape[0], X_train.shape[1], 1))
-    X_test = np.reshape(X_test, (X_test.shape[0], X_test.shape[1], 1))
-
-    return [X_train, y_train, X_test, y_test]
-
-
-def build_model():
+    # logic for loading the data, using 'result' column as basis for prediction
+    spat = load_df(data_path, fields=['Result'])['Result'].to_numpy()
+
+    return split_test_training_values(spat, sequence_length, horizon)
+
+
+def build_model(n_features=1, n_outputs=1):
     """
     Build the learning RNN model using Keras (Sequential) module.
 
+    :param int n_features: Number of features in each time step of the input
+    :param int n_outputs: Number of values predicted (e.g. the state of each phase)
     :return: RNN model
     :rtype: History object
     """
     model = Sequential()
 
-    # declare the sizes of the layers (1d input and output)
-    layers = [1, 50, 100, 1]
+    # declare the sizes of the layers (input and output sizes given by the features and targets)
+    layers = [n_features, 50, 100, n_outputs]
 
     # first hidden layer, using linear activation (not specified)
     model.add(LSTM(layers[1], input_shape=(None, layers[0]), return_sequences=True))
@@ -95,37 +83,212 @@ def build_model():
     return model
 
 
-def run_rnn(file):
-    # define model params
+def get_callbacks(checkpoint_folder, patience, checkpoint_period):
+    """
+    Get callbacks saving checkpoints (the latest every few epochs and the best by validation loss), stopping when the
+    validation loss no longer improves and logging each epoch.
+
+    :param string checkpoint_folder: location of the checkpoints
+    :param int patience: number of epochs without improvement of the validation loss before training stops
+    :param int checkpoint_period: number of epochs between checkpoints
+    :return: Callbacks for training
+    :rtype: list
+    """
+    best_checkpoint = ModelCheckpoint(checkpoint_folder + best_checkpoint_file, monitor='val_loss',
+                                      save_best_only=True)
+
+    # when resuming, only replace the best checkpoint with a better one
+    best_loss = get_best_loss(checkpoint_folder)
+    if best_loss is not None:
+        best_checkpoint.best = best_loss
+
+    return [ModelCheckpoint(checkpoint_folder + checkpoint_file, period=checkpoint_period),
+            best_checkpoint,
+            EarlyStopping(monitor='val_loss', patience=patience),
+            CSVLogger(checkpoint_folder + training_log_file, append=True)]
+
+
+def fit_streaming(model, file, sequence_length, ranges, num_epochs, batch_size, horizon=1, callbacks=None,
+                  initial_epoch=0):
+    """
+    Train a model streaming windows from the dataset file, so the dataset does not need to fit in memory.
+
+    :param object model: RNN model
+    :param string file: Location of dataset file (in any storage format)
+    :param int sequence_length: Sequence length (temporal window) to be used
+    :param dict ranges: ranges of windows used for training and validation (see get_window_ranges)
+    :param int num_epochs: Number of epochs
+    :param int batch_size: Number of windows in each batch
+    :param int horizon: number of future values predicted
+    :param list callbacks: callbacks for training
+    :param int initial_epoch: number of epochs already completed (when resuming training)
+    """
+    model.fit_generator(window_batches(file, sequence_length, ranges['train'], batch_size, horizon),
+                        steps_per_epoch=get_steps(ranges['train'], batch_size), epochs=num_epochs,
+                        validation_data=window_batches(file, sequence_length, ranges['validation'], batch_size,
+                                                       horizon, shuffle=False),
+                        validation_steps=get_steps(ranges['validation'], batch_size), callbacks=callbacks,
+                        initial_epoch=initial_epoch)
+
+
+def predict_streaming(model, file, sequence_length, ranges, batch_size, horizon=1):
+    """
+    Predict and evaluate a model streaming the test windows from the dataset file (in order).
+
+    :param object model: RNN model
+    :param string file: Location of dataset file (in any storage format)
+    :param int sequence_length: Sequence length (temporal window) to be used
+    :param dict ranges: range of windows used for test (see get_window_ranges)
+    :param int batch_size: Number of windows in each batch
+    :param int horizon: number of future values predicted
+    :return: Expected (test) targets, predictions and associated scores
+    :rtype: ndarray, ndarray, object
+    """
+    test_steps = get_steps(ranges['test'], batch_size)
+    predict = model.predict_generator(window_batches(file, sequence_length, ranges['test'], batch_size, horizon,
+                                                     shuffle=False, epochs=1), steps=test_steps)
+    score = model.evaluate_generator(window_batches(file, sequence_length, ranges['test'], batch_size, horizon,
+                                                    shuffle=False, epochs=1), steps=test_steps)
+    y_test = np.concatenate([split_windows(windows, sequence_length)[1]
+                             for windows in stream_windows(file, sequence_length + horizon - 1, *ranges['test'])])
+    predict = np.reshape(predict, y_test.shape)
+
+    return y_test, predict, score
+
+
+def get_horizon_scores(y_test, predict, horizon):
+    """
+    Score predictions for each horizon (i.e. number of seconds ahead).
+
+    :param ndarray y_test: expected (test) targets, ordered by horizon (then by phase for multivariate models)
+    :param ndarray predict: predictions, in the same order as the targets
+    :param int horizon: number of future values predicted
+    :return: Mean squared error, mean absolute error and accuracy (of the rounded predictions) for each horizon
+    :rtype: dataframe
+    """
+    y_test = np.reshape(y_test, (len(y_test), horizon, -1))
+    error = np.reshape(predict, y_test.shape) - y_test
+
+    return pd.DataFrame({'horizon': np.arange(1, horizon + 1),
+                         'mse': np.mean(error ** 2, axis=(0, 2)),
+                         'mae': np.mean(np.abs(error), axis=(0, 2)),
+                         'accuracy': np.mean(np.round(error) == 0, axis=(0, 2))})
+
+
+def run_rnn(file, sequence_length=20, streaming=False, multivariate=False, stage_list=None, io_fields=None,
+            export_type=None, horizon=1, num_epochs=100, patience=5, checkpoint_period=1, resume=True,
+            checkpoint_folder=None):
     """
     Run the process to train/test a recurrent neural network using LSTM using a given dataset file.
 
-    :param string file: Location of CSV-formatted dataset file
+    A univariate model predicts the next Result value(s) of the dataset, while a multivariate model uses the state of
+    each phase and the detector channels to predict the next state(s) of all phases at once. With a horizon over 1,
+    the values of all future seconds up to the horizon are predicted in a single forward pass.
+
+    Training saves checkpoints (weights and optimiser state) so an interrupted run resumes from the last checkpoint,
+    and stops once the validation loss no longer improves, keeping the best model. Checkpoints are removed once the
+    model is saved.
+
+    :param string file: Location of dataset file (in any storage format)
+    :param int sequence_length: Sequence length (temporal window) to be used
+    :param boolean streaming: Indicates whether windows are streamed from the file (for datasets larger than memory)
+    :param boolean multivariate: Indicates whether the phases and detector channels are used as features
+    :param list[str] stage_list: list of stage names used by a multivariate model (defaults to all phases)
+    :param list[str] io_fields: names of the I/O fields used by a multivariate model (defaults to all I/O fields)
+    :param string export_type: type of the weights exported for inference without Keras ('float32' or 'int8'), or
+        None to save the Keras model only
+    :param int horizon: number of future seconds predicted (1 to predict the next second only)
+    :param int num_epochs: maximum number of epochs (training normally stops earlier, once the validation loss no
+        longer improves)
+    :param int patience: number of epochs without improvement of the validation loss before training stops
+    :param int checkpoint_period: number of epochs between checkpoints
+    :param boolean resume: Indicates whether training resumes from the last checkpoint (otherwise checkpoints of a
+        previous run are removed)
+    :param string checkpoint_folder: location of the checkpoints (defaults to a folder with the data)
     :return: Model with expected (test) targets and associated scores
     :rtype: object, dataframe, object
     """
-    num_epochs = 2
-    sequence_length = 20
+    if streaming and multivariate:
+        raise ValueError('Streaming is only available for univariate models')
+
+    # define model params
+    batch_size = 64
+
+    # features of the model (the Result field, unless multivariate)
+    features = ['Result']
+
+    # resume from the last checkpoint (if any), saving checkpoints with the data by default
+    if checkpoint_folder is None:
+        checkpoint_folder = get_latest_dataset_folder() + '/checkpoints/'
+    model, initial_epoch = load_checkpoint(checkpoint_folder, resume)
+    callbacks = get_callbacks(checkpoint_folder, patience, checkpoint_period)
+    start_time = time.time()
+
+    if streaming:
+        ranges = get_window_ranges(file, sequence_length, horizon)
+        if model is None:
+            model = build_model(n_outputs=horizon)
+        fit_streaming(model, file, sequence_length, ranges, num_epochs, batch_size, horizon, callbacks, initial_epoch)
+    else:
+        # grab train and test data from the dataset
+        if multivariate:
+            X_train, y_train, X_test, y_test, features = split_test_training_features(file, sequence_length,
+                                                                                      stage_list, io_fields, horizon)
+            print("Features:", ', '.join(features))
+        else:
+            X_train, y_train, X_test, y_test = split_test_training(file, sequence_length, horizon)
 
-    # grab train and test data from CSV
-    X_train, y_train, X_test, y_test = split_test_training(file, sequence_length)
+        print(X_train)
 
-    print(X_train)
+        # build model
+        if model is None:
+            model = build_model(X_train.shape[2], y_train.shape[1] if y_train.ndim > 1 else 1)
+        model.fit(X_train, y_train, epochs=num_epochs, batch_size=batch_size, validation_split=0.2,
+                  callbacks=callbacks, initial_epoch=initial_epoch)
 
-    # build model
-    model = build_model()
-    model.fit(X_train, y_train, epochs=num_epochs, batch_size=64, validation_split=0.2)
+    train_seconds = time.time() - start_time
 
-    # predict
-    predict = model.predict(X_test)
-    predict = np.reshape(predict, predict.size)
+    # continue with the best model found (by validation loss)
+    if os.path.exists(checkpoint_folder + best_checkpoint_file):
+        model = load_model(checkpoint_folder + best_checkpoint_file)
+
+    if streaming:
+        y_test, predict, score = predict_streaming(model, file, sequence_length, ranges, batch_size, horizon)
+        X_test = next(window_batches(file, sequence_length, ranges['test'], 1000, horizon, shuffle=False,
+                                     epochs=1))[0]
+    else:
+        # predict
+        predict = model.predict(X_test)
+        predict = np.reshape(predict, y_test.shape)
+
+        # evaluate
+        score = model.evaluate(X_test, y_test, verbose=0)
 
-    # evaluate
-    score = model.evaluate(X_test, y_test, verbose=0)
     print("Accuracy: ", score[1]*100, "%")
+    if horizon > 1:
+        print(get_horizon_scores(y_test, predict, horizon).to_string(index=False))
 
     # save model to h5 file (same folder as data)
     model_location_folder = get_latest_dataset_folder()
-    model.save(model_location_folder + '/RNN_' + current_dt + '.h5')
+    model_name = 'RNN_' + current_dt
+    files = {'estimator': model_name + '.h5'}
+    model.save(model_location_folder + '/' + files['estimator'])
+
+    # training is complete, so the next run starts from scratch
+    clear_checkpoints(checkpoint_folder)
+
+    # export model for inference without Keras, checking it reproduces the predictions
+    if export_type is not None:
+        files['export'] = model_name + '_' + export_type + '.npz'
+        export_file = export_model(model, model_location_folder + '/' + files['export'], export_type)
+        difference = get_export_difference(model, load_exported(export_file), X_test[:1000])
+        print("Model exported to " + export_file + " (maximum difference:", difference, ", tolerance:",
+              export_tolerance[export_type], ")")
+
+    # add the model to the index of models, with its features, scores and training time
+    feature_types = [np.dtype(feature_type).name] * len(features)
+    register_model(model_location_folder, model_name, 'rnn', files, features, feature_types,
+                   {'loss': score[0], 'accuracy': score[1]}, train_seconds,
+                   {'sequence_length': sequence_length, 'horizon': horizon, 'streaming': streaming})
 
     return model, y_test, predict
@@ -0,0 +1,234 @@
+# Copyright 2017 Priscilla Boyd. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""
+    The RNN_Stream module streams training data for the recurrent neural network from a dataset that may not fit in
+    memory, by:
+
+    -  Reading the dataset in chunks and building windows on the fly (including windows crossing two chunks).
+    -  Shuffling windows through a bounded buffer.
+    -  Preparing batches on a background thread, so they are ready when the model requests them.
+"""
+
+import math
+import queue
+import threading
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from neural_network.RNN_Features import split_windows
+from tools.Utils import chunk_size, count_records, stream_dataset
+
+# declare number of windows kept in the shuffle buffer and number of batches prepared in advance
+shuffle_buffer_size = 10000
+prefetch_size = 10
+
+
+def get_window_ranges(file, sequence_length, horizon=1, test_split=0.2, validation_split=0.2):
+    """
+    Get the ranges of windows used for training, validation and test (in time order, as per split_test_training).
+
+    :param string file: location of the dataset (in any storage format)
+    :param int sequence_length: Sequence length (temporal window) to be used
+    :param int horizon: number of future values predicted
+    :param float test_split: fraction of windows used for test (the most recent windows)
+    :param float validation_split: fraction of the training windows used for validation (the most recent ones)
+    :return: Start and stop index of the training, validation and test windows
+    :rtype: dict
+    """
+    num_windows = count_records(file) - (sequence_length + horizon - 1)
+    if num_windows <= 0:
+        raise ValueError('Not enough records for sequence length ' + str(sequence_length) + ' and horizon ' +
+                         str(horizon))
+
+    row = int(round((1 - test_split) * num_windows))
+    validation_row = row - int(round(validation_split * row))
+
+    return {'train': (0, validation_row), 'validation': (validation_row, row), 'test': (row, num_windows)}
+
+
+def stream_windows(file, window_length, start, stop, size=chunk_size):
+    """
+    Stream the windows of the Result field starting between two records, carrying the end of each chunk over so
+    windows crossing two chunks are included.
+
+    :param string file: location of the dataset (in any storage format)
+    :param int window_length: number of values in each window (examples and targets)
+    :param int start: index of the first window
+    :param int stop: index after the last window
+    :param int size: maximum number of records read at a time
+    :return: Generator of windows (a view over each chunk, one row per window)
+    :rtype: generator
+    """
+    carry = np.empty(0, dtype=np.float32)
+    first = 0
+
+    for chunk in stream_dataset(file, fields=['Result'], size=size):
+        values = np.concatenate([carry, chunk['Result'].to_numpy(dtype=np.float32)])
+        if len(values) >= window_length:
+            # windows in this chunk start at record 'first' (i.e. the first carried record)
+            windows = sliding_window_view(values, window_length)
+            yield windows[max(start - first, 0):max(stop - first, 0)]
+
+            carry = values[len(windows):]
+            first += len(windows)
+        else:
+            carry = values
+
+        if first >= stop:
+            break
+
+
+def shuffle_windows(windows, buffer_size, random_state):
+    """
+    Shuffle a stream of windows through a bounded buffer: each new window replaces a window taken at random from the
+    buffer, so only the buffer (and not the whole dataset) is kept in memory.
+
+    :param generator windows: stream of windows (one row per window)
+    :param int buffer_size: maximum number of windows kept in the buffer
+    :param object random_state: numpy random generator
+    :return: Generator of shuffled windows
+    :rtype: generator
+    """
+    buffer = None
+    filled = 0
+
+    for block in windows:
+        if buffer is None:
+            buffer = np.empty((buffer_size, block.shape[1]), dtype=block.dtype)
+
+        # fill the buffer first, then swap each new window for a random window in the buffer
+        taken = min(buffer_size - filled, len(block))
+        buffer[filled:filled + taken] = block[:taken]
+        filled += taken
+
+        for index in range(taken, len(block), buffer_size):
+            new_windows = block[index:index + buffer_size]
+            slots = random_state.choice(buffer_size, len(new_windows), replace=False)
+            yield buffer[slots]
+            buffer[slots] = new_windows
+
+    # empty the buffer in random order
+    if filled > 0:
+        yield buffer[:filled][random_state.permutation(filled)]
+
+
+def batch_windows(windows, batch_size, sequence_length):
+    """
+    Group a stream of windows into batches of examples and targets (the values after the examples).
+
+    :param generator windows: stream of windows (one row per window)
+    :param int batch_size: number of windows in each batch (the last batch may be smaller)
+    :param int sequence_length: Sequence length (temporal window) to be used
+    :return: Generator of examples (with shape (batch, sequence length - 1, 1)) and targets (see split_windows)
+    :rtype: generator
+    """
+    remainder = None
+
+    for block in windows:
+        # complete the batch left over from the previous block
+        if remainder is not None:
+            needed = batch_size - len(remainder)
+            remainder = np.concatenate([remainder, block[:needed]])
+            block = block[needed:]
+            if len(remainder) < batch_size:
+                continue
+            yield split_windows(remainder, sequence_length)
+            remainder = None
+
+        # take batches directly from the block (without copying), keeping the rest for the next block
+        num_full = len(block) // batch_size * batch_size
+        for index in range(0, num_full, batch_size):
+            batch = block[index:index + batch_size]
+            yield split_windows(batch, sequence_length)
+        if num_full < len(block):
+            remainder = np.array(block[num_full:])
+
+    if remainder is not None:
+        yield split_windows(remainder, sequence_length)
+
+
+def prefetch(generator, size=prefetch_size):
+    """
+    Run a generator on a background thread, keeping up to a given number of items ready.
+
+    :param generator generator: generator to run in the background
+    :param int size: maximum number of items prepared in advance
+    :return: Generator with the same items
+    :rtype: generator
+    """
+    items = queue.Queue(maxsize=size)
+    end = object()
+
+    def produce():
+        try:
+            for item in generator:
+                items.put((item, None))
+            items.put((end, None))
+        except Exception as error:
+            items.put((end, error))
+
+    threading.Thread(target=produce, daemon=True).start()
+
+    while True:
+        item, error = items.get()
+        if error is not None:
+            raise error
+        if item is end:
+            return
+        yield item
+
+
+def get_steps(window_range, batch_size):
+    """
+    Get the number of batches needed to go through a range of windows once.
+
+    :param tuple window_range: start and stop index of the windows
+    :param int batch_size: number of windows in each batch
+    :return: Number of batches
+    :rtype: int
+    """
+    return int(math.ceil((window_range[1] - window_range[0]) / float(batch_size)))
+
+
+def window_batches(file, sequence_length, window_range, batch_size, horizon=1, shuffle=True, epochs=None, seed=None,
+                   size=chunk_size):
+    """
+    Stream batches of examples and targets from a dataset, going through the range of windows once per epoch.
+
+    :param string file: location of the dataset (in any storage format)
+    :param int sequence_length: Sequence length (temporal window) to be used
+    :param tuple window_range: start and stop index of the windows
+    :param int batch_size: number of windows in each batch
+    :param int horizon: number of future values predicted
+    :param boolean shuffle: Indicates whether windows are shuffled (through a bounded buffer)
+    :param int epochs: number of times to go through the windows (None to repeat indefinitely, as used by Keras)
+    :param int seed: seed of the random generator used to shuffle
+    :param int size: maximum number of records read at a time
+    :return: Generator of examples (with shape (batch, sequence length - 1, 1)) and targets, prepared in background
+    :rtype: generator
+    """
+    random_state = np.random.default_rng(seed)
+
+    def generate():
+        epoch = 0
+        while epochs is None or epoch < epochs:
+            windows = stream_windows(file, sequence_length + horizon - 1, window_range[0], window_range[1], size=size)
+            if shuffle:
+                windows = shuffle_windows(windows, shuffle_buffer_size, random_state)
+            for batch in batch_windows(windows, batch_size, sequence_length):
+                yield batch
+            epoch += 1
+
+    return prefetch(generate())
@@ -0,0 +1,125 @@
+# Copyright 2017 Priscilla Boyd. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""The Batch module pre-processes data for several sites (junctions) by:
+
+    -  Reading a manifest with the raw data, configuration file and identifier of each site.
+    -  Running the pre-processing pipeline of each site concurrently on a process pool, using a folder per site.
+    -  Reporting the time taken by each site and any failures.
+"""
+
+import os
+import time
+import traceback
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from preprocessing.Incremental import run_incremental
+from preprocessing.Pipeline import Pipeline
+from tools.Utils import root_path, results_folder, save_df, sites_folder
+
+# declare fields of the manifest
+manifest_fields = ['raw_data', 'cfg_file', 'site_id']
+
+
+def load_manifest(manifest):
+    """
+    Load the manifest listing the sites to be processed.
+
+    :param string manifest: location of the CSV-formatted manifest (relative to the 'config' folder), with raw_data,
+        cfg_file and site_id fields
+    :return: List of sites, each with raw_data, cfg_file and site_id
+    :rtype: list[dict]
+    """
+    sites = pd.read_csv(root_path + '/config/' + manifest, header=0, skipinitialspace=True, usecols=manifest_fields,
+                        dtype=str)
+
+    return sites.to_dict('records')
+
+
+def process_site(raw_data, cfg_file, site_id, output_folder, incremental=False):
+    """
+    Pre-process the data of a single site, catching any failure so it is reported with the other sites.
+
+    :param string raw_data: location of CSV-formatted raw data
+    :param string cfg_file: location of the configuration file
+    :param string site_id: identifier of the site (e.g. 'e80374')
+    :param string output_folder: location of the output / results (a folder is created for the site, which keeps its
+        watermark if processed incrementally)
+    :param boolean incremental: Indicates whether only records after the watermark of the site are processed
+    :return: Summary with the site, number of records in the dataset (or appended to it, if processed incrementally),
+        time taken (in seconds) and any error
+    :rtype: dict
+    """
+    start_time = time.time()
+    summary = {'site_id': site_id, 'records': 0, 'seconds': 0.0, 'error': ''}
+
+    try:
+        if incremental:
+            state = run_incremental(raw_data, cfg_file, site_id, site_folder=output_folder + site_id + '/')
+            summary['records'] = state['records']
+        else:
+            outputs = Pipeline(raw_data, cfg_file, output_folder=output_folder + site_id + '/').run()
+            summary['records'] = outputs['dataset'].shape[0]
+    except Exception:
+        summary['error'] = traceback.format_exc()
+
+    summary['seconds'] = time.time() - start_time
+
+    return summary
+
+
+def run_batch(manifest, workers=None, output_folder=None, incremental=False):
+    """
+    Pre-process the data of all sites in a manifest concurrently.
+
+    :param string manifest: location of the CSV-formatted manifest (relative to the 'config' folder)
+    :param int workers: number of worker processes (defaults to the number of cores)
+    :param string output_folder: location of the output / results (a folder is created for each site), by default
+        the results folder of this run, or the sites folder (which keeps the watermarks across runs) if incremental
+    :param boolean incremental: Indicates whether only records after the watermark of each site are processed
+    :return: Summary of each site (site, records, seconds and error)
+    :rtype: dataframe
+    """
+    sites = load_manifest(manifest)
+    output_folder = output_folder or (sites_folder if incremental else results_folder)
+    workers = workers or os.cpu_count()
+    print("Processing", len(sites), "sites with", workers, "workers...")
+    start_time = time.time()
+
+    summaries = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(process_site, site['raw_data'], site['cfg_file'], site['site_id'], output_folder,
+                                   incremental) for site in sites]
+        for future in as_completed(futures):
+            summary = future.result()
+            status = 'failed' if summary['error'] else 'done'
+            print("Site", summary['site_id'], status, "in", "{:.1f}".format(summary['seconds']), "seconds")
+            summaries.append(summary)
+
+    # report timing of each site and failures
+    summary_df = pd.DataFrame(summaries, columns=['site_id', 'records', 'seconds', 'error'])
+    summary_df = summary_df.sort_values('site_id').reset_index(drop=True)
+    save_df(summary_df, output_folder + 'batch_summary', storage='csv')
+
+    for index, failure in summary_df[summary_df['error'] != ''].iterrows():
+        print("Site", failure['site_id'], "failed:")
+        print(failure['error'])
+
+    wall_time = time.time() - start_time
+    print("Batch complete!", len(summary_df) - (summary_df['error'] != '').sum(), "of", len(summary_df),
+          "sites processed in", "{:.1f}".format(wall_time), "seconds (",
+          "{:.1f}".format(summary_df['seconds'].sum()), "seconds of site processing)")
+
+    return summary_df
@@ -15,16 +15,16 @@
 
 """The Cleaner module cleans the data by:
 
-    -  Taking CSV files with stage/phase information and filtering them, leaving date, time, result and phase fields.
+    -  Taking files with stage/phase information and filtering them, leaving date, time, result and phase fields.
     -  Taking individual files for stages (with data/time and result) and merging into a single file.
     -  Removing duplicates from the files merged.
 """
 
 import os
+import time
 import pandas as pd
-from pathlib import Path
-from tools.Utils import create_folder_if_not_exists, output_fields, \
-    raw_output_folder, results_folder
+from tools.Utils import output_fields, raw_output_folder, results_folder, get_storage_locations, load_df, save_df, \
+    find_storage_file
 
 
 def filter_phase_data():
@@ -34,26 +34,20 @@ def filter_phase_data():
     print("Filtering phase data...")
 
     # path to analyse
-    path_list = Path(raw_output_folder).glob('**/*.csv')
+    location_list = get_storage_locations(raw_output_folder)
 
     # loop through files in the given path and store desired fields as array
-    for path in path_list:
-        path_in_str = str(path)
-        file_name = os.path.basename(path_in_str)
-        full_path = results_folder + 'phases/raw/' + file_name
-        data = pd.read_csv(full_path, header=0, skipinitialspace=True, usecols=output_fields)
-        df = pd.DataFrame(data)
-
-        # only output to CSV those which contain some data
+    for location in location_list:
+        file_name = os.path.basename(location)
+        df = load_df(find_storage_file(location), fields=output_fields)
+
+        # only output to file those which contain some data
         if df.shape[0] > 0:
             output_folder = results_folder + 'phases/processed/'
             file_name = 'clean_' + file_name
 
-            # ensure folder exists before creating the file
-            create_folder_if_not_exists(output_folder)
-
             # write output to a file
-            df.to_csv(output_folder + file_name, sep=',')
+            save_df(df, output_folder + file_name)
 
     print("Phase data filtered!")
 
@@ -63,24 +57,37 @@ def combine_phase_data():
         Combine data from processed/filtered data to a single file.
     """
     print("Combining phase data...")
+    start_time = time.time()
+
+    # loop through files in the given path and store data in a list of dfs
+    frames = []
+    location_list = get_storage_locations(results_folder + 'phases/processed/')
+    for location in location_list:
+        frames.append(load_df(find_storage_file(location), fields=output_fields))
+
+    out_df = combine_phase_frames(frames)
+    save_df(out_df, results_folder + 'phases/raw/merged_phases')
 
-    # create an empty data frame
-    out_df = pd.DataFrame([])
+    # report throughput to confirm merging scales linearly with the number of records
+    elapsed = max(time.time() - start_time, 1e-6)
+    print("Data combined!", len(out_df), "records from", len(frames), "files merged at",
+          "{:.0f}".format(len(out_df) / elapsed), "records/s")
 
-    # loop through files in the given path and store data in df
-    path_list = Path(results_folder + 'phases/processed/').glob('**/*.csv')
-    for path in path_list:
-        path_in_str = str(path)
-        file_name = os.path.basename(path_in_str)
-        full_path = results_folder + 'phases/processed/' + file_name
-        data = pd.read_csv(full_path, header=0, skipinitialspace=True, usecols=output_fields)
-        df = pd.DataFrame(data)
-        # append a df to contain only the relevant information in ascending order
-        out_df = df.append(out_df)
-        out_df = out_df.sort_values(['Date', 'Time', 'Phase'], ascending=[True, True, True])
-        out_df.to_csv(results_folder + 'phases/raw/merged_phases.csv', sep=',')
 
-    print("Data combined!")
+def combine_phase_frames(frames):
+    """
+    Combine data frames with phase data into a single data frame in ascending order.
+
+    :param list[dataframe] frames: data frames with phase data
+    :return: Combined phase data
+    :rtype: dataframe
+    """
+
+    # combine all dfs at once and apply a single stable sort, so records already in order are kept in order
+    out_df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame([], columns=output_fields)
+    out_df = out_df.sort_values(['Date', 'Time', 'Phase'], ascending=[True, True, True], kind='mergesort')
+
+    return out_df
 
 
 def remove_duplicates_phase_data():
@@ -88,11 +95,9 @@ def remove_duplicates_phase_data():
         Remove duplicates from the file (i.e. ensuring only one record per second).
     """
     print("Removing any duplicates...")
-    merged_phases_data = pd.read_csv(results_folder + 'phases/raw/merged_phases.csv', header=0,
-                                     skipinitialspace=True, usecols=output_fields)
-    df = pd.DataFrame(merged_phases_data)
+    df = load_df(find_storage_file(results_folder + 'phases/raw/merged_phases'), fields=output_fields)
     clean_df = df.drop_duplicates()
-    clean_df.to_csv(results_folder + 'phases/processed/clean_merged_phases.csv', sep=',', index=False)
+    save_df(clean_df, results_folder + 'phases/processed/clean_merged_phases')
     print("Duplicates removed!")
 
 
@@ -103,3 +108,16 @@ def clean():
     filter_phase_data()
     combine_phase_data()
     remove_duplicates_phase_data()
+
+
+def clean_phase_frames(frames):
+    """
+    Run data cleaning processes in memory, combining phase data and removing duplicates.
+
+    :param list[dataframe] frames: data frames with phase data (e.g. one for each chunk extracted)
+    :return: Clean phase data
+    :rtype: dataframe
+    """
+    phase_df = combine_phase_frames([df[output_fields] for df in frames if df.shape[0] > 0])
+
+    return phase_df.drop_duplicates()
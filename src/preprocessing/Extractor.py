@@ -17,12 +17,24 @@
 
     - Processing a traffic simulator file in the expected CSV format.
     - Outputting results for a phase state (i.e. red = 0, red/amber = 1, amber = 2 or green = 3) using aspect I/O data.
-    - Extracting the relevant detection data and saving it to a separate CSV file.
+    - Extracting the relevant detection data and saving it to a separate file.
 
 """
 
-from tools.Utils import create_folder_if_not_exists, get_detector_fields, convert_raw_data_to_df, results_folder, \
-    raw_output_folder
+import numpy as np
+import pandas as pd
+from tools.Utils import create_folder_if_not_exists, get_detector_fields, get_raw_data_fields, \
+    stream_raw_data_to_df, save_df, results_folder, raw_output_folder, output_fields
+
+# load list of all possible phases
+phase_list = ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H', 'I', 'J']
+
+# declare field used to identify the controller mode (including SUP values)
+mode_field = 'Mode Stream 0'
+
+# declare the state for each aspect code (aspect0 * 4 + aspect1 * 2 + aspect2), i.e. red (100) = 0,
+# red/amber (110) = 1, amber (010) = 2, green (001) = 3 and any other combination as an error (-1)
+aspect_states = np.array([-1, 3, 2, -1, 0, -1, 1, -1], dtype=np.int8)
 
 
 def remove_sup_values(raw_data):
@@ -34,126 +46,151 @@ def remove_sup_values(raw_data):
     :rtype: dataframe
     """
 
-    raw_data = raw_data[~raw_data['Mode Stream 0'].isin(['8 - SUP '])]
+    raw_data = raw_data[~raw_data[mode_field].isin(['8 - SUP '])]
     return raw_data
 
 
-def extract_phase_data(stage_list, df):
+def extract_phase_data(stage_list, df, append=False):
     """
     Extract stage data using stage list and given data frame.
 
     :param list[str] stage_list: list of stage names (e.g. ['A', 'B'])
     :param dataframe df: CSV-formatted data
+    :param boolean append: Indicates whether data is appended to the file of a previous chunk
+    :return: Long-format data frame with the state of each stage (Date, Time, Result and Phase)
+    :rtype: dataframe
     """
 
-    print("Loading stage data...")
+    # decode all stages at once and save as a single long-format file
+    phase_df = decode_phase_states(stage_list, df)
+    save_df(phase_df, raw_output_folder + 'phases_result_out', append=append)
 
-    # iterate over stages to get stats
-    for i in range(len(stage_list)):
-        stage = stage_list[i]
-        df_phase = create_aspect_df(stage, df)
-        process_aspect_df(stage, df_phase)
-        print("Phases for stage " + stage + " extracted!")
+    return phase_df
 
 
-def extract_io_data(detector_fields, df):
+def extract_io_data(detector_fields, df, append=False):
     """
     Extract detection I/O data from a given data frame using pre-defined detector names.
 
     :param list[str] detector_fields: list containing strings associated to the names of each detector
     :param dataframe df: CSV-formatted data with I/O states
+    :param boolean append: Indicates whether data is appended to the file of a previous chunk
+    :return: Data frame with the relevant I/O fields
+    :rtype: dataframe
     """
-    print("Loading I/O data...")
 
     # get data frame with relevant I/O fields
     io_df = df[detector_fields]
     io_output_folder = results_folder + 'io/'
-    create_folder_if_not_exists(io_output_folder)
 
     # process results to file
-    io_output_filename = 'io_' + 'out.csv'
-    io_df.to_csv(io_output_folder + io_output_filename, sep=',')
+    io_output_filename = 'io_' + 'out'
+    save_df(io_df, io_output_folder + io_output_filename, append=append)
 
-    print("I/O data extracted!")
+    return io_df
+
+
+def get_phase_list(fields, stage_list=phase_list):
+    """
+    Detect the stages with aspect I/O data available in the given fields.
+
+    :param list[str] fields: names of the fields in the raw data
+    :param list[str] stage_list: list of stage names to look for (e.g. ['A', 'B'])
+    :return: List of stage names with all aspect fields available
+    :rtype: list[str]
+    """
+    return [stage for stage in stage_list if set(get_aspect_fields(stage)).issubset(fields)]
 
 
-def create_aspect_df(stage, df):
+def get_extract_fields(stage_list, detector_fields):
     """
-    Create initial data frame for a given stage using aspect I/O data.
+    Get the fields needed from the raw data to extract the given stages and detectors.
+
+    :param list[str] stage_list: list of stage names (e.g. ['A', 'B'])
+    :param list[str] detector_fields: list of detector names (including date/time fields)
+    :return: List of field names (without duplicates)
+    :rtype: list[str]
+    """
+    fields = ['Date', 'Time', mode_field]
+    for stage in stage_list:
+        fields.extend(get_aspect_fields(stage))
+    fields.extend(detector_fields)
+
+    return list(dict.fromkeys(fields))
+
+
+def get_aspect_fields(stage):
+    """
+    Get the names of the aspect I/O fields (aspects 0, 1 and 2) for a given stage.
 
     :param string stage: Name of stage
+    :return: List of aspect field names
+    :rtype: list[str]
+    """
+    return ['Aspect ' + str(aspect) + ' of Phase ' + stage + '  State' for aspect in range(3)]
+
+
+def decode_phase_states(stage_list, df):
+    """
+    Decode aspect I/O data to infer red, red/amber, amber or green phase for all given stages in a single pass.
+
+    The three aspects of each stage are combined into a code (aspect0 * 4 + aspect1 * 2 + aspect2), which is then
+    mapped to a state using the aspect_states lookup table. Records in an error state are removed.
+
+    :param list[str] stage_list: list of stage names (e.g. ['A', 'B'])
     :param dataframe df: CSV-formatted data with I/O aspect states
-    :return: Data frame for grouped aspect I/O data
+    :return: Long-format data frame with the state of each stage (Date, Time, Result and Phase), ordered by
+        date/time and stage
     :rtype: dataframe
     """
-    phase_fields = ['Date', 'Time', 'Aspect 0 of Phase ' + stage + '  State',
-                    'Aspect 1 of Phase ' + stage + '  State',
-                    'Aspect 2 of Phase ' + stage + '  State']
-    aspect_df = df[phase_fields]
-    return aspect_df
 
+    # build a (records x stages) matrix for each aspect
+    aspects = [df[[get_aspect_fields(stage)[aspect] for stage in stage_list]].to_numpy(dtype=np.int8)
+               for aspect in range(3)]
+
+    # combine the aspects into a code and look up the state (out of range codes are clipped to an error)
+    codes = aspects[0] * 4 + aspects[1] * 2 + aspects[2]
+    states = np.take(aspect_states, codes, mode='clip')
+
+    # process errors (do not write to file)
+    valid = states >= 0
+    if not valid.all():
+        print("Errors removed (not written to file): " + str(valid.size - np.count_nonzero(valid)))
+
+    # flatten into long format, keeping the records in date/time then stage order
+    record_index, stage_index = np.nonzero(valid)
+    phase_df = pd.DataFrame({'Date': df['Date'].to_numpy()[record_index],
+                             'Time': df['Time'].to_numpy()[record_index],
+                             'Result': states[record_index, stage_index],
+                             'Phase': np.asarray(stage_list)[stage_index]},
+                            columns=output_fields)
+
+    return phase_df
 
-def process_aspect_df(stage, df):
+
+def stream_source_data(raw_data, cfg_file):
     """
-    Process aspect I/O data to infer red, red/amber, amber or green phase for a given stage
+    Stream the raw data in chunks, loading only the fields needed and ignoring SUP values.
 
-    :param string stage: Name of stage
-    :param dataframe df: CSV-formatted data with grouped aspect I/O data
-    """
-
-    # create folder if it does not exist to store the outputs
-    create_folder_if_not_exists(raw_output_folder)
-
-    # declare aspect variables for re-usability
-    aspect0 = 'Aspect 0 of Phase ' + stage + '  State'
-    aspect1 = 'Aspect 1 of Phase ' + stage + '  State'
-    aspect2 = 'Aspect 2 of Phase ' + stage + '  State'
-
-    # process red results
-    red = df[(df[aspect0] == 1) &
-             (df[aspect1] == 0) &
-             (df[aspect2] == 0)]
-    red['Result'] = '0'
-    red['Phase'] = stage
-    red_output_filename = stage + '_' + 'red_result_out.csv'
-    red.to_csv(raw_output_folder + red_output_filename, sep=',')
-
-    # process red/amber results
-    red_amber = df[(df[aspect0] == 1) &
-                   (df[aspect1] == 1) &
-                   (df[aspect2] == 0)]
-    red_amber['Result'] = '1'
-    red_amber['Phase'] = stage
-    red_amber_output_filename = stage + '_' + 'redAmber_result_out.csv'
-    red_amber.to_csv(raw_output_folder + red_amber_output_filename, sep=',')
-
-    # process amber results
-    amber = df[(df[aspect0] == 0) &
-               (df[aspect1] == 1) &
-               (df[aspect2] == 0)]
-    amber['Result'] = '2'
-    amber['Phase'] = stage
-    amber_output_filename = stage + '_' + 'amber_result_out.csv'
-    amber.to_csv(raw_output_folder + amber_output_filename, sep=',')
-
-    # process green results
-    green = df[(df[aspect0] == 0) &
-               (df[aspect1] == 0) &
-               (df[aspect2] == 1)]
-    green['Result'] = '3'
-    green['Phase'] = stage
-    green_output_filename = stage + '_' + 'green_result_out.csv'
-    green.to_csv(raw_output_folder + green_output_filename, sep=',')
+    :param string raw_data: location of CSV-formatted raw data
+    :param string cfg_file: location of the configuration file
+    :return: List of stage names available, list of detector fields and iterator of data frames for each chunk
+    :rtype: list[str], list[str], iterator
+    """
 
-    # process errors (do not write to file)
-    error = df[(df[aspect0] == 0) & (df[aspect1] == 0) & (df[aspect2] == 0)]
-    if error.size > 0:
-        print("Errors removed (not written to file)...")
+    # detect the phases available in the raw data and the fields needed for phases and I/O data
+    stage_list = get_phase_list(get_raw_data_fields(raw_data))
+    detector_fields = get_detector_fields(cfg_file)
+    fields = get_extract_fields(stage_list, detector_fields)
+
+    chunks = (remove_sup_values(chunk) for chunk in stream_raw_data_to_df(raw_data, fields))
+
+    return stage_list, detector_fields, chunks
 
 
 def extract(raw_data, cfg_file):
     """
-    Run data extract method.
+    Run data extract method, streaming the raw data in chunks and loading only the fields needed.
 
     :param dataframe raw_data: CSV-formatted raw data
     :param string cfg_file: location of the configuration file
@@ -162,14 +199,15 @@ def extract(raw_data, cfg_file):
     # get folder to store results of all phases
     create_folder_if_not_exists(results_folder)
 
-    # initialise by converting the raw data into the df
-    source_data_df = convert_raw_data_to_df(raw_data)
-    source_data_df = remove_sup_values(source_data_df)
+    print("Loading stage and I/O data...")
+    stage_list, detector_fields, chunks = stream_source_data(raw_data, cfg_file)
 
-    # first get the phase data (all possible phases included)
-    phase_list = ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H', 'I', 'J']
-    extract_phase_data(phase_list, source_data_df)
+    # extract phase and I/O data as each chunk arrives
+    records = 0
+    for index, chunk in enumerate(chunks):
+        extract_phase_data(stage_list, chunk, append=index > 0)
+        extract_io_data(detector_fields, chunk, append=index > 0)
+        records += len(chunk)
 
-    # then get the I/O data using detector fields
-    detector_fields = get_detector_fields(cfg_file)
-    extract_io_data(detector_fields, source_data_df)
+    print("Phases for stages " + ', '.join(stage_list) + " extracted!")
+    print("I/O data extracted! Total number of records: ", records)
@@ -0,0 +1,275 @@
+# Copyright 2017 Priscilla Boyd. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""The Incremental module processes new data for a site without rebuilding its datasets by:
+
+    -  Keeping a watermark (i.e. the timestamp of the last record processed) and the open interval of each phase.
+    -  Extracting, cleaning and merging only the records after the watermark and appending them to the datasets.
+    -  Carrying open intervals over, so a phase state spanning two runs (e.g. over midnight) is not split.
+
+    The watermark also records the extent of each dataset it covers, so records appended by a run that stopped before
+    saving its watermark are discarded by the next run (instead of being appended twice).
+"""
+
+import json
+import os
+import numpy as np
+import pandas as pd
+from preprocessing.Cleaner import clean_phase_frames
+from preprocessing.Extractor import stream_source_data, decode_phase_states
+from preprocessing.Merger import merge_phase_io
+from preprocessing.SkLearnProcessor import get_sklearn_df, get_state_durations, phase_list, subset_columns
+from tools.Utils import sites_folder, save_df, combine_date_time, apply_schema, get_epoch_seconds, \
+    create_folder_if_not_exists, get_storage_file, remove_storage_file, storage_extensions
+
+# declare name of the file with the watermark and open intervals of a site
+watermark_file = 'watermark.json'
+
+# declare datasets of a site (locations without extension, relative to the site folder)
+output_names = ['dataset', 'sklearn_dataset_without_io', 'sklearn_dataset_with_io', 'sklearn_dataset_with_duration']
+
+
+def get_site_folder(site_id):
+    """
+    Get the folder where the datasets of a site processed incrementally are kept.
+
+    :param string site_id: identifier of the site (e.g. 'e80374')
+    :return: Location of the site folder
+    :rtype: string
+    """
+    return sites_folder + site_id + '/'
+
+
+def load_watermark(site_folder):
+    """
+    Load the watermark and open intervals of a site.
+
+    :param string site_folder: location of the site folder
+    :return: State with the watermark (epoch seconds of the last record processed, or None if the site has not been
+        processed yet) and the open interval of each phase
+    :rtype: dict
+    """
+    file = site_folder + watermark_file
+    if not os.path.exists(file):
+        return {'watermark': None, 'open_intervals': {}}
+
+    with open(file) as state_file:
+        return json.load(state_file)
+
+
+def save_watermark(site_folder, state):
+    """
+    Save the watermark and open intervals of a site, replacing the previous state in a single step.
+
+    :param string site_folder: location of the site folder
+    :param dict state: state with the watermark and the open interval of each phase
+    """
+    create_folder_if_not_exists(site_folder)
+    file = site_folder + watermark_file
+    with open(file + '.tmp', 'w') as state_file:
+        json.dump(state, state_file, indent=4, sort_keys=True)
+    os.replace(file + '.tmp', file)
+
+
+def get_output_extent(file):
+    """
+    Get the extent of a saved dataset: its number of parts for columnar data (a single file being one part), or its size
+    in bytes for CSV data.
+
+    :param string file: location of the file (or folder of parts)
+    :return: Extent of the dataset (0 if it does not exist)
+    :rtype: int
+    """
+    if os.path.isdir(file):
+        return len(os.listdir(file))
+
+    if not os.path.exists(file):
+        return 0
+
+    return os.path.getsize(file) if file.endswith(storage_extensions['csv']) else 1
+
+
+def get_output_extents(site_folder):
+    """
+    Get the extent of each file of the datasets of a site (in any storage format).
+
+    :param string site_folder: location of the site folder
+    :return: Extent of each file by name
+    :rtype: dict
+    """
+    files = [get_storage_file(site_folder + name, storage) for name in output_names for storage in storage_extensions]
+
+    return {os.path.basename(file): get_output_extent(file) for file in files}
+
+
+def truncate_outputs(site_folder, extents):
+    """
+    Discard anything appended to the datasets of a site after the given extents (see get_output_extents).
+
+    :param string site_folder: location of the site folder
+    :param dict extents: extent of each file by name
+    """
+    for name, extent in extents.items():
+        file = site_folder + name
+        if get_output_extent(file) <= extent:
+            continue
+
+        print("Discarding records appended after the watermark to " + file)
+        if extent == 0:
+            remove_storage_file(file)
+        elif os.path.isdir(file):
+            for part in sorted(os.listdir(file))[extent:]:
+                os.remove(os.path.join(file, part))
+        else:
+            with open(file, 'r+') as csv_file:
+                csv_file.truncate(extent)
+
+
+def extract_new_records(raw_data, cfg_file, watermark):
+    """
+    Extract phase and I/O data for the records after the watermark only.
+
+    :param string raw_data: location of CSV-formatted raw data
+    :param string cfg_file: location of the configuration file
+    :param int watermark: epoch seconds of the last record processed (None to extract all records)
+    :return: Phase data frames and I/O data frame (None if there are no new records)
+    :rtype: list[dataframe], dataframe
+    """
+    stage_list, detector_fields, chunks = stream_source_data(raw_data, cfg_file)
+
+    phase_frames = []
+    io_frames = []
+    for chunk in chunks:
+        if watermark is not None:
+            chunk = chunk[get_epoch_seconds(chunk) > watermark]
+        if chunk.shape[0] > 0:
+            phase_frames.append(apply_schema(decode_phase_states(stage_list, chunk)))
+            io_frames.append(apply_schema(chunk[detector_fields]))
+
+    if not io_frames:
+        return phase_frames, None
+
+    return phase_frames, apply_schema(pd.concat(io_frames, ignore_index=True))
+
+
+def get_incremental_durations(df, open_intervals, stage_list=phase_list):
+    """
+    Get the intervals closed by new records, continuing the open interval of each phase from the previous run.
+
+    The last interval of each phase is kept open (i.e. not included in the durations), as it may continue in the
+    records of the next run.
+
+    :param dataframe df: new records with Date_Time, Result and Phase fields
+    :param dict open_intervals: open interval of each phase (Result, and Start/End as epoch seconds)
+    :param list[str] stage_list: list of stage names (e.g. ['A', 'B'])
+    :return: Data frame with the intervals closed (as per get_state_durations) and the new open interval of each phase
+    :rtype: dataframe, dict
+    """
+
+    # start each phase with the first and last records of its open interval
+    frames = []
+    for phase, interval in sorted(open_intervals.items()):
+        carried_times = sorted({interval['Start'], interval['End']})
+        frames.append(pd.DataFrame({'Date_Time': pd.to_datetime(carried_times, unit='s'),
+                                    'Result': interval['Result'], 'Phase': phase}))
+    frames.append(df[['Date_Time', 'Result', 'Phase']].astype({'Phase': str}))
+    df = pd.concat(frames, ignore_index=True)
+
+    durations = get_state_durations(df, stage_list)
+    closed = np.ones(len(durations.index), dtype=bool)
+
+    # find the last interval of each phase, holding it back as an open interval
+    new_open_intervals = {}
+    for phase_value, phase in enumerate(stage_list):
+        df_phase = df[df['Phase'] == phase]
+        if df_phase.empty:
+            continue
+
+        result = df_phase['Result'].to_numpy()
+        date_time = df_phase['Date_Time'].to_numpy().astype('datetime64[s]')
+        changes = np.flatnonzero(result[1:] != result[:-1])
+        first = changes[-1] + 1 if len(changes) > 0 else 0
+        new_open_intervals[phase] = {'Result': int(result[-1]), 'Start': int(date_time[first].astype('int64')),
+                                     'End': int(date_time[-1].astype('int64'))}
+
+        is_open = (durations['Phase'] == phase_value) & (durations['Result'] == result[-1]) & \
+                  (durations['Start'].to_numpy().astype('datetime64[s]') == date_time[first])
+        closed &= ~is_open.to_numpy()
+
+    return durations[closed].reset_index(drop=True), new_open_intervals
+
+
+def append_output(df, location, append):
+    """
+    Append an output to the data of a site, ignoring empty outputs.
+
+    :param dataframe df: output data
+    :param string location: location of the data without file extension
+    :param boolean append: Indicates whether data is appended to data previously saved
+    """
+    if df.shape[0] > 0:
+        file = save_df(df, location, append=append)
+        print("Records added to " + file + ": ", df.shape[0])
+
+
+def run_incremental(raw_data, cfg_file, site_id, stage_list=phase_list, site_folder=None):
+    """
+    Process the records after the watermark of a site, appending them to its datasets.
+
+    Phases are represented numerically by their position in the list of all possible phases, as in a full rebuild, so
+    the values are the same across runs.
+
+    :param string raw_data: location of CSV-formatted raw data
+    :param string cfg_file: location of the configuration file
+    :param string site_id: identifier of the site (e.g. 'e80374')
+    :param list[str] stage_list: list of stage names used for the dataset with duration (e.g. ['A', 'B'])
+    :param string site_folder: location of the site folder (defaults to the folder of the site in the sites folder)
+    :return: New state with the watermark, the open interval of each phase and the extent of each dataset, and the
+        number of records appended to the dataset by this run
+    :rtype: dict
+    """
+    site_folder = site_folder or get_site_folder(site_id)
+    state = load_watermark(site_folder)
+    append = state['watermark'] is not None
+    print("Processing new records for site " + site_id + " after watermark:", state['watermark'])
+
+    # discard records appended by a run that stopped before saving its watermark
+    if append:
+        truncate_outputs(site_folder, state.get('outputs', {}))
+
+    phase_frames, io_df = extract_new_records(raw_data, cfg_file, state['watermark'])
+    if io_df is None:
+        print("No new records for site " + site_id)
+        return dict(state, records=0)
+
+    # clean and merge the new records, appending them to the datasets
+    phase_df = clean_phase_frames(phase_frames)
+    dataset_df = merge_phase_io(phase_df, io_df)
+    append_output(dataset_df, site_folder + 'dataset', append)
+    append_output(get_sklearn_df(dataset_df, io=False), site_folder + 'sklearn_dataset_without_io', append)
+    append_output(get_sklearn_df(dataset_df), site_folder + 'sklearn_dataset_with_io', append)
+
+    # get durations of intervals closed by the new records
+    durations, open_intervals = get_incremental_durations(combine_date_time(dataset_df[subset_columns]),
+                                                          state['open_intervals'], stage_list)
+    append_output(durations, site_folder + 'sklearn_dataset_with_duration', append)
+
+    # move watermark to the last record processed
+    state = {'site': site_id, 'watermark': int(get_epoch_seconds(io_df).max()), 'open_intervals': open_intervals,
+             'outputs': get_output_extents(site_folder)}
+    save_watermark(site_folder, state)
+    print("Site " + site_id + " processed up to watermark:", state['watermark'])
+
+    return dict(state, records=dataset_df.shape[0])
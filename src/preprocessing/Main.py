@@ -20,10 +20,16 @@
     -  Merge data into a single file for manipulation.
     -  Adapt to be used with the scikit-learn framework.
 
+Stages can either run in memory (saving the final datasets only) or write the output of every stage to file. Sites
+can also be processed incrementally, appending only the records after the last run to the datasets of the site, or
+in parallel using a manifest listing the raw data, configuration file and identifier of each site.
 """
+from preprocessing.Batch import run_batch
 from preprocessing.Cleaner import clean
 from preprocessing.Extractor import extract
+from preprocessing.Incremental import run_incremental
 from preprocessing.Merger import data_merge
+from preprocessing.Pipeline import Pipeline
 from preprocessing.SkLearnProcessor import sklearn_data_processing_with_duration, sklearn_data_processing_with_io, \
     sklearn_data_processing_without_io
 from tools.Utils import get_detector_fields
@@ -31,16 +37,38 @@ from tools.Utils import get_detector_fields
 raw_data = '20170929_until_20171003_e80374.csv'
 cfg_file = 'e80374.8SD'
 
+# run stages in memory (set to False to write the output of every stage to file)
+in_memory = True
+
+# identifier of the site to process incrementally (set to None to rebuild all data in a new results folder)
+incremental_site_id = None
+
+# manifest of sites to process in parallel, in the 'config' folder (set to None to process the site above only)
+batch_manifest = None
+
 if __name__ == '__main__':
-    # extract and clean data
-    extract(raw_data, cfg_file)
-    clean()
-
-    # merge data with the detector fields in the config file
-    detector_fields = get_detector_fields(cfg_file)
-    merged_data = data_merge(detector_fields)
-
-    # process merged data further to use with scikit-learn models
-    sklearn_data_processing_without_io(merged_data)
-    sklearn_data_processing_with_io(merged_data)
-    sklearn_data_processing_with_duration(merged_data)
+    if batch_manifest is not None:
+        # process all sites in the manifest concurrently, using a folder per site
+        run_batch(batch_manifest, incremental=incremental_site_id is not None)
+
+    elif incremental_site_id is not None:
+        # process only the records after the watermark of the site, appending them to its datasets
+        run_incremental(raw_data, cfg_file, incremental_site_id)
+
+    elif in_memory:
+        # run all stages passing data between them in memory, saving the final datasets only
+        Pipeline(raw_data, cfg_file).run()
+
+    else:
+        # extract and clean data
+        extract(raw_data, cfg_file)
+        clean()
+
+        # merge data with the detector fields in the config file
+        detector_fields = get_detector_fields(cfg_file)
+        merged_data = data_merge(detector_fields)
+
+        # process merged data further to use with scikit-learn models
+        sklearn_data_processing_without_io(merged_data)
+        sklearn_data_processing_with_io(merged_data)
+        sklearn_data_processing_with_duration(merged_data)
@@ -14,40 +14,79 @@
 # ==============================================================================
 
 """
-    The Merger class combines the data by merging all phase data and I/O detection data into a single data set CSV file.
+    The Merger class combines the data by merging all phase data and I/O detection data into a single data set file.
 """
 
+import numpy as np
 import pandas as pd
-from tools.Utils import results_folder, output_fields
+from tools.Utils import results_folder, output_fields, find_storage_file, load_dataset, save_df, get_epoch_seconds
 
+# declare field used to join phase and I/O data (epoch seconds)
+key_field = 'Epoch'
 
-def data_merge(detector_fields):
+
+def data_merge(detector_fields, tolerance=0):
     """
     Combine all processed data into a single dataset file.
 
     :param list[str] detector_fields: list of strings with detector names
+    :param int tolerance: maximum difference in seconds between phase and I/O records joined (0 for an exact match)
     :return: location of dataset
     :rtype: string
     """
     print("Merging final data...")
 
     # load files that contain phase and I/O processed data and store as dfs
-    phase_data = pd.read_csv(results_folder + 'phases/processed/clean_merged_phases.csv', header=0,
-                             skipinitialspace=True, usecols=output_fields)
-    detection_data = pd.read_csv(results_folder + 'io/io_out.csv', header=0, skipinitialspace=True,
-                                 usecols=detector_fields)
-    phase_df = pd.DataFrame(phase_data)
-    detection_df = pd.DataFrame(detection_data)
-
-    # merge the two files based on their Date and Time fields
-    output = pd.merge(phase_df, detection_df, on=['Date', 'Time'])
+    phase_df = load_dataset(find_storage_file(results_folder + 'phases/processed/clean_merged_phases'),
+                            fields=output_fields, timestamp=False, date_time=True)
+    detection_df = load_dataset(find_storage_file(results_folder + 'io/io_out'), fields=detector_fields,
+                                timestamp=False, date_time=True)
 
-    # store the output with any duplicates dropped and create a final CSV file
-    merged_df = output.drop_duplicates()
-    merged_df.to_csv(results_folder + 'dataset.csv', sep=',', index=False)
+    # merge the two files and create a final file
+    merged_df = merge_phase_io(phase_df, detection_df, tolerance)
+    dataset = save_df(merged_df, results_folder + 'dataset')
 
     print("Data merged!")
-    print("Main dataset available: " + results_folder + 'dataset.csv')
+    print("Main dataset available: " + dataset)
 
     # return location of dataset
-    return results_folder + 'dataset.csv'
+    return dataset
+
+
+def merge_phase_io(phase_df, detection_df, tolerance=0):
+    """
+    Merge phase data and I/O detection data into a single data frame.
+
+    Both sides are keyed by their epoch second and sorted, so each phase record is joined to the nearest I/O record
+    within the given tolerance (allowing for clock skew between the phase and I/O logs) in a single sorted pass.
+    Duplicates are dropped using the key only (i.e. one record per phase and second, one I/O record per second).
+
+    :param dataframe phase_df: phase data (Date, Time, Result and Phase fields)
+    :param dataframe detection_df: I/O detection data (Date, Time and detector fields)
+    :param int tolerance: maximum difference in seconds between phase and I/O records joined (0 for an exact match)
+    :return: Merged data
+    :rtype: dataframe
+    """
+
+    # key both sides by epoch second, in ascending order and without duplicates
+    phase_df = phase_df.assign(**{key_field: get_epoch_seconds(phase_df)})
+    phase_df = phase_df.sort_values(key_field, kind='mergesort').drop_duplicates([key_field, 'Phase'])
+    detection_df = detection_df.assign(**{key_field: get_epoch_seconds(detection_df)})
+    detection_df = detection_df.sort_values(key_field, kind='mergesort').drop_duplicates([key_field])
+    detection_df = detection_df.drop(['Date', 'Time'], axis=1)
+    if detection_df.empty:
+        return phase_df.iloc[:0].drop(key_field, axis=1).join(detection_df.drop(key_field, axis=1))
+
+    # find the nearest I/O record for each phase record and keep those within the tolerance
+    phase_keys = phase_df[key_field].to_numpy()
+    io_keys = detection_df[key_field].to_numpy()
+    after = np.searchsorted(io_keys, phase_keys).clip(max=len(io_keys) - 1)
+    before = (after - 1).clip(min=0)
+    nearest = np.where(np.abs(io_keys[before] - phase_keys) <= np.abs(io_keys[after] - phase_keys), before, after)
+    matched = np.abs(io_keys[nearest] - phase_keys) <= tolerance
+
+    # join the matched records
+    phase_df = phase_df[matched].drop(key_field, axis=1).reset_index(drop=True)
+    detection_df = detection_df.iloc[nearest[matched]].drop(key_field, axis=1).reset_index(drop=True)
+
+    return pd.concat([phase_df, detection_df], axis=1)
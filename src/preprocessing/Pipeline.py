@@ -0,0 +1,125 @@
+# Copyright 2017 Priscilla Boyd. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""The Pipeline module runs the pre-processing stages in memory by:
+
+    -  Passing data frames directly between the extract, clean, merge and scikit-learn stages.
+    -  Saving only the outputs selected (by default, the final datasets) to the output folder.
+"""
+
+import pandas as pd
+from preprocessing.Cleaner import clean_phase_frames
+from preprocessing.Extractor import stream_source_data, decode_phase_states
+from preprocessing.Merger import merge_phase_io
+from preprocessing.SkLearnProcessor import get_sklearn_df, get_state_durations, phase_list, subset_columns
+from tools.Utils import results_folder, save_df, combine_date_time, apply_schema
+
+# declare location of each output (without extension) relative to the output folder
+output_locations = {'phases': 'phases/processed/clean_merged_phases',
+                    'io': 'io/io_out',
+                    'dataset': 'dataset',
+                    'sklearn_without_io': 'sklearn_dataset_without_io',
+                    'sklearn_with_io': 'sklearn_dataset_with_io',
+                    'sklearn_with_duration': 'sklearn_dataset_with_duration'}
+
+# declare outputs saved by default (i.e. the final datasets)
+final_outputs = ['dataset', 'sklearn_without_io', 'sklearn_with_io', 'sklearn_with_duration']
+
+
+class Pipeline(object):
+    """
+    Pre-processing pipeline passing data frames directly between stages.
+
+    :param string raw_data: location of CSV-formatted raw data
+    :param string cfg_file: location of the configuration file
+    :param string output_folder: location of the output / results
+    :param list[str] save: names of the outputs to be saved (see output_locations), or None for the final datasets
+    :param list[str] stage_list: list of stage names used for the dataset with duration (e.g. ['A', 'B'])
+    """
+
+    def __init__(self, raw_data, cfg_file, output_folder=results_folder, save=None, stage_list=phase_list):
+        self.raw_data = raw_data
+        self.cfg_file = cfg_file
+        self.output_folder = output_folder
+        self.save = final_outputs if save is None else list(save)
+        self.stage_list = stage_list
+        self.outputs = {}
+
+        unknown_outputs = set(self.save) - set(output_locations)
+        if unknown_outputs:
+            raise ValueError('Unknown outputs to save: ' + ', '.join(sorted(unknown_outputs)))
+
+    def extract(self):
+        """
+        Extract phase and I/O data from the raw data, one chunk at a time.
+
+        :return: Phase data frames and I/O data frame
+        :rtype: list[dataframe], dataframe
+        """
+        print("Loading stage and I/O data...")
+        stage_list, detector_fields, chunks = stream_source_data(self.raw_data, self.cfg_file)
+
+        phase_frames = []
+        io_frames = []
+        for chunk in chunks:
+            phase_frames.append(apply_schema(decode_phase_states(stage_list, chunk)))
+            io_frames.append(apply_schema(chunk[detector_fields]))
+
+        print("Phases for stages " + ', '.join(stage_list) + " and I/O data extracted!")
+        io_df = pd.concat(io_frames, ignore_index=True) if io_frames else pd.DataFrame([], columns=detector_fields)
+        io_df = apply_schema(io_df)
+
+        return phase_frames, io_df
+
+    def run(self):
+        """
+        Run all pre-processing stages, saving the selected outputs.
+
+        :return: Outputs of each stage by name (see output_locations)
+        :rtype: dict
+        """
+        phase_frames, io_df = self.extract()
+        self.output('io', io_df)
+
+        # clean and merge data with the detector fields
+        phase_df = self.output('phases', clean_phase_frames(phase_frames))
+        dataset_df = self.output('dataset', merge_phase_io(phase_df, io_df))
+
+        # process merged data further to use with scikit-learn models
+        self.output('sklearn_without_io', get_sklearn_df(dataset_df, io=False))
+        self.output('sklearn_with_io', get_sklearn_df(dataset_df))
+        durations = get_state_durations(combine_date_time(dataset_df[subset_columns]), self.stage_list)
+        self.output('sklearn_with_duration', durations)
+
+        print("Pre-processing complete!")
+
+        return self.outputs
+
+    def output(self, name, df):
+        """
+        Keep the output of a stage in memory, saving it to file if selected.
+
+        :param string name: name of the output (see output_locations)
+        :param dataframe df: output data
+        :return: Output data
+        :rtype: dataframe
+        """
+        self.outputs[name] = df
+
+        if name in self.save:
+            file = save_df(df, self.output_folder + output_locations[name])
+            print("Output '" + name + "' available: " + file)
+
+        return df
@@ -15,11 +15,13 @@
 
 """The ExtractSkLearn module prepares the data for scikit-learn by:
 
-    -  Creating a CSV file with phase, result, duration until change of each state.
+    -  Creating a file with phase, result, duration until change of each state.
     -  Ensuring the data is suitable for sklearn (e.g. phase types are represented numerically).
 """
+import numpy as np
 import pandas as pd
-from tools.Utils import results_folder
+from preprocessing.Extractor import phase_list as all_phase_list
+from tools.Utils import results_folder, load_dataset, save_df, timestamp_field
 
 # load list of phases and states (excluding phases E and F as they are pedestrian phases)
 phase_list = ['A', 'B', 'C', 'D']
@@ -27,106 +29,129 @@ phase_list = ['A', 'B', 'C', 'D']
 # list of subset columns to be used for sklearn
 subset_columns = ['Date', 'Time', 'Result', 'Phase']
 
+# list of columns of the dataset with duration
+duration_columns = ['Phase', 'Result', 'Start', 'End', 'Duration']
+
 
 def sklearn_data_processing_without_io(merged_data):
     """
     Process data for scikit-learn without i/o
 
-    :param string merged_data: location of CSV-formatted dataset
+    :param string merged_data: location of dataset (in any storage format)
     """
     print("Creating scikit-Learn dataset without I/O information...")
-    phase_data = pd.read_csv(merged_data, header=0, skipinitialspace=True)
-    df = pd.DataFrame(phase_data)
 
     # get subset of columns (exclude i/o fields), then create df by going through pahses
-    df = df[subset_columns]
-    df.Phase = pd.Categorical(df.Phase).codes
+    df = get_sklearn_df(load_dataset(merged_data, fields=subset_columns, timestamp=False, date_time=True))
 
-    # write result to csv
-    df.to_csv(results_folder + 'sklearn_dataset_without_io.csv', sep=',', index=False, header=True, mode='a')
-    print("New scikit-learn dataset without i/o data available: " + results_folder + "sklearn_dataset_without_io.csv")
+    # write result to file
+    dataset = save_df(df, results_folder + 'sklearn_dataset_without_io')
+    print("New scikit-learn dataset without i/o data available: " + dataset)
 
 
 def sklearn_data_processing_with_io(merged_data):
     """
     Process data for scikit-learn taking I/O inputs.
 
-    :param string merged_data: location of CSV-formatted dataset
+    :param string merged_data: location of dataset (in any storage format)
     """
     print("Creating scikit-Learn dataset with I/O information...")
-    phase_data = pd.read_csv(merged_data, header=0, skipinitialspace=True)
-    df = pd.DataFrame(phase_data)
-    df.Phase = pd.Categorical(df.Phase).codes
+    df = get_sklearn_df(load_dataset(merged_data, timestamp=False, date_time=True))
 
-    # write result to csv
-    df.to_csv(results_folder + 'sklearn_dataset_with_io.csv', sep=',', index=False, header=True, mode='a')
-    print("New scikit-learn dataset with i/o data available: " + results_folder + "sklearn_dataset_io.csv")
+    # write result to file
+    dataset = save_df(df, results_folder + 'sklearn_dataset_with_io')
+    print("New scikit-learn dataset with i/o data available: " + dataset)
 
 
-def sklearn_data_processing_with_duration(merged_data):
+def sklearn_data_processing_with_duration(merged_data, stage_list=phase_list):
     """
     Process data for scikit-learn with duration information.
 
-    :param string merged_data: location of CSV-formatted dataset
+    :param string merged_data: location of dataset (in any storage format)
+    :param list[str] stage_list: list of stage names (e.g. ['A', 'B'])
     """
     print("Creating scikit-learn dataset with duration information...")
 
     # load data and parse date/time to a single Date_Time column
-    phase_data = pd.read_csv(merged_data, header=0, skipinitialspace=True, usecols=subset_columns,
-                             parse_dates=[['Date', 'Time']])
-    df = pd.DataFrame(phase_data)
-
-    new_columns = ['Phase', 'Result', 'Start', 'End', 'Duration']
-    df_new_columns = pd.DataFrame(columns=new_columns)
-
-    # write file for the first time with header
-    df_new_columns.to_csv(results_folder + 'sklearn_dataset_with_duration.csv', sep=',', index=False, mode='w')
-
-    # loop through phases
-    for x in range(len(phase_list)):
-        phase = phase_list[x]
+    df = load_dataset(merged_data, fields=subset_columns).rename(columns={timestamp_field: 'Date_Time'})
 
-        # create a df for phase A only
-        df2 = df[df['Phase'] == phase]
+    # build all state intervals at once
+    df_new_columns = get_state_durations(df, stage_list)
 
-        # initialise by using the very first record
-        start_time = df2['Date_Time'].values[0]
-        current_result = df2['Result'].values[0]
+    # write result to file
+    dataset = save_df(df_new_columns, results_folder + 'sklearn_dataset_with_duration')
 
-        # loop through all records from DF to process duration
-        for i in range(len(df2.index)):
+    print("New scikit-learn dataset with duration available: " + dataset)
 
-            # if the phase is the same, set as end time
-            if df2['Result'].values[i] == current_result:
-                end_time = df2['Date_Time'].values[i]
 
-            # if the phase is no longer the same or it's the last record, use end time so far to get duration
-            if df2['Result'].values[i] != current_result or i+1 == len(df2.index):
-                df_start = pd.to_datetime(start_time)
-                df_end = pd.to_datetime(end_time)
+def get_sklearn_df(df, io=True, stage_list=all_phase_list):
+    """
+    Get data suitable for scikit-learn, representing phases numerically.
+
+    :param dataframe df: dataset with Date, Time, Result, Phase and (optionally) I/O fields
+    :param boolean io: Indicates whether I/O fields are kept
+    :param list[str] stage_list: list of stage names giving a fixed numeric value to each phase (by default, all
+        possible phases, so a phase has the same value whichever phases are present, e.g. in a full rebuild and in an
+        incremental run)
+    :return: Data for scikit-learn
+    :rtype: dataframe
+    """
+    df = df.copy() if io else df[subset_columns].copy()
+    df.Phase = pd.Categorical(df.Phase, categories=stage_list).codes
 
-                # if start > end happens and result = 0, duration = 0
-                if df_start > df_end:
-                    if df2['Result'].values[i] == 0:
-                        duration = 0
-                    else:
-                        duration = 1
-                else:
-                    duration = pd.Timedelta(df_end - df_start).seconds
+    return df
 
-                # convert phase ID to int (to cater for scikit-learn requirements)
-                phase_value = str(x)
 
-                # write new row to data frame
-                new_row = [phase_value, current_result, df_start, df_end, duration]
-                df_new_columns.loc[(len(df_new_columns))] = new_row
+def get_state_durations(df, stage_list=phase_list):
+    """
+    Get the start, end and duration of every interval in which a stage keeps the same state (run-length encoding).
 
-                # go to the next result and start time
-                current_result = df2['Result'].values[i]
-                start_time = df2['Date_Time'].values[i]
+    For each stage, state changes are detected by comparing each record with the previous one. The end of an interval
+    is the last record that did not change state, so an interval with a single record ends where the previous one
+    ended and its duration is 0 if the next state is red (0) or 1 otherwise. The last interval is only included if it
+    has more than one record (or is the only interval).
 
-    # write result to csv
-    df_new_columns.to_csv(results_folder + 'sklearn_dataset_with_duration.csv', sep=',', index=False,
-                          header=False, mode='a')
+    :param dataframe df: data with Date_Time, Result and Phase fields
+    :param list[str] stage_list: list of stage names (e.g. ['A', 'B'])
+    :return: Data frame with Phase (position of stage in the list), Result, Start, End and Duration fields
+    :rtype: dataframe
+    """
+    frames = []
 
-    print("New scikit-learn dataset with duration available: " + results_folder + "sklearn_dataset_with_duration.csv")
+    # loop through phases
+    for phase_value, phase in enumerate(stage_list):
+        df_phase = df[df['Phase'] == phase]
+        count = len(df_phase.index)
+        if count == 0:
+            continue
+
+        result = df_phase['Result'].to_numpy()
+        date_time = df_phase['Date_Time'].to_numpy()
+
+        # find records where the state changes and the first/last record of each interval
+        changed = np.concatenate(([False], result[1:] != result[:-1]))
+        starts = np.flatnonzero(np.concatenate(([True], changed[1:])))
+        ends = np.append(starts[1:] - 1, count - 1)
+
+        # the end time is the last record without a state change, i.e. forward fill from unchanged records
+        last_unchanged = np.maximum.accumulate(np.where(changed, 0, np.arange(count)))
+        start_time = date_time[starts]
+        end_time = date_time[last_unchanged[ends]]
+
+        # if start > end happens and the next result = 0, duration = 0 (otherwise 1)
+        next_result = result[np.append(starts[1:], count - 1)]
+        seconds = (end_time - start_time) // np.timedelta64(1, 's') % 86400
+        duration = np.where(start_time > end_time, np.where(next_result == 0, 0, 1), seconds)
+
+        # leave out the last interval if it only has its first record
+        include = np.ones(len(starts), dtype=bool)
+        include[-1] = starts[-1] == 0 or starts[-1] < count - 1
+
+        frames.append(pd.DataFrame({'Phase': phase_value, 'Result': result[starts][include],
+                                    'Start': start_time[include], 'End': end_time[include],
+                                    'Duration': duration[include]}, columns=duration_columns))
+
+    if not frames:
+        return pd.DataFrame([], columns=duration_columns)
+
+    return pd.concat(frames, ignore_index=True)
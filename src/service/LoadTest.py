@@ -0,0 +1,189 @@
+# Copyright 2017 Priscilla Boyd. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""
+    The LoadTest module measures the prediction service from the point of view of its clients, by:
+
+    -  Sending requests from several concurrent clients, each waiting for its answer before the next request.
+    -  Reporting the throughput and the median and 99th percentile latency seen by the clients.
+
+    The load test runs from the command line against a running service, e.g. from the 'src' folder:
+
+        python -m service.LoadTest ../results/2017-09-30/e80374/sklearn_dataset_with_io.parquet --site e80374
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import numpy as np
+from neural_network.RNN_Features import get_windows
+from tools.Utils import load_df
+
+
+# declare sequence length (temporal window) of the RNN, whose examples are windows of the sequence length - 1 seconds
+sequence_length = 20
+
+
+def load_features(file, model, fields=None, sequence_length=sequence_length):
+    """
+    Load the examples sampled by the requests from a dataset.
+
+    :param string file: location of the dataset (in any storage format)
+    :param string model: name of the model ('cart', 'gbr' or 'rnn')
+    :param list[str] fields: names of the fields used as features (defaults to all fields except the Result)
+    :param int sequence_length: Sequence length (temporal window) of the RNN
+    :return: Examples (rows of features, or windows for the RNN)
+    :rtype: ndarray
+    """
+    df = load_df(file, fields=fields)
+    features = df if fields is not None else df.drop(columns=['Result'], errors='ignore')
+
+    if model == 'rnn':
+        return get_windows(features.to_numpy(dtype=np.float32), sequence_length - 1)
+
+    return features.to_numpy(dtype=float)
+
+
+def get_arguments(args=None):
+    """
+    Parse the command line arguments of the load test.
+
+    :param list[str] args: command line arguments (defaults to those of the process)
+    :return: Arguments
+    :rtype: object
+    """
+    parser = argparse.ArgumentParser(description='Measure the throughput and latency of the prediction service.')
+    parser.add_argument('dataset', help='dataset with the examples sampled by the requests')
+    parser.add_argument('--model', default='cart', choices=['cart', 'gbr', 'rnn'])
+    parser.add_argument('--site', default=None, help='identifier of the site (defaults to the version itself)')
+    parser.add_argument('--version', default='latest')
+    parser.add_argument('--fields', nargs='+', default=None, help='features (defaults to all fields except Result)')
+    parser.add_argument('--sequence-length', type=int, default=sequence_length, help='sequence length of the RNN')
+    parser.add_argument('--requests', type=int, default=1000, help='total number of requests')
+    parser.add_argument('--clients', type=int, default=16, help='number of concurrent clients')
+    parser.add_argument('--rows', type=int, default=1, help='number of examples in each request')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--socket-path', default=None, help='Unix socket (used instead of the host and port)')
+
+    return parser.parse_args(args)
+
+
+async def open_connection(host='127.0.0.1', port=8765, socket_path=None):
+    """
+    Open a connection to the prediction service.
+
+    :param string host: host of the service
+    :param int port: port of the service
+    :param string socket_path: location of the Unix socket (used instead of the host and port)
+    :return: Stream reader and writer of the connection
+    :rtype: object, object
+    """
+    if socket_path is not None:
+        return await asyncio.open_unix_connection(socket_path)
+
+    return await asyncio.open_connection(host, port)
+
+
+async def send_request(reader, writer, request):
+    """
+    Send a request and wait for its answer.
+
+    :param object reader: stream reader of the connection
+    :param object writer: stream writer of the connection
+    :param dict request: request (see the Server module)
+    :return: Answer
+    :rtype: dict
+    """
+    writer.write((json.dumps(request) + '\n').encode())
+    await writer.drain()
+
+    return json.loads(await reader.readline())
+
+
+async def run_client(requests, latencies, host, port, socket_path):
+    """
+    Send requests one after the other on a single connection, recording the latency of each request.
+
+    :param list[dict] requests: requests sent by the client
+    :param list[float] latencies: latency (in seconds) of each request answered, added by the client
+    :param string host: host of the service
+    :param int port: port of the service
+    :param string socket_path: location of the Unix socket (used instead of the host and port)
+    :return: Number of requests answered with an error
+    :rtype: int
+    """
+    reader, writer = await open_connection(host, port, socket_path)
+    errors = 0
+    try:
+        for request in requests:
+            start_time = time.perf_counter()
+            answer = await send_request(reader, writer, request)
+            latencies.append(time.perf_counter() - start_time)
+            errors += 'error' in answer
+    finally:
+        writer.close()
+
+    return errors
+
+
+async def run_load_test(features, model, site=None, version='latest', num_requests=1000, clients=16, rows=1,
+                        host='127.0.0.1', port=8765, socket_path=None):
+    """
+    Send requests with random examples from concurrent clients and report the latency seen by the clients.
+
+    :param ndarray features: examples sampled by the requests (rows of features, or windows for the RNN)
+    :param string model: name of the model ('cart', 'gbr' or 'rnn')
+    :param string site: identifier of the site, or None to use the results of the version itself
+    :param string version: name of the version, or 'latest'
+    :param int num_requests: total number of requests
+    :param int clients: number of concurrent clients
+    :param int rows: number of examples in each request
+    :param string host: host of the service
+    :param int port: port of the service
+    :param string socket_path: location of the Unix socket (used instead of the host and port)
+    :return: Number of requests and errors, throughput (requests per second), p50 and p99 latency (in milliseconds)
+    :rtype: dict
+    """
+    features = np.asarray(features)
+    samples = np.random.randint(0, len(features), (num_requests, rows))
+    requests = [{'id': index, 'site': site, 'model': model, 'version': version,
+                 'features': features[sample].tolist()} for index, sample in enumerate(samples)]
+
+    latencies = []
+    start_time = time.perf_counter()
+    errors = await asyncio.gather(*[run_client(requests[index::clients], latencies, host, port, socket_path)
+                                    for index in range(clients)])
+    seconds = time.perf_counter() - start_time
+
+    p50, p99 = np.percentile(np.array(latencies) * 1000, [50, 99])
+    results = {'requests': len(latencies), 'errors': int(sum(errors)), 'requests_per_second': len(latencies) / seconds,
+               'p50_ms': float(p50), 'p99_ms': float(p99)}
+    print("Load test:", results)
+
+    return results
+
+
+if __name__ == '__main__':
+    arguments = get_arguments()
+    features = load_features(arguments.dataset, arguments.model, arguments.fields, arguments.sequence_length)
+    results = asyncio.run(run_load_test(features, arguments.model, arguments.site, arguments.version,
+                                        arguments.requests, arguments.clients, arguments.rows, arguments.host,
+                                        arguments.port, arguments.socket_path))
+
+    print("Throughput: {:.1f} requests per second, latency: p50 {:.2f} ms, p99 {:.2f} ms, errors: {} of {} requests"
+          .format(results['requests_per_second'], results['p50_ms'], results['p99_ms'], results['errors'],
+                  results['requests']))
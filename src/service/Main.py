@@ -0,0 +1,39 @@
+# Copyright 2017 Priscilla Boyd. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""
+    The Main module runs the prediction service with the models in the 'results' folder.
+"""
+
+import asyncio
+from service.Server import serve
+from tools.Utils import root_path
+
+# location of the results folder (with a folder per version, each with a sub-folder per site for a batch run)
+results = root_path + '/results/'
+
+# host and port of the service (local only), or location of a Unix socket (set to None to use the host and port)
+host = '127.0.0.1'
+port = 8765
+socket_path = None
+
+# maximum number of models kept loaded
+cache_size = 16
+
+if __name__ == '__main__':
+    try:
+        asyncio.run(serve(results, host, port, socket_path, cache_size))
+    except KeyboardInterrupt:
+        pass
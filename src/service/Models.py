@@ -0,0 +1,187 @@
+# Copyright 2017 Priscilla Boyd. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""
+    The Models module finds and loads the models used by the prediction service, by:
+
+    -  Finding the model of a site and version (a folder of results) in the index of models of the results folder.
+    -  Loading CART, GBR and RNN models once, preferring the exported (NumPy) models over scikit-learn and Keras models.
+    -  Keeping the most recently used models loaded in a cache of limited size.
+"""
+
+import asyncio
+import glob
+import os
+from collections import OrderedDict
+from decision_tree.DT_Export import load_exported_dt
+from decision_tree.DT_Utils import load_dt_model
+from neural_network import RNN_Export
+from tools.Registry import find_model, load_estimator, read_registry
+
+# declare file name of each model saved before the index of models, without extension (the RNN file name includes the
+# time it was trained)
+model_files = {'cart': 'models/dt_model_standard', 'gbr': 'models/dt_model_gbr', 'rnn': 'RNN_*'}
+
+
+def get_version_folder(results, site, version='latest'):
+    """
+    Get the folder of the results of a site and version.
+
+    :param string results: location of the results folder (with a folder per version)
+    :param string site: identifier of the site (a sub-folder of the version, e.g. from a batch run), or None to use
+        the results of the version itself
+    :param string version: name of the version folder, or 'latest' for the most recent version
+    :return: Location of the results of the site and version
+    :rtype: string
+    :raises FileNotFoundError: if there is no such version
+    """
+    if version == 'latest':
+        versions = sorted(folder for folder in os.listdir(results) if os.path.isdir(os.path.join(results, folder)))
+        if not versions:
+            raise FileNotFoundError('No versions in results folder: ' + results)
+        version = versions[-1]
+
+    folder = os.path.join(results, version, site) if site else os.path.join(results, version)
+    if not os.path.isdir(folder):
+        raise FileNotFoundError('No results for site ' + str(site) + ' and version ' + version)
+
+    return folder
+
+
+def get_model_file(results, site, model, version='latest'):
+    """
+    Get the file of a model, preferring the exported (NumPy) model. Models saved before the index of models are found
+    by file name (using the most recent file if there are several).
+
+    :param string results: location of the results folder (with a folder per version)
+    :param string site: identifier of the site, or None to use the results of the version itself
+    :param string model: name of the model ('cart', 'gbr' or 'rnn')
+    :param string version: name of the version folder, or 'latest' for the most recent version
+    :return: Location of the model file
+    :rtype: string
+    :raises FileNotFoundError: if there is no such model
+    """
+    if model not in model_files:
+        raise ValueError('Unknown model: ' + str(model))
+
+    folder = get_version_folder(results, site, version)
+    entry = find_model(folder, model)
+    if entry is not None:
+        return os.path.join(folder, entry['files'].get('export', entry['files']['estimator']))
+
+    pattern = os.path.join(folder, model_files[model])
+    for extension in (['.npz', '.h5'] if model == 'rnn' else ['.pkl']):
+        files = glob.glob(pattern + extension)
+        if files:
+            return max(files, key=os.path.getmtime)
+
+    raise FileNotFoundError('No ' + model + ' model for site ' + str(site) + ' and version ' + version)
+
+
+def list_models(results, site, version='latest'):
+    """
+    List the models of a site and version from the index of models, without loading them.
+
+    :param string results: location of the results folder (with a folder per version)
+    :param string site: identifier of the site, or None to use the results of the version itself
+    :param string version: name of the version folder, or 'latest' for the most recent version
+    :return: Entry of each model (files, features, schema hash, scores and training time)
+    :rtype: list[dict]
+    """
+    return list(read_registry(get_version_folder(results, site, version)).values())
+
+
+def load_model_file(file):
+    """
+    Load a model, giving a function predicting a batch of examples.
+
+    :param string file: location of the model file (exported trees or RNN, joblib, pickled or Keras h5 model)
+    :return: Function predicting examples (rows of features for decision trees, windows for the RNN)
+    :rtype: function
+    """
+    if file.endswith('_trees.joblib'):
+        return load_exported_dt(file).predict
+
+    if file.endswith('.joblib'):
+        return load_estimator(file).predict
+
+    if file.endswith('.npz'):
+        layers = RNN_Export.load_exported(file)
+        return lambda X: RNN_Export.predict(layers, X)
+
+    if file.endswith('.pkl'):
+        return load_dt_model(file).predict
+
+    # Keras is only needed for models that were not exported
+    from keras.models import load_model
+    return load_model(file).predict
+
+
+class ModelCache(object):
+    """
+    Cache of loaded models keyed by site, model and version, discarding the least recently used model once full.
+
+    Models are loaded on a thread, so the service keeps answering requests for loaded models while a model loads, and
+    concurrent requests for a model being loaded wait for the same load. The 'latest' version is found when the model
+    is loaded (i.e. a new version is used once the previous one leaves the cache).
+
+    :param string results: location of the results folder (with a folder per version)
+    :param int capacity: maximum number of models kept loaded
+    """
+
+    def __init__(self, results, capacity=16):
+        self.results = results
+        self.capacity = capacity
+        self.models = OrderedDict()
+        self.loading = {}
+
+    async def get(self, site, model, version='latest'):
+        """
+        Get a loaded model, loading it if needed.
+
+        :param string site: identifier of the site, or None to use the results of the version itself
+        :param string model: name of the model ('cart', 'gbr' or 'rnn')
+        :param string version: name of the version folder, or 'latest' for the most recent version
+        :return: Function predicting examples
+        :rtype: function
+        """
+        key = (site, model, version)
+        if key in self.models:
+            self.models.move_to_end(key)
+            return self.models[key]
+
+        if key not in self.loading:
+            loop = asyncio.get_running_loop()
+            self.loading[key] = loop.run_in_executor(None, lambda: load_model_file(
+                get_model_file(self.results, site, model, version)))
+        try:
+            predict = await self.loading[key]
+        finally:
+            self.loading.pop(key, None)
+
+        self.models[key] = predict
+        while len(self.models) > self.capacity:
+            self.models.popitem(last=False)
+
+        return predict
+
+    def keys(self):
+        """
+        Get the keys of the loaded models, from the least to the most recently used.
+
+        :return: Site, model and version of each loaded model
+        :rtype: list[tuple]
+        """
+        return list(self.models)
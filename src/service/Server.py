@@ -0,0 +1,266 @@
+# Copyright 2017 Priscilla Boyd. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""
+    The Server module runs a local prediction service (offline, on a TCP port or a Unix socket), by:
+
+    -  Reading requests as JSON lines, each with the site, model, version and a batch of features.
+    -  Grouping concurrent requests for the same model into a single prediction (micro-batches).
+    -  Reporting the latency of the requests (median and 99th percentile).
+
+    A request is a line such as {"id": 1, "site": "e80374", "model": "cart", "version": "latest",
+    "features": [[0, 26]]}, answered with {"id": 1, "predictions": [...]} (or {"id": 1, "error": "..."}). Features are
+    rows of features for the decision trees, or windows (of rows) for the RNN. The request {"command": "stats"} is
+    answered with the latency and the models loaded, and {"command": "models", "site": "e80374", "version": "latest"}
+    with the models of a site and version (from the index of models, without loading them).
+"""
+
+import asyncio
+import json
+import time
+from collections import deque
+import numpy as np
+from service.Models import ModelCache, list_models
+
+# declare maximum number of rows predicted at once, and maximum time (in seconds) a request waits for others
+max_batch_rows = 1024
+max_batch_wait = 0.0005
+
+# declare number of recent requests used to report latency
+latency_window = 10000
+
+
+class LatencyStats(object):
+    """
+    Latency of the most recent requests.
+
+    :param int window: number of recent requests kept
+    """
+
+    def __init__(self, window=latency_window):
+        self.latencies = deque(maxlen=window)
+        self.requests = 0
+
+    def add(self, seconds):
+        """
+        Add the latency of a request.
+
+        :param float seconds: time taken to answer the request (in seconds)
+        """
+        self.latencies.append(seconds)
+        self.requests += 1
+
+    def get_stats(self):
+        """
+        Get the number of requests and the median and 99th percentile latency of the recent requests.
+
+        :return: Number of requests, p50 and p99 latency (in milliseconds)
+        :rtype: dict
+        """
+        if not self.latencies:
+            return {'requests': self.requests, 'p50_ms': None, 'p99_ms': None}
+
+        p50, p99 = np.percentile(np.array(self.latencies) * 1000, [50, 99])
+
+        return {'requests': self.requests, 'p50_ms': float(p50), 'p99_ms': float(p99)}
+
+
+class MicroBatcher(object):
+    """
+    Group concurrent requests for the same model (and shape of features) into a single prediction. A batch is predicted
+    once it has max_rows rows, or once its first request has waited max_wait seconds.
+
+    :param ModelCache cache: cache of loaded models
+    :param int max_rows: maximum number of rows predicted at once
+    :param float max_wait: maximum time (in seconds) a request waits for other requests
+    """
+
+    def __init__(self, cache, max_rows=max_batch_rows, max_wait=max_batch_wait):
+        self.cache = cache
+        self.max_rows = max_rows
+        self.max_wait = max_wait
+        self.batches = {}
+        self.timers = {}
+
+    async def predict(self, site, model, version, features):
+        """
+        Predict a batch of features, together with other requests for the same model.
+
+        :param string site: identifier of the site
+        :param string model: name of the model ('cart', 'gbr' or 'rnn')
+        :param string version: name of the version, or 'latest'
+        :param ndarray features: examples (rows of features, or windows for the RNN)
+        :return: Predictions, one per example
+        :rtype: ndarray
+        """
+        loop = asyncio.get_running_loop()
+        key = (site, model, version, features.shape[1:])
+        future = loop.create_future()
+        batch = self.batches.setdefault(key, [])
+        batch.append((features, future))
+
+        if sum(len(request_features) for request_features, _ in batch) >= self.max_rows:
+            self.flush(key)
+        elif len(batch) == 1:
+            self.timers[key] = loop.call_later(self.max_wait, self.flush, key)
+
+        return await future
+
+    def flush(self, key):
+        """
+        Start predicting the requests waiting for a model.
+
+        :param tuple key: site, model, version and shape of the features
+        """
+        timer = self.timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+
+        batch = self.batches.pop(key, [])
+        if batch:
+            asyncio.ensure_future(self.predict_batch(key, batch))
+
+    async def predict_batch(self, key, batch):
+        """
+        Predict the features of a batch of requests at once (on a thread) and answer each request.
+
+        :param tuple key: site, model, version and shape of the features
+        :param list[tuple] batch: features and future of each request
+        """
+        try:
+            predict = await self.cache.get(*key[:3])
+            features = np.concatenate([request_features for request_features, _ in batch])
+            predictions = await asyncio.get_running_loop().run_in_executor(None, predict, features)
+            splits = np.cumsum([len(request_features) for request_features, _ in batch])[:-1]
+            for (_, future), request_predictions in zip(batch, np.split(np.asarray(predictions), splits)):
+                if not future.done():
+                    future.set_result(request_predictions)
+        except Exception as error:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+
+
+class PredictionServer(object):
+    """
+    Prediction service answering JSON line requests with a cache of loaded models.
+
+    :param string results: location of the results folder (with a folder per version)
+    :param int cache_size: maximum number of models kept loaded
+    :param int max_rows: maximum number of rows predicted at once
+    :param float max_wait: maximum time (in seconds) a request waits for other requests
+    """
+
+    def __init__(self, results, cache_size=16, max_rows=max_batch_rows, max_wait=max_batch_wait):
+        self.cache = ModelCache(results, cache_size)
+        self.batcher = MicroBatcher(self.cache, max_rows, max_wait)
+        self.stats = LatencyStats()
+
+    async def answer(self, request):
+        """
+        Answer a request.
+
+        :param dict request: request (see module description)
+        :return: Answer
+        :rtype: dict
+        """
+        if request.get('command') == 'stats':
+            return dict(self.stats.get_stats(), models=[list(key) for key in self.cache.keys()])
+
+        if request.get('command') == 'models':
+            try:
+                return {'models': list_models(self.cache.results, request.get('site'),
+                                              request.get('version', 'latest'))}
+            except FileNotFoundError as error:
+                return {'error': type(error).__name__ + ': ' + str(error)}
+
+        start_time = time.perf_counter()
+        try:
+            features = np.atleast_2d(np.asarray(request['features'], dtype=np.float64))
+            predictions = await self.batcher.predict(request.get('site'), request['model'],
+                                                     request.get('version', 'latest'), features)
+            answer = {'id': request.get('id'), 'predictions': predictions.tolist()}
+        except Exception as error:
+            answer = {'id': request.get('id'), 'error': type(error).__name__ + ': ' + str(error)}
+        self.stats.add(time.perf_counter() - start_time)
+
+        return answer
+
+    async def handle_client(self, reader, writer):
+        """
+        Answer the requests of a client, each as soon as it is ready (answers may not follow the order of requests).
+
+        :param object reader: stream reader of the connection
+        :param object writer: stream writer of the connection
+        """
+        async def answer_line(line):
+            try:
+                answer = await self.answer(json.loads(line))
+            except (ValueError, AttributeError) as error:
+                answer = {'error': 'Invalid request: ' + str(error)}
+            writer.write((json.dumps(answer) + '\n').encode())
+            await writer.drain()
+
+        tasks = set()
+        try:
+            async for line in reader:
+                if line.strip():
+                    task = asyncio.ensure_future(answer_line(line))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host='127.0.0.1', port=8765, socket_path=None):
+        """
+        Start the service on a TCP port of the host, or on a Unix socket.
+
+        :param string host: host of the service (local only by default)
+        :param int port: port of the service
+        :param string socket_path: location of the Unix socket (used instead of the host and port)
+        :return: Server
+        :rtype: object
+        """
+        if socket_path is not None:
+            server = await asyncio.start_unix_server(self.handle_client, path=socket_path)
+            print("Prediction service listening on", socket_path)
+        else:
+            server = await asyncio.start_server(self.handle_client, host, port)
+            print("Prediction service listening on", host + ':' + str(port))
+
+        return server
+
+
+async def serve(results, host='127.0.0.1', port=8765, socket_path=None, cache_size=16):
+    """
+    Run the prediction service until it is stopped, printing the latency on exit.
+
+    :param string results: location of the results folder (with a folder per version)
+    :param string host: host of the service (local only by default)
+    :param int port: port of the service
+    :param string socket_path: location of the Unix socket (used instead of the host and port)
+    :param int cache_size: maximum number of models kept loaded
+    """
+    prediction_server = PredictionServer(results, cache_size)
+    server = await prediction_server.start(host, port, socket_path)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        print("Prediction service stopped:", prediction_server.stats.get_stats())
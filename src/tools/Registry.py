@@ -0,0 +1,177 @@
+# Copyright 2017 Priscilla Boyd. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""
+    The Registry module keeps track of the models saved in a results folder, by:
+
+    -  Saving only the best estimator of a model (not the search of parameters), with joblib, so its arrays can be
+       memory-mapped when loaded (unless compressed).
+    -  Recording the files, features, schema hash, scores and training time of each model in a small index
+       (models/registry.json), so models can be listed and found without loading them.
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+import time
+import warnings
+import joblib
+import numpy as np
+
+# declare location of the index of models and of its lock file (relative to the results folder)
+registry_file = 'models/registry.json'
+lock_file = 'models/registry.lock'
+
+# declare compression level of saved estimators (0 keeps the arrays uncompressed, so they can be memory-mapped)
+compress_level = 0
+
+
+def get_feature_schema(X):
+    """
+    Get the names and types of the features of a set of examples.
+
+    :param dataframe X: examples (a dataframe, or an array with features named by position)
+    :return: Names and types of the features
+    :rtype: list[str], list[str]
+    """
+    if hasattr(X, 'dtypes'):
+        return [str(field) for field in X.columns], [str(dtype) for dtype in X.dtypes]
+
+    X = np.asarray(X)
+    return ['x' + str(index) for index in range(X.shape[-1])], [str(X.dtype)] * X.shape[-1]
+
+
+def get_schema_hash(features, feature_types):
+    """
+    Get a short hash of the names and types of the features, so a model is only used with matching features.
+
+    :param list[str] features: names of the features
+    :param list[str] feature_types: types of the features
+    :return: Schema hash
+    :rtype: string
+    """
+    schema = json.dumps([[str(name), str(feature_type)] for name, feature_type in zip(features, feature_types)])
+
+    return hashlib.sha256(schema.encode()).hexdigest()[:16]
+
+
+def read_registry(folder):
+    """
+    Read the index of the models of a results folder.
+
+    :param string folder: location of the results folder
+    :return: Entry of each model by name (empty if there is no index)
+    :rtype: dict
+    """
+    file = os.path.join(folder, registry_file)
+    if not os.path.exists(file):
+        return {}
+
+    with open(file) as registry:
+        return json.load(registry)
+
+
+def register_model(folder, name, model_type, files, features, feature_types, scores=None, train_seconds=None,
+                   params=None):
+    """
+    Add a model to the index of a results folder (replacing any model with the same name). The index is locked while
+    it is read and changed, so models can be registered by several processes at once, and is replaced in a single step
+    (readers never see a partly written index).
+
+    :param string folder: location of the results folder
+    :param string name: name of the model (e.g. dt_model_standard)
+    :param string model_type: type of the model ('cart', 'gbr' or 'rnn')
+    :param dict files: location of each file of the model, relative to the results folder ('estimator' and, if
+        exported, 'export')
+    :param list[str] features: names of the features
+    :param list[str] feature_types: types of the features
+    :param dict scores: scores of the model on the test data
+    :param float train_seconds: time taken to train the model (in seconds)
+    :param dict params: parameters of the model
+    :return: Entry of the model
+    :rtype: dict
+    """
+    entry = {'name': name, 'model': model_type, 'files': files, 'features': list(features),
+             'feature_types': list(feature_types), 'schema_hash': get_schema_hash(features, feature_types),
+             'scores': {key: float(value) for key, value in (scores or {}).items()}, 'train_seconds': train_seconds,
+             'params': {key: str(value) for key, value in (params or {}).items()},
+             'created': time.strftime('%Y-%m-%d %H:%M:%S')}
+
+    file = os.path.join(folder, registry_file)
+    os.makedirs(os.path.dirname(file), exist_ok=True)
+    with open(os.path.join(folder, lock_file), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            registry = read_registry(folder)
+            registry[name] = entry
+
+            # write to a file of this writer only, then replace the index with it
+            handle, temp_file = tempfile.mkstemp(dir=os.path.dirname(file), suffix='.tmp')
+            try:
+                with os.fdopen(handle, 'w') as registry_output:
+                    json.dump(registry, registry_output, indent=2)
+                os.replace(temp_file, file)
+            except BaseException:
+                os.remove(temp_file)
+                raise
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+    return entry
+
+
+def find_model(folder, model_type):
+    """
+    Find the most recently registered model of a type in a results folder.
+
+    :param string folder: location of the results folder
+    :param string model_type: type of the model ('cart', 'gbr' or 'rnn')
+    :return: Entry of the model, or None if there is no such model
+    :rtype: dict
+    """
+    entries = [entry for entry in read_registry(folder).values() if entry['model'] == model_type]
+
+    return max(entries, key=lambda entry: entry['created']) if entries else None
+
+
+def save_estimator(estimator, file, compress=compress_level):
+    """
+    Save an estimator with joblib.
+
+    :param object estimator: estimator (e.g. the best estimator of a search of parameters)
+    :param string file: location of the estimator file
+    :param int compress: compression level (0 keeps the arrays uncompressed, so they can be memory-mapped)
+    :return: Location of the estimator file
+    :rtype: string
+    """
+    joblib.dump(estimator, file, compress=compress)
+
+    return file
+
+
+def load_estimator(file):
+    """
+    Load an estimator saved with joblib, memory-mapping its arrays (read only) if the file is not compressed.
+
+    :param string file: location of the estimator file
+    :return: Estimator
+    :rtype: object
+    """
+    # compressed files cannot be memory-mapped, so are loaded into memory (without a warning)
+    with warnings.catch_warnings():
+        warnings.filterwarnings('ignore', message='.*not compatible with compressed file')
+        return joblib.load(file, mmap_mode='r')
@@ -18,8 +18,10 @@
 """
 
 import os
+import shutil
 import time
 import pandas as pd
+import pyarrow.dataset
 
 # grab root path from project definitions
 root_path = os.path.dirname(os.path.abspath('../'))
@@ -27,6 +29,36 @@ root_path = os.path.dirname(os.path.abspath('../'))
 # declare fields
 output_fields = ['Date', 'Time', 'Result', 'Phase']
 
+# declare number of records to be read at a time when streaming raw data
+chunk_size = 100000
+
+# declare storage format of intermediate data ('parquet' for typed columnar storage or 'csv')
+storage_format = 'parquet'
+
+# declare whether a CSV copy is also exported when intermediate data is stored in another format
+export_csv = False
+
+# declare file extension of each storage format
+storage_extensions = {'parquet': '.parquet', 'csv': '.csv'}
+
+# declare field with the timestamp combined from the Date and Time fields
+timestamp_field = 'Timestamp'
+
+# declare formats of the Date and Time fields of the raw data (day first, so dates are never read the wrong way round)
+date_format = '%d/%m/%Y'
+time_format = '%H:%M:%S'
+
+# declare schema of the dataset, i.e. the type of each known field (phase codes use the phase_code_type instead)
+dataset_schema = {timestamp_field: 'datetime64[ns]', 'Date': 'category', 'Time': 'category', 'Phase': 'category',
+                  'Result': 'int8'}
+
+# declare type of phases represented numerically (e.g. for scikit-learn)
+phase_code_type = 'int8'
+
+# declare type of detector I/O fields (0/1 states), which are identified by the io_field_prefix
+io_field_type = 'uint8'
+io_field_prefix = 'I/O '
+
 
 def convert_raw_data_to_df(raw_data):
     """
@@ -46,6 +78,35 @@ def convert_raw_data_to_df(raw_data):
     return source_data
 
 
+def get_raw_data_fields(raw_data):
+    """
+    Get the names of the fields available in CSV-formatted raw data, reading the header only.
+
+    :param string raw_data: location of CSV-formatted raw data
+    :return: List of field names
+    :rtype: list[str]
+    """
+    raw_data = root_path + '/data/' + raw_data
+    header = pd.read_csv(raw_data, header=0, skipinitialspace=True, nrows=0)
+
+    return list(header.columns)
+
+
+def stream_raw_data_to_df(raw_data, fields, size=chunk_size):
+    """
+    Read CSV-formatted raw data in chunks, loading the given fields only.
+
+    :param string raw_data: location of CSV-formatted raw data
+    :param list[str] fields: names of the fields to be loaded
+    :param int size: maximum number of records in each chunk
+    :return: Iterator of data frames with up to the given number of records each
+    :rtype: iterator
+    """
+    raw_data = root_path + '/data/' + raw_data
+
+    return pd.read_csv(raw_data, header=0, skipinitialspace=True, usecols=fields, chunksize=size)
+
+
 def create_folder_if_not_exists(folder):
     """
     Create a folder if it does not already exist.
@@ -112,6 +173,268 @@ def get_io_list_from_config(file):
     return io_list
 
 
+def get_storage_file(location, storage=None):
+    """
+    Get the file for a given data location (without extension) in the given storage format.
+
+    :param string location: location of the data without file extension
+    :param string storage: storage format (defaults to the configured storage format)
+    :return: Location of the file
+    :rtype: string
+    """
+    return location + storage_extensions[storage or storage_format]
+
+
+def find_storage_file(location):
+    """
+    Find the file for a given data location (without extension), preferring the configured storage format.
+
+    :param string location: location of the data without file extension
+    :return: Location of the existing file (or of the file in the configured storage format if none exist)
+    :rtype: string
+    """
+    storage_list = [storage_format] + [storage for storage in storage_extensions if storage != storage_format]
+    for storage in storage_list:
+        file = get_storage_file(location, storage)
+        if os.path.exists(file):
+            return file
+
+    return get_storage_file(location)
+
+
+def get_storage_locations(folder):
+    """
+    Get the locations (without extension) of the data stored in a folder using the configured storage format.
+
+    :param string folder: location of folder
+    :return: List of data locations, sorted by name
+    :rtype: list[str]
+    """
+    extension = storage_extensions[storage_format]
+    if not os.path.exists(folder):
+        return []
+
+    return sorted(os.path.join(folder, name[:-len(extension)]) for name in os.listdir(folder)
+                  if name.endswith(extension))
+
+
+def get_field_type(field, series=None):
+    """
+    Get the type of a field according to the dataset schema.
+
+    :param string field: name of the field
+    :param series series: values of the field, used to tell phase names from phase codes
+    :return: Type of the field (or None if the field is not in the schema)
+    :rtype: string
+    """
+    if str(field).startswith(io_field_prefix):
+        return io_field_type
+    if field == 'Phase' and series is not None and pd.api.types.is_numeric_dtype(series):
+        return phase_code_type
+
+    return dataset_schema.get(field)
+
+
+def apply_schema(df):
+    """
+    Convert known fields to the compact types declared in the dataset schema.
+
+    :param dataframe df: data to be converted
+    :return: Data with compact types
+    :rtype: dataframe
+    """
+    df = df.copy()
+    for field in df.columns:
+        field_type = get_field_type(field, df[field])
+        if field_type is not None and str(df[field].dtype) != field_type:
+            df[field] = df[field].astype(field_type)
+
+    return df
+
+
+def parse_timestamp(date, time):
+    """
+    Parse Date and Time fields into timestamps, converting each distinct date and time only once.
+
+    :param series date: dates of the records (in the date format, e.g. 29/09/2017)
+    :param series time: times of the records (in the time format, e.g. 10:00:01)
+    :return: Timestamps of the records
+    :rtype: series
+    """
+    date = pd.Categorical(date)
+    time = pd.Categorical(time)
+    day = pd.to_datetime(pd.Series(date.categories), format=date_format).to_numpy()[date.codes]
+    offset = (pd.to_datetime(pd.Series(time.categories), format=time_format) -
+              pd.Timestamp('1900-01-01')).to_numpy()[time.codes]
+
+    return pd.Series(day + offset, name=timestamp_field).astype(dataset_schema[timestamp_field])
+
+
+def get_epoch_seconds(df):
+    """
+    Get the timestamp of each record as seconds since the epoch, using the timestamp or Date and Time fields.
+
+    :param dataframe df: data with a timestamp field or Date and Time fields
+    :return: Epoch seconds of the records
+    :rtype: numpy.ndarray
+    """
+    if timestamp_field in df.columns:
+        timestamps = df[timestamp_field]
+    else:
+        timestamps = parse_timestamp(df['Date'], df['Time'])
+
+    return timestamps.to_numpy(dtype='datetime64[s]').astype('int64')
+
+
+def stream_dataset(file, fields=None, size=chunk_size):
+    """
+    Stream a dataset in chunks (in the order of the records), without loading the whole dataset into memory.
+
+    :param string file: location of the file (in any storage format)
+    :param list[str] fields: names of the fields to be loaded (defaults to all fields)
+    :param int size: maximum number of records in each chunk
+    :return: Generator of data frames, one for each chunk
+    :rtype: generator
+    """
+    if file.endswith(storage_extensions['parquet']):
+        batches = pyarrow.dataset.dataset(file).to_batches(columns=fields, batch_size=size)
+        return (batch.to_pandas() for batch in batches)
+
+    header = pd.read_csv(file, sep=',', header=0, skipinitialspace=True, nrows=0, usecols=fields)
+    types = {field: get_field_type(field) for field in header.columns
+             if get_field_type(field) in (io_field_type, dataset_schema['Result'])}
+
+    return pd.read_csv(file, sep=',', header=0, skipinitialspace=True, usecols=fields, dtype=types, chunksize=size)
+
+
+def count_records(file):
+    """
+    Count the records of a dataset (using the file metadata where available).
+
+    :param string file: location of the file (in any storage format)
+    :return: Number of records
+    :rtype: int
+    """
+    if file.endswith(storage_extensions['parquet']):
+        return pyarrow.dataset.dataset(file).count_rows()
+
+    header = pd.read_csv(file, sep=',', header=0, skipinitialspace=True, nrows=0)
+    return sum(len(chunk) for chunk in stream_dataset(file, fields=list(header.columns[:1])))
+
+
+def load_dataset(file, fields=None, size=chunk_size, timestamp=True, date_time=False):
+    """
+    Load a dataset applying the dataset schema, converting the data in chunks to keep memory usage low.
+
+    Date and Time fields are replaced by a single timestamp field, unless requested otherwise.
+
+    :param string file: location of the file (in any storage format)
+    :param list[str] fields: names of the fields to be loaded (defaults to all fields)
+    :param int size: maximum number of records converted at a time
+    :param boolean timestamp: Indicates whether a timestamp field is added using the Date and Time fields
+    :param boolean date_time: Indicates whether the Date and Time fields are kept
+    :return: Data with compact types
+    :rtype: dataframe
+    """
+    frames = []
+    for chunk in stream_dataset(file, fields=fields, size=size):
+        chunk = apply_schema(chunk)
+        if timestamp and 'Date' in chunk.columns and 'Time' in chunk.columns:
+            chunk.insert(0, timestamp_field, parse_timestamp(chunk['Date'], chunk['Time']).to_numpy())
+            if not date_time:
+                chunk = chunk.drop(['Date', 'Time'], axis=1)
+        frames.append(chunk)
+
+    # combine chunks, restoring categories that differ between chunks
+    if not frames:
+        return load_df(file, fields=fields)
+
+    return apply_schema(pd.concat(frames, ignore_index=True))
+
+
+def save_df(df, location, append=False, storage=None):
+    """
+    Save data to a location (without extension) using the configured storage format.
+
+    Appending to columnar data adds a new part file to a folder of parts, which is read back as a single data frame.
+
+    :param dataframe df: data to be saved
+    :param string location: location of the data without file extension
+    :param boolean append: Indicates whether data is appended to data previously saved
+    :param string storage: storage format (defaults to the configured storage format)
+    :return: Location of the file
+    :rtype: string
+    """
+    storage = storage or storage_format
+    file = get_storage_file(location, storage)
+    create_folder_if_not_exists(os.path.dirname(file))
+
+    if storage == 'csv':
+        df.to_csv(file, sep=',', index=False, header=not (append and os.path.exists(file)),
+                  mode='a' if append else 'w')
+    else:
+        df = apply_schema(df)
+        if not append:
+            remove_storage_file(file)
+            df.to_parquet(file, index=False)
+        else:
+            # keep parts in a folder, moving any single file previously saved into the folder
+            if os.path.isfile(file):
+                os.rename(file, file + '.part')
+                os.makedirs(file)
+                os.rename(file + '.part', os.path.join(file, 'part-00000.parquet'))
+            create_folder_if_not_exists(file)
+            part = len(os.listdir(file))
+            df.to_parquet(os.path.join(file, 'part-' + str(part).zfill(5) + '.parquet'), index=False)
+
+        # export CSV copy if required
+        if export_csv:
+            save_df(df, location, append=append, storage='csv')
+
+    return file
+
+
+def load_df(file, fields=None):
+    """
+    Load data from a file saved in any of the storage formats, based on its extension.
+
+    :param string file: location of the file
+    :param list[str] fields: names of the fields to be loaded (defaults to all fields)
+    :return: Data as dataframe
+    :rtype: dataframe
+    """
+    if file.endswith(storage_extensions['parquet']):
+        return pd.read_parquet(file, columns=fields)
+
+    return pd.read_csv(file, sep=',', header=0, skipinitialspace=True, usecols=fields)
+
+
+def remove_storage_file(file):
+    """
+    Remove a file (or folder of parts) if it exists.
+
+    :param string file: location of the file
+    """
+    if os.path.isdir(file):
+        shutil.rmtree(file)
+    elif os.path.exists(file):
+        os.remove(file)
+
+
+def combine_date_time(df):
+    """
+    Combine the Date and Time fields into a single Date_Time field.
+
+    :param dataframe df: data with Date and Time fields
+    :return: Data with a Date_Time field in place of the Date and Time fields
+    :rtype: dataframe
+    """
+    df = df.copy()
+    df.insert(0, 'Date_Time', parse_timestamp(df['Date'], df['Time']).to_numpy())
+
+    return df.drop(['Date', 'Time'], axis=1)
+
+
 def get_latest_dataset_folder():
     """
         Return the location of the latest dataset in the 'results' folder.
@@ -127,13 +450,13 @@ def get_latest_dataset_folder():
 
 def get_latest_dataset():
     """
-    Return the latest dataset (generic, i.e. dataset.csv file as created by the PreProcessing module).
+    Return the latest dataset (generic, i.e. dataset file as created by the PreProcessing module).
 
     :return: Location of the latest generic dataset
     :rtype: string
     """
     latest_folder = get_latest_dataset_folder()
-    file = latest_folder + '/dataset.csv'
+    file = find_storage_file(latest_folder + '/dataset')
     print("Dataset used: ", file)
 
     return file
@@ -147,7 +470,7 @@ def get_sklearn_data_with_duration():
     :rtype: string
     """
     latest_folder = get_latest_dataset_folder()
-    file = latest_folder + '/sklearn_dataset_with_duration.csv'
+    file = find_storage_file(latest_folder + '/sklearn_dataset_with_duration')
     print(file)
 
     return file
@@ -161,7 +484,7 @@ def get_sklearn_data_without_io():
     :rtype: string
     """
     latest_folder = get_latest_dataset_folder()
-    file = latest_folder + '/sklearn_dataset_without_io.csv'
+    file = find_storage_file(latest_folder + '/sklearn_dataset_without_io')
 
     return file
 
@@ -174,7 +497,7 @@ def get_sklearn_data_with_io():
     :rtype: string
     """
     latest_folder = get_latest_dataset_folder()
-    file = latest_folder + '/sklearn_dataset_with_io.csv'
+    file = find_storage_file(latest_folder + '/sklearn_dataset_with_io')
     return file
 
 
@@ -182,17 +505,19 @@ def get_sklearn_X_y(file, duration, datetime):
     """
     Return x and y values to be used with the scikit-learn framework.
 
-    :param string file: Location of the latest scikit-learn dataset
+    :param string file: Location of the latest scikit-learn dataset (in any storage format)
     :param boolean duration: Indicates whether dataset contains duration data
     :param boolean datetime: Indicates whether dataset contains timestamped records
-    :return: x and y values for scikit-learn model as individual dataframes
+    :return: x and y values for scikit-learn model as individual dataframes (in time order for duration data)
     :rtype: dataframe, dataframe
     :raises ValueError: if both duration and date/time are set to True.
     """
-    data = pd.read_csv(file, sep=',')
+    data = load_dataset(file, timestamp=False, date_time=True)
 
     # if duration, remove 'end' and 'start' as not useful features for learning
     if duration:
+        # intervals are grouped by phase, so put them in time order first (the most recent records come last)
+        data = data.sort_values(['Start', 'Phase'], kind='mergesort').reset_index(drop=True)
         del data['End']
         del data['Start']
 
@@ -221,11 +546,11 @@ def get_sklearn_X_y(file, duration, datetime):
 
 def print_number_records(file):
     """
-    Print out the number of records in a given CSV file.
+    Print out the number of records in a given file.
 
-    :param file: location of the CSV-formatted file
+    :param file: location of the file (in any storage format)
     """
-    df = pd.read_csv(file, sep=',')
+    df = load_df(file)
     print("Total number of records: ", len(df))
 
 
@@ -235,3 +560,6 @@ results_folder = root_path + '/results/' + current_dt + '/'
 
 # initialise raw folder
 raw_output_folder = results_folder + 'phases/raw/'
+
+# initialise folder for sites processed incrementally (one folder per site)
+sites_folder = root_path + '/sites/'
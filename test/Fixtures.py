@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+from preprocessing.Extractor import get_aspect_fields
+
+# declare aspects (0, 1 and 2) of each state: red, red/amber, amber and green
+state_aspects = {0: (1, 0, 0), 1: (1, 1, 0), 2: (0, 1, 0), 3: (0, 0, 1)}
+
+# declare cycle of a stage as (state, seconds): red, red/amber, green and amber
+state_cycle = [(0, 30), (1, 2), (3, 20), (2, 3)]
+
+
+def write_cfg_file(file, detectors=3):
+    """
+    Write a configuration file with I/O lines for the given number of detectors (and an unused line).
+    """
+    with open(file, 'w') as cfg:
+        for index in range(detectors):
+            cfg.write('IOLine' + str(index + 1) + ':D' + str(index) + ', foo, bar\n')
+        cfg.write('IOLine9:, unused\n')
+
+
+def write_raw_data(file, start='29/09/2017 23:55:00', num_records=600, stages=('A', 'B', 'C', 'D'), detectors=3,
+                   sup_records=2):
+    """
+    Write CSV-formatted raw data with a record per second, each stage cycling through its states (with an offset per
+    stage) and random detector states. The first records are SUP values. The records only depend on their position, so
+    a file with more records continues a file with fewer records.
+    """
+    timestamps = pd.to_datetime(start, format='%d/%m/%Y %H:%M:%S') + pd.to_timedelta(np.arange(num_records), unit='s')
+    data = {'Date': timestamps.strftime('%d/%m/%Y'), 'Time': timestamps.strftime('%H:%M:%S'),
+            'Mode Stream 0': np.where(np.arange(num_records) < sup_records, '8 - SUP ', '1 - FT ')}
+
+    cycle = np.concatenate([[state] * seconds for state, seconds in state_cycle])
+    for offset, stage in enumerate(stages):
+        states = cycle[(np.arange(num_records) + 13 * offset) % len(cycle)]
+        for aspect, field in enumerate(get_aspect_fields(stage)):
+            data[field] = [state_aspects[state][aspect] for state in states]
+
+    # each field is drawn from its own seed, so its first records are the same whatever the number of records
+    for index in range(detectors):
+        data['I/O D' + str(index) + ' [' + str(index + 1) + '] State'] = \
+            np.random.RandomState(index).randint(0, 2, num_records)
+        data['Other ' + str(index)] = np.random.RandomState(100 + index).normal(size=num_records)
+
+    pd.DataFrame(data).to_csv(file, index=False)
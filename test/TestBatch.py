@@ -0,0 +1,63 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+from Fixtures import write_cfg_file, write_raw_data
+from preprocessing.Batch import run_batch
+from tools.Utils import find_storage_file
+
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        # two tiny sites and a site whose raw data is missing, in a temporary root folder
+        self.folder = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.folder, 'data'))
+        os.makedirs(os.path.join(self.folder, 'config'))
+        write_raw_data(os.path.join(self.folder, 'data', 's1.csv'), num_records=200)
+        write_raw_data(os.path.join(self.folder, 'data', 's2.csv'), num_records=300)
+        write_cfg_file(os.path.join(self.folder, 'config', 'test.8SD'))
+        pd.DataFrame({'raw_data': ['s1.csv', 's2.csv', 'missing.csv'], 'cfg_file': 'test.8SD',
+                      'site_id': ['s1', 's2', 's3']}).to_csv(os.path.join(self.folder, 'config', 'manifest.csv'),
+                                                            index=False)
+
+        # worker processes are forked, so they share the patched root folder
+        for target in ['tools.Utils.root_path', 'preprocessing.Batch.root_path']:
+            patcher = mock.patch(target, self.folder)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.output_folder = os.path.join(self.folder, 'results', '')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_batch_of_sites(self):
+        summary = run_batch('manifest.csv', workers=2, output_folder=self.output_folder)
+        self.assertEqual(list(summary['site_id']), ['s1', 's2', 's3'])
+        self.assertEqual(list(summary['error'] != ''), [False, False, True])
+        self.assertTrue((summary['records'][:2] > 0).all())
+
+        # each site has its own folder of datasets, next to the summary
+        for site_id in ['s1', 's2']:
+            self.assertTrue(os.path.exists(find_storage_file(self.output_folder + site_id + '/dataset')))
+        self.assertFalse(os.path.exists(self.output_folder + 's3/dataset'))
+        self.assertTrue(os.path.exists(self.output_folder + 'batch_summary.csv'))
+
+    def test_incremental_batch_of_sites(self):
+        summary = run_batch('manifest.csv', workers=2, output_folder=self.output_folder, incremental=True)
+        self.assertTrue((summary['records'][:2] > 0).all())
+        for site_id in ['s1', 's2']:
+            self.assertTrue(os.path.exists(self.output_folder + site_id + '/watermark.json'))
+
+        # nothing is appended when there are no new records
+        summary = run_batch('manifest.csv', workers=2, output_folder=self.output_folder, incremental=True)
+        self.assertEqual(list(summary['records'][:2]), [0, 0])
+
+
+if __name__ == '__main__':
+    unittest.main()
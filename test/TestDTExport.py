@@ -0,0 +1,47 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+from sklearn.ensemble import GradientBoostingRegressor
+from sklearn.model_selection import GridSearchCV
+from sklearn.tree import DecisionTreeRegressor
+
+from decision_tree.DT_Export import TreePredictor, export_dt_model, flatten_trees, load_exported_dt
+
+
+class TestDTExport(unittest.TestCase):
+
+    def setUp(self):
+        random_state = np.random.RandomState(0)
+        self.X = random_state.normal(size=(500, 3))
+        self.y = self.X[:, 0] * 2 + np.sin(self.X[:, 1]) + random_state.normal(size=500)
+
+    def test_cart_predictions_identical(self):
+        model = GridSearchCV(DecisionTreeRegressor(), {'max_depth': [None, 4]}, cv=3).fit(self.X, self.y)
+        predictor = TreePredictor(flatten_trees(model))
+        np.testing.assert_array_equal(predictor.predict(self.X), model.predict(self.X))
+        self.assertEqual(predictor.predict_one(self.X[7]), model.predict(self.X[7:8])[0])
+
+    def test_gbr_predictions_identical(self):
+        model = GradientBoostingRegressor(n_estimators=20, max_depth=5).fit(self.X, self.y)
+        predictor = TreePredictor(flatten_trees(model))
+        np.testing.assert_array_equal(predictor.predict(self.X), model.predict(self.X))
+        self.assertEqual([predictor.predict_one(x) for x in self.X[:10]], model.predict(self.X[:10]).tolist())
+
+    def test_export_and_load(self):
+        folder = tempfile.mkdtemp()
+        try:
+            model = GradientBoostingRegressor(n_estimators=5).fit(self.X, self.y)
+            predictor = load_exported_dt(export_dt_model(model, os.path.join(folder, 'model_trees.joblib')))
+            np.testing.assert_array_equal(predictor.predict(self.X), model.predict(self.X))
+        finally:
+            shutil.rmtree(folder)
+
+    def test_unsupported_model(self):
+        self.assertRaises(ValueError, flatten_trees, object())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+
+import pandas as pd
+
+from preprocessing.Extractor import decode_phase_states, get_aspect_fields, get_extract_fields, get_phase_list, \
+    remove_sup_values
+
+
+class TestExtractor(unittest.TestCase):
+
+    def setUp(self):
+        # three records for two stages covering all states and an error (0/0/0)
+        aspects_a = [(1, 0, 0), (1, 1, 0), (0, 0, 0)]
+        aspects_b = [(0, 1, 0), (0, 0, 1), (1, 0, 0)]
+        data = {'Date': ['29/09/2017'] * 3, 'Time': ['10:00:00', '10:00:01', '10:00:02'],
+                'Mode Stream 0': ['1 - FT ', '1 - FT ', '8 - SUP ']}
+        for stage, aspects in (('A', aspects_a), ('B', aspects_b)):
+            for index, field in enumerate(get_aspect_fields(stage)):
+                data[field] = [record[index] for record in aspects]
+        self.df = pd.DataFrame(data)
+
+    def test_aspect_fields(self):
+        self.assertEqual(get_aspect_fields('A'), ['Aspect 0 of Phase A  State', 'Aspect 1 of Phase A  State',
+                                                  'Aspect 2 of Phase A  State'])
+
+    def test_decode_phase_states(self):
+        phase_df = decode_phase_states(['A', 'B'], self.df)
+        self.assertEqual(list(phase_df.columns), ['Date', 'Time', 'Result', 'Phase'])
+
+        # error record for stage A is removed, records are ordered by time then stage
+        self.assertEqual(list(phase_df['Phase']), ['A', 'B', 'A', 'B', 'B'])
+        self.assertEqual(list(phase_df['Result']), [0, 2, 1, 3, 0])
+        self.assertEqual(list(phase_df['Time']), ['10:00:00', '10:00:00', '10:00:01', '10:00:01', '10:00:02'])
+
+    def test_phase_list_detected(self):
+        self.assertEqual(get_phase_list(list(self.df.columns)), ['A', 'B'])
+
+    def test_extract_fields(self):
+        fields = get_extract_fields(['A'], ['Date', 'Time', 'I/O D1 [1] State'])
+        self.assertEqual(fields, ['Date', 'Time', 'Mode Stream 0'] + get_aspect_fields('A') + ['I/O D1 [1] State'])
+
+    def test_sup_values_removed(self):
+        self.assertEqual(len(remove_sup_values(self.df)), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
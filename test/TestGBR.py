@@ -0,0 +1,46 @@
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from decision_tree.GBR import benchmark_hist_gbr, get_categorical_features, get_validation_split, run_gbr
+
+
+class TestGBR(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        random_state = np.random.RandomState(0)
+        self.X = pd.DataFrame({'Phase': np.arange(400) % 4, 'Duration': random_state.randint(0, 30, 400)})
+        self.y = pd.Series((self.X['Phase'] + self.X['Duration'] // 10) % 4)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_categorical_features(self):
+        self.assertEqual(get_categorical_features(self.X), [True, False])
+        self.assertIsNone(get_categorical_features(self.X[['Duration']]))
+        self.assertIsNone(get_categorical_features(self.X.to_numpy()))
+
+    def test_validation_split_keeps_time_order(self):
+        X_fit, y_fit, X_val, y_val = get_validation_split(self.X, self.y, 0.25)
+        np.testing.assert_array_equal(X_fit, self.X[:300])
+        np.testing.assert_array_equal(X_val, self.X[300:])
+
+    def test_histogram_engine(self):
+        mse, score = run_gbr(self.X[:320], self.X[320:], self.y[:320], self.y[320:], self.folder, n_jobs=1,
+                             search='halving', max_evaluations=2, engine='histogram')
+        self.assertLess(mse, 0.1)
+        self.assertRaises(ValueError, run_gbr, self.X, self.X, self.y, self.y, self.folder, engine='unknown')
+
+    def test_benchmark_hist_gbr(self):
+        results = benchmark_hist_gbr(self.X[:320], self.X[320:], self.y[:320], self.y[320:])
+        self.assertEqual(list(results['engine']), ['standard', 'histogram'])
+        self.assertTrue((results['fit_seconds'] > 0).all())
+        self.assertLess(results['mse'][1], 0.1)
+
+
+if __name__ == '__main__':
+    unittest.main()
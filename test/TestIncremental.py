@@ -0,0 +1,78 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+from Fixtures import write_cfg_file, write_raw_data
+from preprocessing.Incremental import get_site_folder, run_incremental
+from preprocessing.Pipeline import Pipeline
+from tools.Utils import find_storage_file, load_dataset
+
+
+class TestIncremental(unittest.TestCase):
+
+    def setUp(self):
+        # raw data and configuration in a temporary root folder, with day2 continuing day1 over midnight
+        self.folder = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.folder, 'data'))
+        os.makedirs(os.path.join(self.folder, 'config'))
+        write_raw_data(os.path.join(self.folder, 'data', 'day1.csv'), num_records=450)
+        write_raw_data(os.path.join(self.folder, 'data', 'day2.csv'), num_records=900)
+        write_cfg_file(os.path.join(self.folder, 'config', 'test.8SD'))
+
+        for target, value in [('tools.Utils.root_path', self.folder),
+                              ('preprocessing.Incremental.sites_folder', os.path.join(self.folder, 'sites', ''))]:
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.site_id = 'e80374'
+        self.site_folder = get_site_folder(self.site_id)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def load_site_data(self, name):
+        return load_dataset(find_storage_file(self.site_folder + name), timestamp=False)
+
+    def assert_matches_full_rebuild(self, state):
+        outputs = Pipeline('day2.csv', 'test.8SD', save=[]).run()
+
+        # records are appended after the watermark only, so the dataset is the same as a full rebuild
+        pd.testing.assert_frame_equal(self.load_site_data('dataset'), outputs['dataset'].reset_index(drop=True))
+        pd.testing.assert_frame_equal(self.load_site_data('sklearn_dataset_with_io'),
+                                      outputs['sklearn_with_io'].reset_index(drop=True))
+
+        # the durations are the same, except for the intervals held open for the next run
+        full_durations = outputs['sklearn_with_duration'].astype({'Phase': 'int8'})
+        held_open = pd.Series(False, index=full_durations.index)
+        for phase_value, phase in enumerate(['A', 'B', 'C', 'D']):
+            start = pd.to_datetime(state['open_intervals'][phase]['Start'], unit='s')
+            held_open |= (full_durations['Phase'] == phase_value) & (full_durations['Start'] == start)
+        pd.testing.assert_frame_equal(
+            self.load_site_data('sklearn_dataset_with_duration').sort_values(['Phase', 'Start']).reset_index(drop=True),
+            full_durations[~held_open].sort_values(['Phase', 'Start']).reset_index(drop=True))
+
+    def test_incremental_matches_full_rebuild(self):
+        # day1 is processed first, then day2 (the records of day1 followed by new records, over midnight)
+        first_state = run_incremental('day1.csv', 'test.8SD', self.site_id)
+        state = run_incremental('day2.csv', 'test.8SD', self.site_id)
+        self.assertGreater(state['watermark'], first_state['watermark'])
+        self.assert_matches_full_rebuild(state)
+
+    def test_run_stopped_before_watermark(self):
+        run_incremental('day1.csv', 'test.8SD', self.site_id)
+
+        # the records of day2 are appended, but the run stops before saving its watermark
+        with mock.patch('preprocessing.Incremental.save_watermark', side_effect=RuntimeError('stopped')):
+            self.assertRaises(RuntimeError, run_incremental, 'day2.csv', 'test.8SD', self.site_id)
+
+        # the retry discards the records appended after the watermark before appending them again
+        state = run_incremental('day2.csv', 'test.8SD', self.site_id)
+        self.assert_matches_full_rebuild(state)
+
+if __name__ == '__main__':
+    unittest.main()
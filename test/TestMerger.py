@@ -0,0 +1,31 @@
+import unittest
+
+import pandas as pd
+
+from preprocessing.Merger import merge_phase_io
+
+
+class TestMerger(unittest.TestCase):
+
+    def setUp(self):
+        self.phase_df = pd.DataFrame({'Date': ['29/09/2017'] * 4, 'Time': ['10:00:00', '10:00:00', '10:00:01', '10:00:01'],
+                                      'Result': [0, 3, 0, 3], 'Phase': ['A', 'B', 'A', 'A']})
+        self.detection_df = pd.DataFrame({'Date': ['29/09/2017'] * 3, 'Time': ['10:00:01', '10:00:00', '10:00:00'],
+                                          'I/O D1 [1] State': [1, 0, 1]})
+
+    def test_exact_merge(self):
+        merged_df = merge_phase_io(self.phase_df, self.detection_df)
+
+        # duplicate phase record (same second and phase) and duplicate I/O record (same second) are dropped
+        self.assertEqual(list(merged_df.columns), ['Date', 'Time', 'Result', 'Phase', 'I/O D1 [1] State'])
+        self.assertEqual(list(merged_df['Phase']), ['A', 'B', 'A'])
+        self.assertEqual(list(merged_df['I/O D1 [1] State']), [0, 0, 1])
+
+    def test_merge_with_tolerance(self):
+        detection_df = self.detection_df.assign(Time=['10:00:03', '10:00:02', '10:00:02'])
+        self.assertEqual(len(merge_phase_io(self.phase_df, detection_df)), 0)
+        self.assertEqual(len(merge_phase_io(self.phase_df, detection_df, tolerance=2)), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from Fixtures import write_cfg_file, write_raw_data
+from decision_tree.Orchestrator import get_site_datasets, share_partitions, train_partition
+from preprocessing.Batch import run_batch
+from tools.Utils import save_df
+
+
+class TestOrchestrator(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp() + '/'
+        self.datasets = {}
+        for site_id, size in [('e80374', 10), ('e80375', 6)]:
+            df = pd.DataFrame({'Phase': np.arange(size) % 2, 'Result': np.arange(size) % 4,
+                               'Start': pd.Timestamp('2017-09-29'), 'End': pd.Timestamp('2017-09-29'),
+                               'Duration': np.arange(size, dtype=float)})
+            self.datasets[site_id] = save_df(df, self.folder + site_id + '/sklearn_dataset_with_duration')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_partitions_are_contiguous(self):
+        partitions = share_partitions(self.datasets, self.folder + 'data/')
+        self.assertEqual([list(partition['keys'].values()) for partition in partitions],
+                         [['e80374', '0'], ['e80374', '1'], ['e80375', '0'], ['e80375', '1']])
+        self.assertEqual([(partition['start'], partition['test_start'], partition['stop'])
+                          for partition in partitions], [(0, 4, 5), (5, 9, 10), (10, 12, 13), (13, 15, 16)])
+
+        # records of a partition keep their time order (Phase, Duration)
+        X = np.load(self.folder + 'data/X.npy', mmap_mode='r')
+        np.testing.assert_array_equal(X[5:10], [[1, 1], [1, 3], [1, 5], [1, 7], [1, 9]])
+
+    def test_site_datasets_of_batch_output(self):
+        # raw data of two sites and a site whose raw data is missing, with the temporary folder as root folder
+        for name in ['data', 'config']:
+            os.makedirs(self.folder + name)
+        write_raw_data(self.folder + 'data/s1.csv', num_records=400)
+        write_raw_data(self.folder + 'data/s2.csv', start='30/09/2017 10:00:00', num_records=400)
+        write_cfg_file(self.folder + 'config/test.8SD')
+        pd.DataFrame({'raw_data': ['s1.csv', 's2.csv', 'missing.csv'], 'cfg_file': 'test.8SD',
+                      'site_id': ['s1', 's2', 's3']}).to_csv(self.folder + 'config/manifest.csv', index=False)
+
+        with mock.patch('tools.Utils.root_path', self.folder), mock.patch('preprocessing.Batch.root_path', self.folder):
+            summary = run_batch('manifest.csv', workers=1, output_folder=self.folder + 'batch/')
+        self.assertEqual(list(summary['error'] != ''), [False, False, True])
+
+        # the batch summary and the failed site are not treated as sites
+        datasets = get_site_datasets(self.folder + 'batch/')
+        self.assertEqual(sorted(datasets), ['s1', 's2'])
+        self.assertGreater(len(share_partitions(datasets, self.folder + 'data/')), 0)
+
+    def test_partition_by_target_not_allowed(self):
+        self.assertRaises(ValueError, share_partitions, self.datasets, self.folder + 'data/', ['site', 'Result'])
+
+    def test_small_partition_reported(self):
+        partitions = share_partitions(self.datasets, self.folder + 'data/')
+        summary = train_partition(self.folder + 'data/', partitions[0], 'cart', self.folder)
+        self.assertIn('Not enough records', summary['error'])
+        self.assertEqual(summary['train_records'], 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
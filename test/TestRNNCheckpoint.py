@@ -0,0 +1,55 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import pandas as pd
+
+from neural_network.RNN_Checkpoint import best_checkpoint_file, training_log_file, get_best_loss, \
+    get_last_checkpoint, load_checkpoint
+
+
+class TestRNNCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp() + '/'
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def save_checkpoints(self, epochs):
+        for file in ['RNN_checkpoint_' + str(epoch).zfill(4) + '.h5' for epoch in epochs] + [best_checkpoint_file]:
+            open(self.folder + file, 'w').close()
+        pd.DataFrame({'epoch': range(max(epochs)), 'val_loss': [0.5, 0.3, 0.4][:max(epochs)]}).to_csv(
+            self.folder + training_log_file, index=False)
+
+    def test_last_checkpoint(self):
+        self.assertEqual(get_last_checkpoint(self.folder), (None, 0))
+        self.save_checkpoints([2, 3])
+        self.assertEqual(get_last_checkpoint(self.folder), (self.folder + 'RNN_checkpoint_0003.h5', 3))
+
+    def test_resume_from_last_checkpoint(self):
+        self.save_checkpoints([2, 3])
+        model, initial_epoch = load_checkpoint(self.folder, load_function=os.path.basename)
+
+        # training continues after the epochs completed, keeping the best loss so far
+        self.assertEqual((model, initial_epoch), ('RNN_checkpoint_0003.h5', 3))
+        self.assertEqual(get_best_loss(self.folder), 0.3)
+
+    def test_start_from_scratch(self):
+        self.save_checkpoints([2, 3])
+        model, initial_epoch = load_checkpoint(self.folder, resume=False, load_function=os.path.basename)
+
+        # checkpoints and log of the previous run are removed
+        self.assertEqual((model, initial_epoch), (None, 0))
+        self.assertEqual(os.listdir(self.folder), [])
+        self.assertIsNone(get_best_loss(self.folder))
+
+    def test_no_checkpoint_to_resume(self):
+        model, initial_epoch = load_checkpoint(self.folder + 'checkpoints/', load_function=os.path.basename)
+        self.assertEqual((model, initial_epoch), (None, 0))
+        self.assertTrue(os.path.isdir(self.folder + 'checkpoints/'))
+
+
+if __name__ == '__main__':
+    unittest.main()
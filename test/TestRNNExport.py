@@ -0,0 +1,68 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from neural_network.RNN_Export import export_model, export_tolerance, load_exported, predict
+from neural_network.RNN_Inference import StreamingPredictor
+
+
+class LSTM(object):
+    # minimal stand-in for a Keras LSTM layer (weights and configuration only)
+    def __init__(self, weights, return_sequences):
+        self.weights = weights
+        self.config = {'activation': 'tanh', 'recurrent_activation': 'hard_sigmoid',
+                       'return_sequences': return_sequences}
+
+    def get_config(self):
+        return self.config
+
+    def get_weights(self):
+        return self.weights
+
+
+class Dense(LSTM):
+    def __init__(self, weights):
+        LSTM.__init__(self, weights, False)
+        self.config = {'activation': 'linear'}
+
+
+class Model(object):
+    def __init__(self, layers):
+        self.layers = layers
+
+
+class TestRNNExport(unittest.TestCase):
+
+    def setUp(self):
+        random_state = np.random.RandomState(0)
+        self.model = Model([LSTM([random_state.randn(1, 16), random_state.randn(4, 16), random_state.randn(16)], True),
+                            LSTM([random_state.randn(4, 8), random_state.randn(2, 8), random_state.randn(8)], False),
+                            Dense([random_state.randn(2, 1), random_state.randn(1)])])
+        self.X = random_state.randint(0, 4, (5, 19, 1)).astype(np.float32)
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_predict_matches_streaming(self):
+        layers = load_exported(export_model(self.model, os.path.join(self.folder, 'model.npz')))
+        predictor = StreamingPredictor(layers)
+        for step in range(self.X.shape[1]):
+            expected = predictor.update_many(list(range(5)), self.X[:, step])
+
+        np.testing.assert_allclose(predict(layers, self.X), expected, atol=1e-5)
+
+    def test_quantized_export_within_tolerance(self):
+        file = os.path.join(self.folder, 'model_int8.npz')
+        layers = load_exported(export_model(self.model, os.path.join(self.folder, 'model.npz')))
+        quantized = load_exported(export_model(self.model, file, 'int8'))
+
+        difference = np.abs(predict(quantized, self.X) - predict(layers, self.X)).max()
+        self.assertLess(difference, export_tolerance['int8'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from neural_network.RNN_Features import get_features, get_windows, split_test_training_values, split_windows
+
+
+class TestRNNFeatures(unittest.TestCase):
+
+    def setUp(self):
+        # phase B has no record in the second second
+        self.df = pd.DataFrame({'Timestamp': pd.to_datetime(['2017-09-29 10:00:00', '2017-09-29 10:00:00',
+                                                             '2017-09-29 10:00:01', '2017-09-29 10:00:02',
+                                                             '2017-09-29 10:00:02']),
+                                'Result': [0, 2, 1, 3, 0],
+                                'Phase': ['A', 'B', 'A', 'B', 'A'],
+                                'I/O D1 [1] State': [1, 1, 0, 1, 1]})
+
+    def test_features_one_row_per_second(self):
+        features, names = get_features(self.df)
+        self.assertEqual(names, ['A', 'B', 'I/O D1 [1] State'])
+        self.assertEqual(features.dtype, np.float32)
+
+        # missing state of phase B is carried forward
+        np.testing.assert_array_equal(features, [[0, 2, 1], [1, 2, 0], [0, 3, 1]])
+
+    def test_selected_features(self):
+        features, names = get_features(self.df, stage_list=['B'], io_fields=[])
+        self.assertEqual(names, ['B'])
+        np.testing.assert_array_equal(features[:, 0], [2, 2, 3])
+
+        # records of phase A are left out without a warning
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            features, names = get_features(self.df, stage_list=['B'], io_fields=[])
+        self.assertEqual(features.shape, (3, 1))
+
+    def test_windows_are_views(self):
+        features = np.arange(30, dtype=np.float32).reshape(10, 3)
+        windows = get_windows(features, 4)
+        self.assertEqual(windows.shape, (6, 4, 3))
+        self.assertTrue(np.shares_memory(windows, features))
+        np.testing.assert_array_equal(windows[2], features[2:6])
+
+    def test_split_windows_with_horizon(self):
+        # windows of 4 steps: 2 steps as examples (sequence length 3) and 2 future steps as targets
+        windows = get_windows(np.arange(30, dtype=np.float32).reshape(10, 3), 4)
+        X, y = split_windows(windows, 3, num_targets=2)
+        self.assertEqual(X.shape, (6, 2, 3))
+        np.testing.assert_array_equal(y[0], [6, 7, 9, 10])
+
+        # a single target keeps one value per window
+        X, y = split_windows(np.arange(12).reshape(3, 4), 4)
+        self.assertEqual(X.shape, (3, 3, 1))
+        np.testing.assert_array_equal(y, [3, 7, 11])
+
+    def split_test_training_loop(self, values, sequence_length, horizon):
+        # windows built one at a time (as split_test_training did before windowing over a view)
+        window_length = sequence_length + horizon - 1
+        result = np.array([values[i:i + window_length] for i in range(len(values) - window_length)])
+        row = round(0.8 * result.shape[0])
+        train = result[:row]
+        X_train, X_test = train[:, :sequence_length - 1], result[row:, :sequence_length - 1]
+        y_train, y_test = train[:, sequence_length - 1:], result[row:, sequence_length - 1:]
+        if horizon == 1:
+            y_train, y_test = y_train[:, 0], y_test[:, 0]
+        return [X_train[:, :, np.newaxis], y_train, X_test[:, :, np.newaxis], y_test]
+
+    def test_split_values_as_loop(self):
+        values = np.random.RandomState(0).randint(0, 4, 50).astype(np.float32)
+        for horizon in [1, 3]:
+            X_train, y_train, X_test, y_test = split_test_training_values(values, 10, horizon)
+            loop_X_train, loop_y_train, loop_X_test, loop_y_test = self.split_test_training_loop(values, 10, horizon)
+
+            # test examples keep their order, training examples are shuffled (with their targets)
+            np.testing.assert_array_equal(X_test, loop_X_test)
+            np.testing.assert_array_equal(y_test, loop_y_test)
+            self.assertEqual(X_train.shape, loop_X_train.shape)
+            order = np.lexsort(X_train[:, ::-1, 0].T)
+            loop_order = np.lexsort(loop_X_train[:, ::-1, 0].T)
+            np.testing.assert_array_equal(X_train[order], loop_X_train[loop_order])
+            np.testing.assert_array_equal(y_train[order], loop_y_train[loop_order])
+
+        # the targets of each window are the values after its examples, one for each horizon
+        X_train, y_train, X_test, y_test = split_test_training_values(np.arange(20), 4, horizon=2)
+        self.assertEqual(X_test.shape, (3, 3, 1))
+        np.testing.assert_array_equal(X_test[0, :, 0], [12, 13, 14])
+        np.testing.assert_array_equal(y_test[0], [15, 16])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from neural_network.RNN_Inference import StreamingPredictor
+
+
+class TestRNNInference(unittest.TestCase):
+
+    def setUp(self):
+        random_state = np.random.RandomState(0)
+
+        # LSTM layer with 3 units, followed by a dense layer with a single output
+        self.layers = [{'type': 'lstm', 'activation': 'tanh', 'recurrent_activation': 'hard_sigmoid',
+                        'weights': [random_state.randn(1, 12).astype(np.float32),
+                                    random_state.randn(3, 12).astype(np.float32),
+                                    random_state.randn(12).astype(np.float32)]},
+                       {'type': 'dense', 'activation': 'linear',
+                        'weights': [random_state.randn(3, 1).astype(np.float32), np.zeros(1, dtype=np.float32)]}]
+        self.observations = random_state.randint(0, 4, (10, 2)).astype(np.float32)
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_junctions_are_independent(self):
+        predictor = StreamingPredictor(self.layers)
+        single = StreamingPredictor(self.layers)
+        for observation in self.observations:
+            predictions = predictor.update_many(['e80374', 'e80375'], observation[:, np.newaxis])
+            prediction = single.update('e80375', observation[1])
+
+        np.testing.assert_allclose(predictions[1], prediction, atol=1e-6)
+
+    def test_restore_checkpoint(self):
+        predictor = StreamingPredictor(self.layers)
+        for observation in self.observations[:5]:
+            predictor.update_many(['e80374', 'e80375'], observation[:, np.newaxis])
+        predictor.checkpoint(os.path.join(self.folder, 'state.npz'))
+
+        restored = StreamingPredictor(self.layers)
+        restored.restore(os.path.join(self.folder, 'state.npz'))
+        for observation in self.observations[5:]:
+            expected = predictor.update_many(['e80374', 'e80375'], observation[:, np.newaxis])
+            predictions = restored.update_many(['e80374', 'e80375'], observation[:, np.newaxis])
+
+        np.testing.assert_array_equal(predictions, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
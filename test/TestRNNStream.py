@@ -0,0 +1,46 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from neural_network.RNN_Stream import get_window_ranges, get_steps, stream_windows, window_batches
+from tools.Utils import save_df
+
+
+class TestRNNStream(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.result = np.random.RandomState(0).randint(0, 4, 1003).astype(np.float32)
+        self.file = save_df(pd.DataFrame({'Result': self.result}), self.folder + '/dataset', storage='csv')
+        self.windows = sliding_window_view(self.result, 20)[:-1]
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_windows_cross_chunks(self):
+        # small chunks, so most windows span two or more chunks
+        windows = np.concatenate(list(stream_windows(self.file, 20, 5, 900, size=7)))
+        np.testing.assert_array_equal(windows, self.windows[5:900])
+
+    def test_shuffled_batches_cover_range(self):
+        ranges = get_window_ranges(self.file, 20)
+        self.assertEqual(ranges['test'], (786, 983))
+
+        batches = list(window_batches(self.file, 20, ranges['train'], 64, epochs=1, seed=1, size=100))
+        self.assertEqual(len(batches), get_steps(ranges['train'], 64))
+        self.assertEqual(batches[0][0].shape, (64, 19, 1))
+
+        # every training window appears exactly once, in a different order
+        windows = np.concatenate([np.hstack([X[:, :, 0], y[:, np.newaxis]]) for X, y in batches])
+        expected = self.windows[:ranges['train'][1]]
+        self.assertFalse(np.array_equal(windows, expected))
+        np.testing.assert_array_equal(windows[np.lexsort(windows.T[::-1])], expected[np.lexsort(expected.T[::-1])])
+
+
+if __name__ == "__main__":
+    unittest.main()
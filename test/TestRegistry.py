@@ -0,0 +1,82 @@
+import os
+import shutil
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import GridSearchCV
+from sklearn.tree import DecisionTreeRegressor
+
+from decision_tree.DT_Utils import save_dt_model
+from tools.Registry import find_model, get_feature_schema, get_schema_hash, load_estimator, read_registry, \
+    register_model, save_estimator
+
+
+def register_models(folder, writer, count):
+    for index in range(count):
+        register_model(folder, 'model_' + str(writer) + '_' + str(index), 'cart', {}, ['Phase'], ['int8'])
+
+
+class TestRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        random_state = np.random.RandomState(0)
+        self.X = pd.DataFrame({'Phase': random_state.randint(0, 4, 200).astype(np.int8),
+                               'Duration': random_state.randint(0, 30, 200)})
+        self.y = (self.X['Phase'] + self.X['Duration'] // 10) % 4
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_concurrent_writers(self):
+        with ProcessPoolExecutor(4) as executor:
+            futures = [executor.submit(register_models, self.folder, writer, 25) for writer in range(4)]
+            for future in futures:
+                future.result()
+
+        self.assertEqual(len(read_registry(self.folder)), 100)
+        self.assertFalse([file for file in os.listdir(os.path.join(self.folder, 'models')) if file.endswith('.tmp')])
+
+    def test_schema_hash(self):
+        features, feature_types = get_feature_schema(self.X)
+        self.assertEqual((features, feature_types), (['Phase', 'Duration'], ['int8', 'int64']))
+        self.assertEqual(get_schema_hash(features, feature_types), get_schema_hash(['Phase', 'Duration'],
+                                                                                  ['int8', 'int64']))
+        self.assertNotEqual(get_schema_hash(features, feature_types), get_schema_hash(['Phase', 'Duration'],
+                                                                                     ['int64', 'int64']))
+
+    def test_find_latest_model(self):
+        self.assertIsNone(find_model(self.folder, 'cart'))
+        register_model(self.folder, 'dt_model_gbr', 'gbr', {'estimator': 'gbr.joblib'}, [], [])
+        entry = register_model(self.folder, 'dt_model_standard', 'cart', {'estimator': 'cart.joblib'}, ['Phase'],
+                               ['int8'], {'mse': 0.5}, 1.5)
+        self.assertEqual(find_model(self.folder, 'cart'), entry)
+        self.assertEqual(sorted(read_registry(self.folder)), ['dt_model_gbr', 'dt_model_standard'])
+
+    def test_save_best_estimator_only(self):
+        model = GridSearchCV(DecisionTreeRegressor(), {'max_depth': [2, 5]}, cv=3).fit(self.X, self.y)
+        os.makedirs(os.path.join(self.folder, 'models'))
+        entry = save_dt_model('dt_model_standard', model, self.folder, self.X, {'mse': 0.1, 'score': 0.9}, 2.0)
+
+        self.assertEqual(entry['files'], {'estimator': 'models/dt_model_standard.joblib',
+                                          'export': 'models/dt_model_standard_trees.joblib'})
+        self.assertEqual((entry['model'], entry['features'], entry['scores'], entry['train_seconds']),
+                         ('cart', ['Phase', 'Duration'], {'mse': 0.1, 'score': 0.9}, 2.0))
+        self.assertEqual(entry['params'], {'max_depth': str(model.best_params_['max_depth'])})
+
+        estimator = load_estimator(os.path.join(self.folder, entry['files']['estimator']))
+        self.assertIsInstance(estimator, DecisionTreeRegressor)
+        np.testing.assert_array_equal(estimator.predict(self.X), model.predict(self.X))
+
+    def test_load_compressed_estimator(self):
+        file = save_estimator({'values': np.arange(10)}, os.path.join(self.folder, 'values.joblib'), compress=3)
+        np.testing.assert_array_equal(load_estimator(file)['values'], np.arange(10))
+        file = save_estimator({'values': np.arange(10)}, os.path.join(self.folder, 'values.joblib'))
+        self.assertIsInstance(load_estimator(file)['values'], np.memmap)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import GridSearchCV
+from sklearn.tree import DecisionTreeRegressor
+
+from decision_tree.Search import BudgetedSearchCV, TimeSeriesGridSearchCV, get_search, get_time_folds
+from tools.Utils import get_sklearn_X_y, save_df
+
+# declare earliest duration (i.e. record) seen by each fit of the recording tree
+fitted_durations = []
+
+
+class RecordingTree(DecisionTreeRegressor):
+
+    def fit(self, X, y, sample_weight=None, check_input=True):
+        fitted_durations.append(np.asarray(X)[:, 1].min())
+        return super().fit(X, y, sample_weight, check_input)
+
+
+class TestSearch(unittest.TestCase):
+
+    def setUp(self):
+        random_state = np.random.RandomState(0)
+        self.X = random_state.randint(0, 10, (600, 2)).astype(float)
+        self.y = self.X[:, 0] * 3 + random_state.normal(0, 0.1, 600)
+        self.param_grid = {'max_depth': [1, 2, 10], 'min_samples_leaf': [1, 3, 100]}
+
+    def test_halving_finds_best_parameters(self):
+        search = BudgetedSearchCV(DecisionTreeRegressor(), self.param_grid, n_jobs=1).fit(self.X, self.y)
+        self.assertEqual(search.best_params_['max_depth'], 10)
+        self.assertLess(search.n_evaluations_, 2 * len(search.cv_results_['params']) + 1)
+        self.assertGreater(search.score(self.X, self.y), 0.99)
+
+    def test_evaluation_budget(self):
+        search = BudgetedSearchCV(DecisionTreeRegressor(), self.param_grid, max_evaluations=4,
+                                  n_jobs=1).fit(self.X, self.y)
+        self.assertEqual(search.n_evaluations_, 4)
+        self.assertEqual(len(search.cv_results_['params']), 4)
+
+    def test_resources_increase_by_factor(self):
+        search = BudgetedSearchCV(DecisionTreeRegressor(), self.param_grid, resource='n_estimators',
+                                  min_resources=10, max_resources=90)
+        self.assertEqual(search.get_resources(600), [10, 30, 90])
+
+    def test_time_folds(self):
+        self.assertEqual(get_time_folds(20, 3), [(0, 5, 5, 10), (0, 10, 10, 15), (0, 15, 15, 20)])
+        self.assertEqual(get_time_folds(21, 3, 'rolling'), [(0, 5, 5, 10), (0, 10, 10, 15), (5, 15, 15, 21)])
+        self.assertRaises(ValueError, get_time_folds, 3, 5)
+
+    def get_phase_grouped_X_y(self, num_records):
+        # intervals grouped by phase (as built by the SkLearnProcessor), with the duration giving the time order
+        folder = tempfile.mkdtemp() + '/'
+        start = pd.Timestamp('2017-09-29 23:55:00') + pd.to_timedelta(np.arange(num_records), unit='s')
+        df = pd.DataFrame({'Phase': np.arange(num_records) % 4, 'Result': np.arange(num_records) % 3, 'Start': start,
+                           'End': start, 'Duration': np.arange(num_records)})
+        df = df.sort_values('Phase', kind='mergesort')
+        X, y = get_sklearn_X_y(save_df(df, folder + 'sklearn_dataset_with_duration'), duration=True, datetime=False)
+        shutil.rmtree(folder)
+
+        return X, y
+
+    def test_time_folds_on_phase_grouped_data(self):
+        X, y = self.get_phase_grouped_X_y(120)
+        for train_start, train_stop, test_start, test_stop in get_time_folds(len(X), 5):
+            self.assertLess(X['Duration'][train_start:train_stop].max(), X['Duration'][test_start:test_stop].min())
+
+    def test_halving_uses_most_recent_records(self):
+        X, y = self.get_phase_grouped_X_y(600)
+        del fitted_durations[:]
+
+        # a single round (all combinations once), using the most recent 200 records
+        search = BudgetedSearchCV(RecordingTree(), self.param_grid, min_resources=100, max_evaluations=9,
+                                  cv_type='expanding', n_jobs=1).fit(X, y)
+        self.assertEqual(set(search.cv_results_['n_resources']), {200})
+        self.assertGreaterEqual(min(fitted_durations[:-1]), 400)
+
+        # the best combination is then refit on all records
+        self.assertEqual(fitted_durations[-1], 0)
+
+    def test_time_series_grid_search(self):
+        search = TimeSeriesGridSearchCV(DecisionTreeRegressor(), self.param_grid, n_jobs=1).fit(self.X, self.y)
+        self.assertEqual(len(search.cv_results_['split4_test_score']), 9)
+        best_index = search.cv_results_['params'].index(search.best_params_)
+        self.assertEqual(search.cv_results_['rank_test_score'][best_index], 1)
+        self.assertEqual(search.best_params_['max_depth'], 10)
+
+    def test_get_search(self):
+        self.assertIsInstance(get_search(DecisionTreeRegressor(), self.param_grid), GridSearchCV)
+        self.assertIsInstance(get_search(DecisionTreeRegressor(), self.param_grid, search='halving'),
+                              BudgetedSearchCV)
+        self.assertIsInstance(get_search(DecisionTreeRegressor(), self.param_grid, cv_type='expanding'),
+                              TimeSeriesGridSearchCV)
+        self.assertRaises(ValueError, get_search, DecisionTreeRegressor(), self.param_grid, search='random')
+        self.assertRaises(ValueError, get_search, DecisionTreeRegressor(), self.param_grid, cv_type='shuffle')
+
+
+if __name__ == '__main__':
+    unittest.main()
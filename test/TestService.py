@@ -0,0 +1,117 @@
+import asyncio
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+from sklearn.tree import DecisionTreeRegressor
+
+from decision_tree.DT_Utils import load_dt_model, save_dt_model
+from service.LoadTest import get_arguments, load_features, open_connection, run_load_test, send_request
+from service.Models import ModelCache, get_model_file
+from service.Server import PredictionServer
+
+
+class TestService(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        random_state = np.random.RandomState(0)
+        self.X = random_state.randint(0, 30, (200, 2)).astype(float)
+        self.model = DecisionTreeRegressor(max_depth=4).fit(self.X, self.X[:, 1] // 10)
+
+        # two versions of a site, the first with a pickled model only (saved before the index of models)
+        for version in ['2017-09-29', '2017-09-30']:
+            os.makedirs(os.path.join(self.folder, version, 'e80374', 'models'))
+        with open(os.path.join(self.folder, '2017-09-29', 'e80374', 'models', 'dt_model_standard.pkl'), 'wb') as file:
+            pickle.dump(self.model, file)
+        save_dt_model('dt_model_standard', self.model, os.path.join(self.folder, '2017-09-30', 'e80374'), self.X)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_get_model_file(self):
+        self.assertTrue(get_model_file(self.folder, 'e80374', 'cart').endswith(
+            os.path.join('2017-09-30', 'e80374', 'models', 'dt_model_standard_trees.joblib')))
+        self.assertTrue(get_model_file(self.folder, 'e80374', 'cart', '2017-09-29').endswith('.pkl'))
+        self.assertRaises(FileNotFoundError, get_model_file, self.folder, 'e80374', 'gbr')
+        self.assertRaises(FileNotFoundError, get_model_file, self.folder, 'e80375', 'cart')
+
+    def test_load_dt_model(self):
+        model = load_dt_model(os.path.join(self.folder, '2017-09-29', 'e80374', 'models', 'dt_model_standard.pkl'))
+        np.testing.assert_array_equal(model.predict(self.X), self.model.predict(self.X))
+
+    def test_cache_discards_least_recently_used(self):
+        async def load_models():
+            cache = ModelCache(self.folder, capacity=1)
+            await cache.get('e80374', 'cart', '2017-09-29')
+            await cache.get('e80374', 'cart', 'latest')
+            return cache.keys()
+
+        self.assertEqual(asyncio.run(load_models()), [('e80374', 'cart', 'latest')])
+
+    def test_requests_are_answered(self):
+        socket_path = os.path.join(self.folder, 'service.sock')
+
+        async def run_service():
+            server = await PredictionServer(self.folder).start(socket_path=socket_path)
+            async with server:
+                results = await run_load_test(self.X, 'cart', 'e80374', num_requests=50, clients=5, rows=2,
+                                              socket_path=socket_path)
+                reader, writer = await open_connection(socket_path=socket_path)
+                answer = await send_request(reader, writer, {'id': 7, 'site': 'e80374', 'model': 'cart',
+                                                             'features': self.X[:3].tolist()})
+                error = await send_request(reader, writer, {'id': 8, 'site': 'e80374', 'model': 'gbr',
+                                                            'features': self.X[:3].tolist()})
+                stats = await send_request(reader, writer, {'command': 'stats'})
+                models = await send_request(reader, writer, {'command': 'models', 'site': 'e80374'})
+                writer.close()
+            return results, answer, error, stats, models
+
+        results, answer, error, stats, models = asyncio.run(run_service())
+        self.assertEqual((results['requests'], results['errors']), (50, 0))
+        self.assertEqual(answer['id'], 7)
+        self.assertEqual(answer['predictions'], self.model.predict(self.X[:3]).tolist())
+        self.assertIn('FileNotFoundError', error['error'])
+        self.assertEqual(stats['requests'], 52)
+        self.assertEqual(stats['models'], [['e80374', 'cart', 'latest']])
+        self.assertEqual([(model['name'], model['model']) for model in models['models']],
+                         [('dt_model_standard', 'cart')])
+
+    def test_load_features(self):
+        dataset = os.path.join(self.folder, 'dataset.csv')
+        pd.DataFrame({'A': self.X[:, 0], 'B': self.X[:, 1], 'Result': 0}).to_csv(dataset, index=False)
+        np.testing.assert_array_equal(load_features(dataset, 'cart'), self.X)
+        np.testing.assert_array_equal(load_features(dataset, 'gbr', ['B']), self.X[:, 1:])
+        self.assertEqual(load_features(dataset, 'rnn', sequence_length=5).shape, (196, 4, 2))
+
+        arguments = get_arguments([dataset, '--site', 'e80374', '--requests', '20'])
+        self.assertEqual((arguments.model, arguments.requests, arguments.clients), ('cart', 20, 16))
+
+    def test_load_test_command_line(self):
+        socket_path = os.path.join(self.folder, 'service.sock')
+        dataset = os.path.join(self.folder, 'dataset.csv')
+        pd.DataFrame({'A': self.X[:, 0], 'B': self.X[:, 1]}).to_csv(dataset, index=False)
+
+        async def run_command():
+            server = await PredictionServer(self.folder).start(socket_path=socket_path)
+            async with server:
+                process = await asyncio.create_subprocess_exec(
+                    sys.executable, '-m', 'service.LoadTest', dataset, '--site', 'e80374', '--requests', '20',
+                    '--clients', '2', '--socket-path', socket_path, stdout=asyncio.subprocess.PIPE,
+                    env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)))
+                output = (await process.communicate())[0].decode()
+            return process.returncode, output
+
+        returncode, output = asyncio.run(run_command())
+        self.assertEqual(returncode, 0)
+        self.assertIn('Throughput:', output)
+        self.assertIn('errors: 0 of 20 requests', output)
+
+
+if __name__ == '__main__':
+    unittest.main()
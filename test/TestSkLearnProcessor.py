@@ -0,0 +1,35 @@
+import unittest
+
+import pandas as pd
+
+from preprocessing.SkLearnProcessor import get_sklearn_df, get_state_durations
+
+
+class TestSkLearnProcessor(unittest.TestCase):
+
+    def test_state_durations(self):
+        date_time = pd.to_datetime(['2017-09-29 10:00:00', '2017-09-29 10:00:01', '2017-09-29 10:00:02',
+                                    '2017-09-29 10:00:03', '2017-09-29 10:00:04', '2017-09-29 10:00:05'])
+        df = pd.DataFrame({'Date_Time': date_time, 'Result': [0, 0, 1, 3, 3, 2], 'Phase': 'B'})
+        durations = get_state_durations(df, ['A', 'B'])
+
+        # single-record interval (1) ends with the previous interval, last single-record interval (2) is left out
+        self.assertEqual(list(durations['Phase']), [1, 1, 1])
+        self.assertEqual(list(durations['Result']), [0, 1, 3])
+        self.assertEqual(list(durations['Start']), [date_time[0], date_time[2], date_time[3]])
+        self.assertEqual(list(durations['End']), [date_time[1], date_time[1], date_time[4]])
+        self.assertEqual(list(durations['Duration']), [1, 1, 1])
+
+    def test_single_record_durations(self):
+        df = pd.DataFrame({'Date_Time': pd.to_datetime(['2017-09-29 10:00:00']), 'Result': [3], 'Phase': 'A'})
+        durations = get_state_durations(df, ['A'])
+        self.assertEqual(list(durations['Duration']), [0])
+
+    def test_sklearn_phase_codes(self):
+        # phases have the same value whichever phases are present
+        df = pd.DataFrame({'Date': '29/09/2017', 'Time': '10:00:00', 'Result': [0, 3], 'Phase': ['A', 'C']})
+        self.assertEqual(list(get_sklearn_df(df, io=False)['Phase']), [0, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
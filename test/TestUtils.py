@@ -2,7 +2,10 @@ import os
 import shutil
 import unittest
 
-from tools.Utils import root_path, output_fields, create_folder_if_not_exists, results_folder
+import pandas as pd
+
+from tools.Utils import root_path, output_fields, create_folder_if_not_exists, results_folder, save_df, load_df, \
+    find_storage_file, load_dataset, parse_timestamp, timestamp_field
 
 
 class TestUtils(unittest.TestCase):
@@ -32,6 +35,59 @@ class TestUtils(unittest.TestCase):
         shutil.rmtree(results_folder)
         self.assertEqual(os.path.exists(results_folder), False)
 
+    def test_storage_round_trip(self):
+        folder = root_path + "/temp/"
+        df = pd.DataFrame({'Date': ['29/09/2017'] * 3, 'Time': ['10:00:00', '10:00:01', '10:00:02'],
+                           'Result': [0, 1, 3], 'Phase': ['A', 'B', 'A']})
+
+        # save in two parts and read back as a single data frame with compact types
+        save_df(df[:2], folder + 'phases')
+        file = save_df(df[2:], folder + 'phases', append=True)
+        self.assertEqual(find_storage_file(folder + 'phases'), file)
+        stored_df = load_df(file)
+        self.assertEqual(list(stored_df['Result']), [0, 1, 3])
+        self.assertEqual(str(stored_df['Result'].dtype), 'int8')
+        self.assertEqual(str(stored_df['Phase'].dtype), 'category')
+
+        # save as CSV and read selected fields only
+        file = save_df(df, folder + 'phases_csv', storage='csv')
+        self.assertEqual(list(load_df(file, fields=['Time', 'Phase']).columns), ['Time', 'Phase'])
+
+        # remove folder after test
+        shutil.rmtree(folder)
+        self.assertEqual(os.path.exists(folder), False)
+
+    def test_parse_timestamp(self):
+        timestamps = parse_timestamp(pd.Series(['29/09/2017', '30/09/2017']), pd.Series(['10:00:01', '00:00:00']))
+        self.assertEqual(list(timestamps), [pd.Timestamp('2017-09-29 10:00:01'), pd.Timestamp('2017-09-30')])
+
+    def test_parse_timestamp_across_month(self):
+        timestamps = parse_timestamp(pd.Series(['30/09/2017', '01/10/2017']), pd.Series(['23:59:59', '00:00:00']))
+        self.assertEqual(list(timestamps), [pd.Timestamp('2017-09-30 23:59:59'), pd.Timestamp('2017-10-01')])
+
+    def test_parse_timestamp_day_first(self):
+        timestamps = parse_timestamp(pd.Series(['05/10/2017', '06/10/2017']), pd.Series(['10:00:00', '10:00:00']))
+        self.assertEqual(list(timestamps), [pd.Timestamp('2017-10-05 10:00:00'), pd.Timestamp('2017-10-06 10:00:00')])
+
+    def test_load_dataset_schema(self):
+        folder = root_path + "/temp/"
+        df = pd.DataFrame({'Date': ['29/09/2017'] * 3, 'Time': ['10:00:00', '10:00:01', '10:00:02'],
+                           'Result': [0, 1, 3], 'Phase': ['A', 'B', 'C'], 'I/O D1 [1] State': [0, 1, 1]})
+        file = save_df(df, folder + 'dataset', storage='csv')
+
+        # convert in chunks of two records, replacing date/time with a timestamp
+        dataset = load_dataset(file, size=2)
+        self.assertEqual(list(dataset.columns), [timestamp_field, 'Result', 'Phase', 'I/O D1 [1] State'])
+        self.assertEqual(str(dataset[timestamp_field].dtype), 'datetime64[ns]')
+        self.assertEqual(str(dataset['Result'].dtype), 'int8')
+        self.assertEqual(str(dataset['Phase'].dtype), 'category')
+        self.assertEqual(list(dataset['Phase']), ['A', 'B', 'C'])
+        self.assertEqual(str(dataset['I/O D1 [1] State'].dtype), 'uint8')
+
+        # remove folder after test
+        shutil.rmtree(folder)
+        self.assertEqual(os.path.exists(folder), False)
+
 
 if __name__ == "__main__":
     unittest.main()